@@ -0,0 +1,28 @@
+"""Progresso parcial da correção
+
+Revision ID: 3f1c2a9d7e10
+Revises: 99ebd653076b
+Create Date: 2026-10-18 10:12:41.502117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7e10'
+down_revision: Union[str, Sequence[str], None] = '99ebd653076b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('redacoes', sa.Column('progresso_json', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('redacoes', 'progresso_json')
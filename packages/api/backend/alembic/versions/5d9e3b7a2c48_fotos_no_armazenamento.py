@@ -0,0 +1,75 @@
+"""Fotos de perfil no armazenamento de arquivos, fora da tabela users
+
+Revision ID: 5d9e3b7a2c48
+Revises: e7a90c3d1f24
+Create Date: 2026-10-18 19:05:12.480913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from backend.core.fotos import armazenar_foto
+from shared.armazenamento import obter_armazenamento
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9e3b7a2c48'
+down_revision: Union[str, Sequence[str], None] = 'e7a90c3d1f24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+users = sa.table(
+    'users',
+    sa.column('id', sa.Integer),
+    sa.column('profile_pic', sa.LargeBinary),
+    sa.column('foto_chave', sa.String),
+    sa.column('foto_tipo', sa.String),
+    sa.column('foto_miniaturas', sa.JSON),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('foto_chave', sa.String(length=64), nullable=True))
+    op.add_column('users', sa.Column('foto_tipo', sa.String(), nullable=True))
+    op.add_column('users', sa.Column('foto_miniaturas', sa.JSON(), nullable=True))
+
+    conexao = op.get_bind()
+    linhas = conexao.execute(
+        sa.select(users.c.id, users.c.profile_pic).where(users.c.profile_pic.isnot(None))
+    ).fetchall()
+    for user_id, foto in linhas:
+        try:
+            armazenada = armazenar_foto(bytes(foto))
+            valores = dict(
+                foto_chave=armazenada.chave, foto_tipo=armazenada.tipo, foto_miniaturas=armazenada.miniaturas
+            )
+        except ValueError:
+            # Uploads antigos não eram validados: guarda o original, servido como antes
+            valores = dict(foto_chave=obter_armazenamento().salvar(bytes(foto)), foto_tipo='image/jpeg')
+        conexao.execute(users.update().where(users.c.id == user_id).values(**valores))
+
+    op.drop_column('users', 'profile_pic')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column('users', sa.Column('profile_pic', sa.LargeBinary(), nullable=True))
+
+    conexao = op.get_bind()
+    armazenamento = obter_armazenamento()
+    linhas = conexao.execute(
+        sa.select(users.c.id, users.c.foto_chave).where(users.c.foto_chave.isnot(None))
+    ).fetchall()
+    for user_id, chave in linhas:
+        if armazenamento.existe(chave):
+            conexao.execute(
+                users.update().where(users.c.id == user_id).values(profile_pic=armazenamento.ler(chave))
+            )
+
+    op.drop_column('users', 'foto_miniaturas')
+    op.drop_column('users', 'foto_tipo')
+    op.drop_column('users', 'foto_chave')
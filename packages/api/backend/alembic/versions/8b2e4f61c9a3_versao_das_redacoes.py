@@ -0,0 +1,35 @@
+"""Versão das redações para GET condicional (atualizado_em)
+
+Revision ID: 8b2e4f61c9a3
+Revises: 3f1c2a9d7e10
+Create Date: 2026-10-18 14:03:27.815240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4f61c9a3'
+down_revision: Union[str, Sequence[str], None] = '3f1c2a9d7e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'redacoes',
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    )
+    # Linhas existentes começam com a data de criação
+    op.execute('UPDATE redacoes SET atualizado_em = criado_em WHERE criado_em IS NOT NULL')
+    op.create_index('ix_redacoes_user_id_atualizado_em', 'redacoes', ['user_id', 'atualizado_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_redacoes_user_id_atualizado_em', table_name='redacoes')
+    op.drop_column('redacoes', 'atualizado_em')
@@ -0,0 +1,45 @@
+"""Transcrições (OCR) como jobs do worker
+
+Revision ID: a6c1f8e94b37
+Revises: 5d9e3b7a2c48
+Create Date: 2026-10-18 20:14:37.902215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c1f8e94b37'
+down_revision: Union[str, Sequence[str], None] = '5d9e3b7a2c48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'transcricoes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('imagem_chave', sa.String(length=64), nullable=True),
+        sa.Column('imagem_tipo', sa.String(), nullable=True),
+        sa.Column('texto', sa.Text(), nullable=True),
+        sa.Column('erro', sa.String(), nullable=True),
+        sa.Column('criado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_transcricoes_id'), 'transcricoes', ['id'], unique=False)
+    op.create_index(op.f('ix_transcricoes_user_id'), 'transcricoes', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_transcricoes_user_id'), table_name='transcricoes')
+    op.drop_index(op.f('ix_transcricoes_id'), table_name='transcricoes')
+    op.drop_table('transcricoes')
@@ -0,0 +1,58 @@
+"""Notas desnormalizadas e índice do histórico paginado
+
+Revision ID: c41d7a2b5e86
+Revises: 8b2e4f61c9a3
+Create Date: 2026-10-18 16:41:09.337518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7a2b5e86'
+down_revision: Union[str, Sequence[str], None] = '8b2e4f61c9a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('redacoes', sa.Column('nota_final', sa.Integer(), nullable=True))
+    op.add_column('redacoes', sa.Column('notas_competencias', sa.JSON(), nullable=True))
+    op.create_index(
+        'ix_redacoes_user_id_criado_em_id', 'redacoes', ['user_id', 'criado_em', 'id'], unique=False
+    )
+
+    # Preenche as notas das redações já corrigidas a partir de resultado_json
+    redacoes = sa.table(
+        'redacoes',
+        sa.column('id', sa.Integer),
+        sa.column('resultado_json', sa.JSON),
+        sa.column('nota_final', sa.Integer),
+        sa.column('notas_competencias', sa.JSON),
+    )
+    conexao = op.get_bind()
+    linhas = conexao.execute(
+        sa.select(redacoes.c.id, redacoes.c.resultado_json).where(redacoes.c.resultado_json.isnot(None))
+    ).fetchall()
+    for redacao_id, resultado in linhas:
+        if not isinstance(resultado, dict):
+            continue
+        conexao.execute(
+            redacoes.update()
+            .where(redacoes.c.id == redacao_id)
+            .values(
+                nota_final=resultado.get('nota_final'),
+                notas_competencias=[c.get('nota') for c in resultado.get('competencias', [])],
+            )
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_redacoes_user_id_criado_em_id', table_name='redacoes')
+    op.drop_column('redacoes', 'notas_competencias')
+    op.drop_column('redacoes', 'nota_final')
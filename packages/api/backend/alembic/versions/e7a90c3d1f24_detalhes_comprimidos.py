@@ -0,0 +1,64 @@
+"""Detalhes dos corretores comprimidos fora do resultado consolidado
+
+Revision ID: e7a90c3d1f24
+Revises: c41d7a2b5e86
+Create Date: 2026-10-18 18:22:54.106833
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from shared.compressao import comprimir_json, descomprimir_json
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a90c3d1f24'
+down_revision: Union[str, Sequence[str], None] = 'c41d7a2b5e86'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+redacoes = sa.table(
+    'redacoes',
+    sa.column('id', sa.Integer),
+    sa.column('resultado_json', sa.JSON),
+    sa.column('detalhes_comprimidos', sa.LargeBinary),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('redacoes', sa.Column('detalhes_comprimidos', sa.LargeBinary(), nullable=True))
+
+    # Move os "detalhes" de cada resultado já gravado para a coluna comprimida
+    conexao = op.get_bind()
+    linhas = conexao.execute(
+        sa.select(redacoes.c.id, redacoes.c.resultado_json).where(redacoes.c.resultado_json.isnot(None))
+    ).fetchall()
+    for redacao_id, resultado in linhas:
+        if not isinstance(resultado, dict) or 'detalhes' not in resultado:
+            continue
+        detalhes = resultado.pop('detalhes')
+        conexao.execute(
+            redacoes.update()
+            .where(redacoes.c.id == redacao_id)
+            .values(resultado_json=resultado, detalhes_comprimidos=comprimir_json(detalhes))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    conexao = op.get_bind()
+    linhas = conexao.execute(
+        sa.select(redacoes.c.id, redacoes.c.resultado_json, redacoes.c.detalhes_comprimidos)
+        .where(redacoes.c.detalhes_comprimidos.isnot(None))
+    ).fetchall()
+    for redacao_id, resultado, comprimidos in linhas:
+        conexao.execute(
+            redacoes.update()
+            .where(redacoes.c.id == redacao_id)
+            .values(resultado_json={**(resultado or {}), 'detalhes': descomprimir_json(comprimidos)})
+        )
+    op.drop_column('redacoes', 'detalhes_comprimidos')
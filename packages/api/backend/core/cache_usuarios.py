@@ -0,0 +1,179 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cache da autenticação: tokens JWT já decodificados e um registro leve do usuário
+# (id, email, nome), para que as requisições autenticadas (ex.: o polling de status)
+# não decodifiquem o token nem consultem a tabela users a cada chamada.
+#
+# Primeiro nível: LRU com TTL no processo. Segundo nível, opcional: Redis em
+# AUTH_CACHE_REDIS_URL, compartilhado pelas réplicas da API. Alterações no perfil
+# chamam invalidar_usuario; em outras réplicas, a cópia local dura no máximo o TTL.
+
+
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    id: int
+    email: str
+    name: Optional[str] = None
+
+
+class CacheTTL:
+    """LRU limitado em número de entradas, com validade por entrada."""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._itens: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: str) -> Any:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return None
+            valor, expira_em = item
+            if expira_em <= time.monotonic():
+                del self._itens[chave]
+                return None
+            self._itens.move_to_end(chave)
+            return valor
+
+    def guardar(self, chave: str, valor: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + ttl)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_entradas:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave: str) -> None:
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+
+class CacheAutenticacao:
+    def __init__(self, max_entradas: int, url_redis: Optional[str] = None):
+        self._tokens = CacheTTL(max_entradas)
+        self._usuarios = CacheTTL(max_entradas)
+        self.url_redis = url_redis
+        self._cliente = None
+        self._indisponivel_ate = 0.0
+        self._ultimo_aviso = 0.0
+
+    # --- Tokens ---
+
+    @staticmethod
+    def _chave_token(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def obter_token(self, token: str) -> Optional[dict]:
+        payload = self._tokens.obter(self._chave_token(token))
+        if payload is None:
+            return None
+        # O cache nunca estende a validade do token
+        exp = payload.get("exp")
+        if exp is not None and exp <= time.time():
+            self._tokens.remover(self._chave_token(token))
+            return None
+        return payload
+
+    def guardar_token(self, token: str, payload: dict) -> None:
+        ttl = settings.AUTH_CACHE_TTL_SEGUNDOS
+        exp = payload.get("exp")
+        if exp is not None:
+            ttl = min(ttl, exp - time.time())
+        self._tokens.guardar(self._chave_token(token), payload, ttl)
+
+    # --- Usuários ---
+
+    def _redis(self):
+        if not self.url_redis or time.monotonic() < self._indisponivel_ate:
+            return None
+        if self._cliente is None:
+            import redis
+
+            self._cliente = redis.Redis.from_url(self.url_redis, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return self._cliente
+
+    def _avisar_indisponivel(self, e: Exception) -> None:
+        agora = time.monotonic()
+        # Não tenta o Redis a cada requisição enquanto ele estiver fora
+        self._indisponivel_ate = agora + 30
+        if agora - self._ultimo_aviso > 60:
+            self._ultimo_aviso = agora
+            logger.warning(f"Redis indisponível para o cache de usuários ({e}). Usando só o cache local.")
+
+    @staticmethod
+    def _chave_redis(email: str) -> str:
+        return f"atena:usuario:{email}"
+
+    def obter_usuario(self, email: str) -> Optional[UsuarioAutenticado]:
+        usuario = self._usuarios.obter(email)
+        if usuario is not None:
+            return usuario
+        cliente = self._redis()
+        if cliente is None:
+            return None
+        try:
+            bruto = cliente.get(self._chave_redis(email))
+        except Exception as e:
+            self._avisar_indisponivel(e)
+            return None
+        if bruto is None:
+            return None
+        usuario = UsuarioAutenticado(**json.loads(bruto))
+        self._usuarios.guardar(email, usuario, settings.AUTH_CACHE_TTL_SEGUNDOS)
+        return usuario
+
+    def guardar_usuario(self, usuario: UsuarioAutenticado) -> None:
+        ttl = settings.AUTH_CACHE_TTL_SEGUNDOS
+        self._usuarios.guardar(usuario.email, usuario, ttl)
+        cliente = self._redis()
+        if cliente is None:
+            return
+        try:
+            cliente.set(self._chave_redis(usuario.email), json.dumps(asdict(usuario)), ex=max(1, int(ttl)))
+        except Exception as e:
+            self._avisar_indisponivel(e)
+
+    def invalidar_usuario(self, email: str) -> None:
+        self._usuarios.remover(email)
+        cliente = self._redis()
+        if cliente is None:
+            return
+        try:
+            cliente.delete(self._chave_redis(email))
+        except Exception as e:
+            self._avisar_indisponivel(e)
+
+    def limpar(self) -> None:
+        """Só o nível local (testes)."""
+        self._tokens.limpar()
+        self._usuarios.limpar()
+
+
+_cache: Optional[CacheAutenticacao] = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache() -> CacheAutenticacao:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheAutenticacao(settings.AUTH_CACHE_MAX_ENTRADAS, settings.AUTH_CACHE_REDIS_URL)
+    return _cache
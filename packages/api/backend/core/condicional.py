@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+# GET condicional (ETag / Last-Modified): o cliente reenvia a versão que já tem
+# e recebe 304 sem corpo quando nada mudou. A versão é calculada com colunas
+# leves (status, atualizado_em), sem carregar os JSONs de resultado.
+
+
+def gerar_etag(*partes: Any) -> str:
+    """ETag forte a partir das partes que identificam a versão do recurso."""
+    conteudo = ":".join(str(parte) for parte in partes)
+    return '"' + hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _em_utc(momento: datetime) -> datetime:
+    # SQLite devolve datas sem fuso; o banco grava em UTC
+    if momento.tzinfo is None:
+        return momento.replace(tzinfo=timezone.utc)
+    return momento.astimezone(timezone.utc)
+
+
+def cabecalhos(etag: str, ultima_modificacao: Optional[datetime]) -> Dict[str, str]:
+    # "no-cache": o cliente pode guardar a resposta, mas revalida a cada uso
+    resultado = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if ultima_modificacao is not None:
+        resultado["Last-Modified"] = format_datetime(_em_utc(ultima_modificacao), usegmt=True)
+    return resultado
+
+
+def nao_modificado(request: Request, etag: str, ultima_modificacao: Optional[datetime]) -> bool:
+    """
+    True se a versão do cliente ainda vale. If-None-Match tem precedência;
+    If-Modified-Since só é considerado sem ele (RFC 9110, 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        # Comparação fraca, como pede a RFC para If-None-Match
+        enviadas = {valor.strip().removeprefix("W/") for valor in if_none_match.split(",")}
+        return etag in enviadas
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and ultima_modificacao is not None:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if desde.tzinfo is None:
+            return False
+        return _em_utc(ultima_modificacao).replace(microsecond=0) <= desde
+    return False
+
+
+def responder_se_nao_modificado(
+    request: Request, response: Response, etag: str, ultima_modificacao: Optional[datetime]
+) -> Optional[Response]:
+    """Resposta 304 se o cliente já tem esta versão; senão, põe os cabeçalhos em `response` e devolve None."""
+    headers = cabecalhos(etag, ultima_modificacao)
+    if nao_modificado(request, etag, ultima_modificacao):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
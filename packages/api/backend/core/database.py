@@ -1,4 +1,12 @@
-from shared.models import SessionLocal
+import threading
+from typing import Any, Optional
+
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+
+from shared.config import settings
+from shared.models import DATABASE_URL, SessionLocal, argumentos_pool
 
 
 def get_db():
@@ -7,3 +15,56 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Leituras das rotas assíncronas. Com DB_ASYNC_ATIVO, usam um engine asyncpg
+# (pool próprio, perfil "api") e não ocupam o threadpool do FastAPI enquanto
+# esperam o banco; sem ele, a sessão síncrona roda numa thread, como antes.
+
+_engine_async = None
+_sessoes_async = None
+_engine_lock = threading.Lock()
+
+
+def url_async() -> str:
+    if settings.DATABASE_URL_ASYNC:
+        return settings.DATABASE_URL_ASYNC
+    esquema, resto = DATABASE_URL.split("://", 1)
+    if not esquema.startswith("postgresql"):
+        raise ValueError(f"DB_ASYNC_ATIVO requer PostgreSQL (ou DATABASE_URL_ASYNC); DATABASE_URL usa {esquema}.")
+    return f"postgresql+asyncpg://{resto}"
+
+
+def _obter_sessoes_async():
+    global _engine_async, _sessoes_async
+    if _sessoes_async is None:
+        with _engine_lock:
+            if _sessoes_async is None:
+                from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+                url = url_async()
+                _engine_async = create_async_engine(url, **argumentos_pool(url, "api"))
+                _sessoes_async = async_sessionmaker(_engine_async, expire_on_commit=False, autoflush=False)
+    return _sessoes_async
+
+
+class SessaoLeitura:
+    """Executa consultas (select) pela sessão assíncrona, se houver, ou pela síncrona numa thread."""
+
+    def __init__(self, sessao_async=None, sessao_sync: Optional[Session] = None):
+        self._async = sessao_async
+        self._sync = sessao_sync
+
+    async def executar(self, consulta: Any):
+        if self._async is not None:
+            return await self._async.execute(consulta)
+        return await run_in_threadpool(self._sync.execute, consulta)
+
+
+async def get_db_leitura(db: Session = Depends(get_db)):
+    # A sessão síncrona só abre conexão se for usada
+    if not settings.DB_ASYNC_ATIVO:
+        yield SessaoLeitura(sessao_sync=db)
+        return
+    async with _obter_sessoes_async()() as sessao:
+        yield SessaoLeitura(sessao_async=sessao)
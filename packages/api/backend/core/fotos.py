@@ -0,0 +1,108 @@
+import io
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from shared.armazenamento import obter_armazenamento
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fotos de perfil: validação durante o upload (tamanho lido em blocos e formato
+# pelos bytes iniciais), miniaturas quadradas geradas no envio e gravação no
+# armazenamento de arquivos. Pillow é opcional: sem ele, não há miniaturas e
+# a foto original é servida para qualquer tamanho.
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - depende do ambiente
+    Image = None
+
+_avisou_sem_pillow = False
+
+_BLOCO = 64 * 1024
+
+# Assinaturas (magic bytes) dos formatos aceitos
+_FORMATOS = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+)
+
+
+def detectar_formato(inicio: bytes) -> Optional[str]:
+    for assinatura, tipo in _FORMATOS:
+        if inicio.startswith(assinatura):
+            return tipo
+    if inicio[:4] == b"RIFF" and inicio[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+async def ler_upload(arquivo: UploadFile, tamanho_maximo: Optional[int] = None) -> bytes:
+    """Lê o upload em blocos, recusando formato desconhecido (415) ou arquivo grande demais (413)."""
+    tamanho_maximo = tamanho_maximo or settings.FOTO_TAMANHO_MAXIMO
+    partes = []
+    total = 0
+    while True:
+        bloco = await arquivo.read(_BLOCO)
+        if not bloco:
+            break
+        if not partes and detectar_formato(bloco) is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Formato de imagem não suportado. Envie JPEG, PNG ou WebP.",
+            )
+        total += len(bloco)
+        if total > tamanho_maximo:
+            raise HTTPException(
+                status_code=413,
+                detail=f"A foto deve ter no máximo {tamanho_maximo // (1024 * 1024)} MB.",
+            )
+        partes.append(bloco)
+    if not partes:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Arquivo vazio.")
+    return b"".join(partes)
+
+
+def gerar_miniaturas(dados: bytes) -> Dict[int, bytes]:
+    """Miniaturas JPEG quadradas (recorte central) nos tamanhos de FOTO_MINIATURAS."""
+    global _avisou_sem_pillow
+    if Image is None:
+        if not _avisou_sem_pillow:
+            _avisou_sem_pillow = True
+            logger.warning("Pillow não está instalado: fotos de perfil sem miniaturas.")
+        return {}
+    try:
+        with Image.open(io.BytesIO(dados)) as imagem:
+            imagem = ImageOps.exif_transpose(imagem).convert("RGB")
+            miniaturas = {}
+            for tamanho in sorted(set(settings.FOTO_MINIATURAS)):
+                saida = io.BytesIO()
+                ImageOps.fit(imagem, (tamanho, tamanho)).save(saida, "JPEG", quality=85, optimize=True)
+                miniaturas[tamanho] = saida.getvalue()
+            return miniaturas
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Imagem inválida: {e}")
+
+
+@dataclass
+class FotoArmazenada:
+    chave: str
+    tipo: str
+    miniaturas: Dict[str, str] = field(default_factory=dict)  # tamanho -> chave
+
+
+def armazenar_foto(dados: bytes) -> FotoArmazenada:
+    """Grava a foto e as miniaturas. Levanta ValueError se a imagem não puder ser lida."""
+    tipo = detectar_formato(dados[:16])
+    if tipo is None:
+        raise ValueError("Formato de imagem não suportado.")
+    miniaturas = gerar_miniaturas(dados)
+    armazenamento = obter_armazenamento()
+    return FotoArmazenada(
+        chave=armazenamento.salvar(dados),
+        tipo=tipo,
+        miniaturas={str(tamanho): armazenamento.salvar(conteudo) for tamanho, conteudo in miniaturas.items()},
+    )
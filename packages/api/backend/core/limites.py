@@ -0,0 +1,259 @@
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Response, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.core.cache_usuarios import UsuarioAutenticado
+from backend.core.database import get_db
+from backend.routers.auth import get_current_user
+from shared import models
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cotas de uso por usuário e por endpoint (correções, OCR, sugestão de tema), com
+# janela deslizante atômica no Redis: um sorted set por usuário/endpoint com o
+# instante de cada uso. Todas as instâncias da API dividem o mesmo contador.
+#
+# Sem Redis, a correção conta as redações no banco (índice user_id, criado_em) e
+# os demais endpoints usam uma janela em memória do processo.
+#
+# O uso é devolvido se o endpoint falhar (erro do LLM, upload recusado, corpo
+# inválido): só conta o que o usuário de fato recebeu.
+
+_SCRIPT_JANELA = """
+local tempo = redis.call('TIME')
+local agora = tonumber(tempo[1]) + tonumber(tempo[2]) / 1000000
+local janela = tonumber(ARGV[1])
+local limite = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', agora - janela)
+local usados = redis.call('ZCARD', KEYS[1])
+local permitido = 0
+if usados < limite then
+    redis.call('ZADD', KEYS[1], agora, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], math.ceil(janela * 1000))
+    usados = usados + 1
+    permitido = 1
+end
+local mais_antigo = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local reset = janela
+if mais_antigo[2] then
+    reset = tonumber(mais_antigo[2]) + janela - agora
+end
+return {permitido, usados, tostring(reset)}
+"""
+
+
+@dataclass
+class ResultadoCota:
+    permitido: bool
+    limite: int
+    usados: int
+    reset: float  # Segundos até liberar o próximo uso
+    # Onde o uso ficou registrado, para devolvê-lo: ("redis", membro) ou ("local", instante)
+    registro: Optional[Tuple[str, Any]] = None
+
+    @property
+    def restantes(self) -> int:
+        return max(0, self.limite - self.usados)
+
+    def cabecalhos(self) -> Dict[str, str]:
+        cabecalhos = {
+            "RateLimit-Limit": str(self.limite),
+            "RateLimit-Remaining": str(self.restantes),
+            "RateLimit-Reset": str(max(0, int(self.reset + 0.999))),
+        }
+        if not self.permitido:
+            cabecalhos["Retry-After"] = cabecalhos["RateLimit-Reset"]
+        return cabecalhos
+
+
+# Padrões por endpoint; LIMITES_USO sobrescreve endpoint a endpoint
+LIMITES_PADRAO: Dict[str, Dict[str, int]] = {
+    "correcao": {"limite": 5, "janela": 24 * 3600},
+    "ocr": {"limite": 20, "janela": 3600},
+    "sugestao_tema": {"limite": 30, "janela": 3600},
+}
+
+
+def configuracao(endpoint: str) -> Tuple[int, int]:
+    """(limite, janela em segundos) do endpoint."""
+    config = {**LIMITES_PADRAO.get(endpoint, {}), **settings.LIMITES_USO.get(endpoint, {})}
+    return int(config["limite"]), int(config["janela"])
+
+
+class _JanelaLocal:
+    """Janela deslizante em memória, usada sem Redis (vale só para este processo)."""
+
+    def __init__(self):
+        self._usos: Dict[Tuple[str, int], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, endpoint: str, user_id: int, limite: int, janela: int) -> ResultadoCota:
+        agora = time.monotonic()
+        with self._lock:
+            usos = self._usos.setdefault((endpoint, user_id), deque())
+            while usos and usos[0] <= agora - janela:
+                usos.popleft()
+            permitido = len(usos) < limite
+            if permitido:
+                usos.append(agora)
+            reset = usos[0] + janela - agora if usos else janela
+            return ResultadoCota(permitido, limite, len(usos), reset, ("local", agora) if permitido else None)
+
+    def devolver(self, endpoint: str, user_id: int, instante: float) -> None:
+        with self._lock:
+            usos = self._usos.get((endpoint, user_id))
+            if usos and instante in usos:
+                usos.remove(instante)
+
+
+class ServicoCotas:
+    def __init__(self, url_redis: str):
+        self.url_redis = url_redis
+        self._cliente = None
+        self._script = None
+        self._local = _JanelaLocal()
+        self._indisponivel_ate = 0.0
+        self._ultimo_aviso = 0.0
+
+    def _redis(self):
+        if self._cliente is None:
+            import redis
+
+            self._cliente = redis.Redis.from_url(self.url_redis, socket_timeout=1, socket_connect_timeout=1)
+            self._script = self._cliente.register_script(_SCRIPT_JANELA)
+        return self._cliente
+
+    def _avisar_indisponivel(self, e: Exception) -> None:
+        agora = time.monotonic()
+        # Não tenta o Redis a cada requisição enquanto ele estiver fora
+        self._indisponivel_ate = agora + 30
+        if agora - self._ultimo_aviso > 60:
+            self._ultimo_aviso = agora
+            logger.warning(f"Redis indisponível para as cotas de uso ({e}). Usando o contador alternativo.")
+
+    @staticmethod
+    def _chave(endpoint: str, user_id: int) -> str:
+        return f"atena:limite:{endpoint}:{user_id}"
+
+    def _consumir_redis(self, endpoint: str, user_id: int, limite: int, janela: int) -> Optional[ResultadoCota]:
+        if time.monotonic() < self._indisponivel_ate:
+            return None
+        membro = uuid.uuid4().hex
+        try:
+            self._redis()
+            permitido, usados, reset = self._script(keys=[self._chave(endpoint, user_id)], args=[janela, limite, membro])
+        except Exception as e:
+            self._avisar_indisponivel(e)
+            return None
+        registro = ("redis", membro) if permitido else None
+        return ResultadoCota(bool(permitido), limite, int(usados), float(reset), registro)
+
+    def consumir(
+        self,
+        endpoint: str,
+        user_id: int,
+        contar_no_banco: Optional[Callable[[datetime], Tuple[int, Optional[datetime]]]] = None,
+    ) -> ResultadoCota:
+        """
+        Registra um uso se houver cota. `contar_no_banco(desde)` devolve (usos, mais antigo)
+        a partir do banco e é a alternativa quando o Redis não responde.
+        """
+        limite, janela = configuracao(endpoint)
+        resultado = self._consumir_redis(endpoint, user_id, limite, janela)
+        if resultado is not None:
+            return resultado
+        if contar_no_banco is None:
+            return self._local.consumir(endpoint, user_id, limite, janela)
+
+        agora = datetime.now(timezone.utc)
+        usados, mais_antigo = contar_no_banco(agora - timedelta(seconds=janela))
+        reset = float(janela)
+        if mais_antigo is not None:
+            if mais_antigo.tzinfo is None:
+                mais_antigo = mais_antigo.replace(tzinfo=timezone.utc)
+            reset = max(0.0, (mais_antigo + timedelta(seconds=janela) - agora).total_seconds())
+        permitido = usados < limite
+        # O uso atual vira uma linha nova logo em seguida (a redação criada); se o
+        # endpoint falhar antes, não há linha e nada a devolver
+        return ResultadoCota(permitido, limite, usados + 1 if permitido else usados, reset)
+
+    def devolver(self, endpoint: str, user_id: int, resultado: ResultadoCota) -> None:
+        """Desfaz o uso registrado por `consumir` (o endpoint falhou)."""
+        if resultado.registro is None:
+            return
+        origem, valor = resultado.registro
+        if origem == "local":
+            self._local.devolver(endpoint, user_id, valor)
+            return
+        try:
+            self._redis().zrem(self._chave(endpoint, user_id), valor)
+        except Exception as e:
+            # O uso expira sozinho com a janela
+            self._avisar_indisponivel(e)
+
+
+_servico: Optional[ServicoCotas] = None
+_servico_lock = threading.Lock()
+
+
+def obter_servico() -> ServicoCotas:
+    global _servico
+    if _servico is None:
+        with _servico_lock:
+            if _servico is None:
+                _servico = ServicoCotas(settings.REDIS_URL or settings.CELERY_BROKER_URL)
+    return _servico
+
+
+def _contar_redacoes(db: Session, user_id: int):
+    def _contar(desde: datetime) -> Tuple[int, Optional[datetime]]:
+        return (
+            db.query(func.count(models.Redacao.id), func.min(models.Redacao.criado_em))
+            .filter(models.Redacao.user_id == user_id, models.Redacao.criado_em >= desde)
+            .one()
+        )
+    return _contar
+
+
+def exigir_cota(endpoint: str, mensagem: str):
+    """
+    Dependência do FastAPI: consome um uso de `endpoint` do usuário logado e põe os
+    cabeçalhos RateLimit-* na resposta; sem cota, responde 429 com Retry-After.
+    Se o endpoint levantar qualquer erro (inclusive HTTPException e 422), o uso é devolvido.
+    """
+    def _dependencia(
+        response: Response,
+        db: Session = Depends(get_db),
+        current_user: UsuarioAutenticado = Depends(get_current_user),
+    ):
+        if not settings.LIMITES_ATIVOS:
+            limite, janela = configuracao(endpoint)
+            yield ResultadoCota(True, limite, 0, 0)
+            return
+        contar_no_banco = _contar_redacoes(db, current_user.id) if endpoint == "correcao" else None
+        servico = obter_servico()
+        resultado = servico.consumir(endpoint, current_user.id, contar_no_banco)
+        if not resultado.permitido:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=mensagem.format(limite=resultado.limite),
+                headers=resultado.cabecalhos(),
+            )
+        response.headers.update(resultado.cabecalhos())
+        try:
+            yield resultado
+        except Exception:
+            servico.devolver(endpoint, current_user.id, resultado)
+            raise
+
+    return _dependencia
@@ -1,10 +1,12 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 import bcrypt
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
 from shared.config import settings
 
 # CONFIGURAÇÕES DE SEGURANÇA
@@ -19,12 +21,69 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         hashed_password = hashed_password.encode('utf-8')
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password)
 
-def get_password_hash(password: str) -> str:
+def get_password_hash(password: str, rounds: Optional[int] = None) -> str:
     # Gera o salt e o hash
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds or settings.SENHA_BCRYPT_CUSTO)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+def precisa_rehash(hashed_password: str) -> bool:
+    """True se o hash foi gerado com um custo diferente do configurado ($2b$<custo>$...)."""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.SENHA_BCRYPT_CUSTO
+    except (IndexError, ValueError):
+        return False
+
+
+# --- POOL DE PROCESSOS DO BCRYPT ---
+# O bcrypt é lento de propósito (e segura CPU). Rodando no threadpool do FastAPI,
+# uma rajada de logins (uma turma inteira entrando) ocupa as threads que atendem
+# as rotas síncronas. Aqui ele roda num pool de processos próprio e limitado;
+# com SENHA_FILA_MAXIMA pedidos já esperando, o próximo é recusado na hora
+# (SenhasSobrecarregadas -> 503) em vez de aumentar a fila.
+
+class SenhasSobrecarregadas(Exception):
+    """Pool de hashing cheio: o endpoint responde 503 com Retry-After."""
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_em_andamento = 0
+
+
+def _obter_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # "spawn": o processo da API tem threads, e fork com threads é frágil
+                _pool = ProcessPoolExecutor(
+                    max_workers=settings.SENHA_PROCESSOS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _pool
+
+
+async def _executar_no_pool(funcao, *args):
+    global _em_andamento
+    with _pool_lock:
+        if _em_andamento >= settings.SENHA_PROCESSOS + settings.SENHA_FILA_MAXIMA:
+            raise SenhasSobrecarregadas()
+        _em_andamento += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_obter_pool(), funcao, *args)
+    finally:
+        with _pool_lock:
+            _em_andamento -= 1
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _executar_no_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _executar_no_pool(get_password_hash, password, settings.SENHA_BCRYPT_CUSTO)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
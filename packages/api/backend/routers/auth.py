@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response, File, UploadFile
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, Response, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from typing import Optional
 
 from shared import models, schemas
-from backend.core.database import get_db
-from backend.core.security import get_password_hash, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM
+from backend.core import condicional, fotos
+from backend.core.cache_usuarios import UsuarioAutenticado, obter_cache
+from backend.core.database import SessaoLeitura, get_db, get_db_leitura
+from backend.core.security import (
+    SenhasSobrecarregadas, get_password_hash_async, verify_password_async, precisa_rehash,
+    create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, SECRET_KEY, ALGORITHM,
+)
 from jose import JWTError, jwt
+from shared.armazenamento import chave_em_uso, obter_armazenamento, remover_sem_uso
 from shared.config import settings
 
 router = APIRouter(tags=["Auth"])
@@ -15,35 +26,83 @@ router = APIRouter(tags=["Auth"])
 # --- DEPENDENCIES ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _decodificar_token(token: str) -> dict:
+    cache = obter_cache()
+    if settings.AUTH_CACHE_ATIVO:
+        payload = cache.obter_token(token)
+        if payload is not None:
+            return payload
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if settings.AUTH_CACHE_ATIVO:
+        cache.guardar_token(token, payload)
+    return payload
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> UsuarioAutenticado:
+    """
+    Usuário do token, como registro leve (id, email, nome) vindo do cache quando possível.
+    Endpoints que alteram o usuário usam get_current_db_user.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _decodificar_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
         token_data = schemas.TokenData(email=email)
     except JWTError:
         raise credentials_exception
-        
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+
+    cache = obter_cache()
+    if settings.AUTH_CACHE_ATIVO:
+        usuario = cache.obter_usuario(token_data.email)
+        if usuario is not None:
+            return usuario
+
+    user = (
+        db.query(models.User.id, models.User.email, models.User.name)
+        .filter(models.User.email == token_data.email)
+        .first()
+    )
     if user is None:
         raise credentials_exception
+    usuario = UsuarioAutenticado(id=user.id, email=user.email, name=user.name)
+    if settings.AUTH_CACHE_ATIVO:
+        cache.guardar_usuario(usuario)
+    return usuario
+
+
+def get_current_db_user(
+    current_user: UsuarioAutenticado = Depends(get_current_user), db: Session = Depends(get_db)
+) -> models.User:
+    """Linha completa do usuário na sessão, para endpoints que a alteram."""
+    user = db.get(models.User, current_user.id)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 # --- ENDPOINTS ---
 
-@router.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = get_password_hash(user.password)
+_sobrecarga = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Muitos acessos ao mesmo tempo. Tente novamente em instantes.",
+    headers={"Retry-After": "1"},
+)
+
+
+def _buscar_por_email(db: Session, email: str) -> Optional[models.User]:
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def _criar_usuario(db: Session, user: schemas.UserCreate, hashed_password: str) -> models.User:
     new_user = models.User(
         email=user.email, 
         hashed_password=hashed_password,
@@ -55,15 +114,47 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     return new_user
 
 
+def _salvar_hash(db: Session, user: models.User, hashed_password: str) -> None:
+    user.hashed_password = hashed_password
+    db.commit()
+
+
+# Cadastro e login são async para esperar o pool do bcrypt sem segurar uma thread;
+# cada passo no banco (sessão síncrona) vai para o threadpool, fora do event loop.
+
+@router.post("/register", response_model=schemas.User)
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+    db_user = await run_in_threadpool(_buscar_por_email, db, user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    try:
+        hashed_password = await get_password_hash_async(user.password)
+    except SenhasSobrecarregadas:
+        raise _sobrecarga
+    return await run_in_threadpool(_criar_usuario, db, user, hashed_password)
+
+
 @router.post("/token", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    user = await run_in_threadpool(_buscar_por_email, db, form_data.username)
+    try:
+        senha_correta = user is not None and await verify_password_async(form_data.password, user.hashed_password)
+    except SenhasSobrecarregadas:
+        raise _sobrecarga
+    if not senha_correta:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if precisa_rehash(user.hashed_password):
+        # Custo do bcrypt mudou: refaz o hash agora que temos a senha em claro
+        try:
+            novo_hash = await get_password_hash_async(form_data.password)
+            await run_in_threadpool(_salvar_hash, db, user, novo_hash)
+        except SenhasSobrecarregadas:
+            pass  # Fica para o próximo login
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.email}, expires_delta=access_token_expires
@@ -72,7 +163,7 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
 
 
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: models.User = Depends(get_current_user)):
+def read_users_me(current_user: UsuarioAutenticado = Depends(get_current_user)):
     return current_user
 
 
@@ -80,48 +171,96 @@ def read_users_me(current_user: models.User = Depends(get_current_user)):
 def update_profile(
     profile_data: schemas.ProfileUpdate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_db_user)
 ):
     if profile_data.name is not None:
         current_user.name = profile_data.name
     
     db.commit()
     db.refresh(current_user)
+    obter_cache().invalidar_usuario(current_user.email)
     return current_user
 
 
+def _remover_foto_sem_uso(db: Session, chave: Optional[str], miniaturas: Optional[dict]) -> None:
+    # Arquivos são endereçados pelo conteúdo: outro usuário (ou uma transcrição) pode usar o mesmo
+    if not chave or chave_em_uso(db, chave):
+        return
+    remover_sem_uso(db, chave, *(miniaturas or {}).values())
+
+
+def _trocar_foto(db: Session, user: models.User, foto: Optional[fotos.FotoArmazenada]) -> None:
+    anterior = (user.foto_chave, user.foto_miniaturas)
+    user.foto_chave = foto.chave if foto else None
+    user.foto_tipo = foto.tipo if foto else None
+    user.foto_miniaturas = foto.miniaturas if foto else None
+    db.commit()
+    if anterior[0] != user.foto_chave:
+        _remover_foto_sem_uso(db, *anterior)
+
+
 @router.post("/profile/photo")
 async def upload_profile_photo(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_db_user)
 ):
-    # Lê o conteúdo do arquivo
-    content = await file.read()
-    
-    # Atualiza o usuário
-    current_user.profile_pic = content
-    db.commit()
-    
+    # Lê o conteúdo em blocos, validando tamanho e formato
+    content = await fotos.ler_upload(file)
+    try:
+        foto = await run_in_threadpool(fotos.armazenar_foto, content)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(ve))
+
+    await run_in_threadpool(_trocar_foto, db, current_user, foto)
     return {"message": "Foto de perfil atualizada com sucesso"}
 
 
 @router.delete("/profile/photo")
 async def delete_profile_photo(
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_db_user)
 ):
-    current_user.profile_pic = None
-    db.commit()
+    await run_in_threadpool(_trocar_foto, db, current_user, None)
     return {"message": "Foto de perfil removida com sucesso"}
 
 
 @router.get("/profile/photo/{user_id}")
-async def get_profile_photo(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user or not user.profile_pic:
+async def get_profile_photo(
+    user_id: int,
+    request: Request,
+    tamanho: Optional[int] = Query(None, description="Lado da miniatura quadrada (ex.: 64 ou 256)"),
+    db: SessaoLeitura = Depends(get_db_leitura),
+):
+    foto = (
+        await db.executar(
+            select(models.User.foto_chave, models.User.foto_tipo, models.User.foto_miniaturas)
+            .where(models.User.id == user_id)
+        )
+    ).first()
+    if not foto or not foto.foto_chave:
         # Se não houver foto, podemos retornar um 404 ou um placeholder
         # Aqui, vamos lançar 404 para o app tratar
         raise HTTPException(status_code=404, detail="Foto não encontrada")
-    
-    return Response(content=user.profile_pic, media_type="image/jpeg")
+
+    chave, tipo = foto.foto_chave, foto.foto_tipo or "image/jpeg"
+    if tamanho is not None:
+        if tamanho not in settings.FOTO_MINIATURAS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Tamanho inválido. Disponíveis: {', '.join(map(str, settings.FOTO_MINIATURAS))}",
+            )
+        # Fotos sem miniatura (ex.: sem Pillow) caem no original
+        miniatura = (foto.foto_miniaturas or {}).get(str(tamanho))
+        if miniatura:
+            chave, tipo = miniatura, "image/jpeg"
+
+    # A chave é o sha256 do conteúdo: ETag forte; o cliente revalida a cada uso
+    cabecalhos = {"ETag": f'"{chave}"', "Cache-Control": "public, no-cache"}
+    if condicional.nao_modificado(request, cabecalhos["ETag"], None):
+        return Response(status_code=304, headers=cabecalhos)
+    caminho = obter_armazenamento().caminho(chave)
+    if not os.path.exists(caminho):
+        raise HTTPException(status_code=404, detail="Foto não encontrada")
+    # FileResponse atende Range / If-Range com o ETag acima
+    return FileResponse(caminho, media_type=tipo, headers=cabecalhos)
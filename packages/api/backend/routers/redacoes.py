@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
-from sqlalchemy.orm import Session
-from typing import List
+import base64
+import json
+from datetime import datetime
 
-from shared import models, schemas
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, File, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session, undefer
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
+
+from shared import models, schemas, eventos
+from shared.armazenamento import obter_armazenamento
+from shared.config import settings
 from shared.schemas import RedacaoStatusEnum
-from backend.core.database import get_db
+from backend.core import condicional, fotos
+from backend.core.cache_usuarios import UsuarioAutenticado
+from backend.core.limites import ResultadoCota, exigir_cota
+from backend.core.database import SessaoLeitura, get_db, get_db_leitura
 from backend.routers.auth import get_current_user
 from backend.celery_app import celery_app
 
@@ -19,14 +31,19 @@ router = APIRouter(
 @router.post("/extract-text")
 async def extrair_texto(
     file: UploadFile = File(...),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+    _cota: ResultadoCota = Depends(exigir_cota("ocr", "Você atingiu o limite de {limite} transcrições no período. Tente novamente mais tarde.")),
 ):
     """
     Recebe uma foto de redação e retorna o texto transcrito via IA.
+    Modo síncrono de compatibilidade: a chamada ao Gemini é assíncrona e não trava
+    o event loop, mas a requisição fica aberta até o fim. Prefira `POST /transcricoes`.
     """
     try:
         image_content = await file.read()
-        texto = await extrair_texto_da_imagem_async(image_content)
+        texto = await extrair_texto_da_imagem_async(
+            image_content, fotos.detectar_formato(image_content[:16]) or "image/jpeg"
+        )
         return {"texto": texto}
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
@@ -37,8 +54,86 @@ async def extrair_texto(
         )
 
 
+@router.post(
+    "/transcricoes",
+    response_model=schemas.TranscricaoStatus,
+    status_code=202,
+    summary="Enviar uma foto de redação para transcrição (OCR) em segundo plano",
+)
+async def criar_transcricao(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+    _cota: ResultadoCota = Depends(exigir_cota("ocr", "Você atingiu o limite de {limite} transcrições no período. Tente novamente mais tarde.")),
+):
+    """
+    Guarda a foto e enfileira a transcrição na fila "ocr"; a API responde na hora,
+    sem esperar o Gemini. Acompanhe por `GET /transcricoes/{id}` ou pelo stream.
+    """
+    imagem = await fotos.ler_upload(file, settings.OCR_TAMANHO_MAXIMO)
+
+    def _registrar() -> models.Transcricao:
+        # Arquivo e banco fora do event loop
+        transcricao = models.Transcricao(
+            user_id=current_user.id,
+            status=RedacaoStatusEnum.PENDENTE,
+            imagem_chave=obter_armazenamento().salvar(imagem),
+            imagem_tipo=fotos.detectar_formato(imagem[:16]),
+        )
+        db.add(transcricao)
+        db.commit()
+        db.refresh(transcricao)
+        celery_app.send_task("transcribe_essay", args=[transcricao.id], queue="ocr")
+        return transcricao
+
+    return await run_in_threadpool(_registrar)
+
+
+def _buscar_transcricao(db: Session, transcricao_id: int, user_id: int) -> models.Transcricao:
+    transcricao = (
+        db.query(models.Transcricao)
+        .filter(models.Transcricao.id == transcricao_id, models.Transcricao.user_id == user_id)
+        .first()
+    )
+    if transcricao is None:
+        raise HTTPException(status_code=404, detail="Transcrição não encontrada")
+    return transcricao
+
+
+@router.get("/transcricoes/{transcricao_id}", response_model=schemas.TranscricaoStatus)
+def read_transcricao(
+    transcricao_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    """Status da transcrição; com CONCLUIDO traz o `texto`, com ERRO a mensagem em `erro`."""
+    return _buscar_transcricao(db, transcricao_id, current_user.id)
+
+
+@router.get(
+    "/transcricoes/{transcricao_id}/stream",
+    summary="Acompanhar a transcrição em tempo real (Server-Sent Events)",
+)
+async def stream_transcricao(
+    transcricao_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    """Envia o status atual, as mudanças e o evento `fim`; depois busque o texto em `GET /transcricoes/{id}`."""
+    transcricao = await run_in_threadpool(_buscar_transcricao, db, transcricao_id, current_user.id)
+    return await _transmitir_eventos(
+        transcricao,
+        db,
+        tipos={eventos.EVENTO_STATUS},
+        enviar_status_inicial=True,
+        canal=eventos.canal_transcricao(transcricao.id),
+    )
+
+
 @router.get("/sugestao-tema")
-async def obter_sugestao_tema():
+async def obter_sugestao_tema(
+    _cota: ResultadoCota = Depends(exigir_cota("sugestao_tema", "Você atingiu o limite de {limite} sugestões de tema no período. Tente novamente mais tarde.")),
+):
     """
     Gera um tema inédito e textos motivadores via IA.
     """
@@ -60,27 +155,10 @@ async def obter_sugestao_tema():
 def criar_correcao(
     redacao: schemas.RedacaoCreate, 
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+    # Limite de redações por dia (janela deslizante de 24 h)
+    cota: ResultadoCota = Depends(exigir_cota("correcao", "Você atingiu o limite de {limite} redações por dia. Tente novamente mais tarde!")),
 ):
-    from datetime import datetime, timedelta
-    from sqlalchemy import func
-    
-    # Verificar limite diário de 5 redações
-    hoje = datetime.now().date()
-    amanha = hoje + timedelta(days=1)
-    
-    redacoes_hoje = db.query(models.Redacao).filter(
-        models.Redacao.user_id == current_user.id,
-        models.Redacao.criado_em >= hoje,
-        models.Redacao.criado_em < amanha
-    ).count()
-    
-    if redacoes_hoje >= 5:
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Você atingiu o limite de 5 redações por dia. Tente novamente amanhã!"
-        )
-    
     db_redacao = models.Redacao(
         tema=redacao.tema, 
         texto_redacao=redacao.texto_redacao, 
@@ -96,7 +174,7 @@ def criar_correcao(
     return {
         "id": db_redacao.id,
         "status": RedacaoStatusEnum.PENDENTE,
-        "message": f"Sua redação foi recebida e está na fila para correção. ({redacoes_hoje + 1}/5 redações hoje)",
+        "message": f"Sua redação foi recebida e está na fila para correção. ({cota.usados}/{cota.limite} redações hoje)",
     }
 
 
@@ -105,36 +183,275 @@ def criar_correcao(
     response_model=List[schemas.RedacaoResult],
     summary="Listar todas as redações do usuário logado",
 )
-def listar_minhas_redacoes(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+async def listar_minhas_redacoes(
+    request: Request,
+    response: Response,
+    db: SessaoLeitura = Depends(get_db_leitura),
+    current_user: UsuarioAutenticado = Depends(get_current_user)
 ):
-    return db.query(models.Redacao).filter(models.Redacao.user_id == current_user.id).all()
+    """
+    Suporta GET condicional: a versão da listagem (quantidade, última atualização
+    e maior id) vem de uma agregação no índice, sem ler os resultados.
+    """
+    quantidade, ultima_atualizacao, maior_id = (
+        await db.executar(
+            select(
+                func.count(models.Redacao.id),
+                func.max(models.Redacao.atualizado_em),
+                func.max(models.Redacao.id),
+            ).where(models.Redacao.user_id == current_user.id)
+        )
+    ).one()
+    etag = condicional.gerar_etag("lista", current_user.id, quantidade, ultima_atualizacao, maior_id)
+    nao_modificado = condicional.responder_se_nao_modificado(request, response, etag, ultima_atualizacao)
+    if nao_modificado is not None:
+        return nao_modificado
+
+    return (await db.executar(select(models.Redacao).where(models.Redacao.user_id == current_user.id))).scalars().all()
+
+
+def _codificar_cursor(criado_em: datetime, redacao_id: int) -> str:
+    dados = json.dumps({"c": criado_em.isoformat(), "i": redacao_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        dados = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(dados["c"]), int(dados["i"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido.")
+
+
+@router.get(
+    "/historico",
+    response_model=schemas.PaginaHistorico,
+    summary="Histórico resumido de redações, paginado por cursor",
+)
+async def listar_historico(
+    limite: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: SessaoLeitura = Depends(get_db_leitura),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    """
+    Redações do usuário da mais recente para a mais antiga, só com as colunas do
+    resumo (notas desnormalizadas): nem o texto nem o resultado completo são lidos.
+    A paginação é por cursor (keyset em criado_em, id), com custo constante por página
+    em qualquer ponto do histórico. O detalhe de uma redação fica em `GET /{id}`.
+    """
+    consulta = select(
+        models.Redacao.id,
+        models.Redacao.tema,
+        models.Redacao.status,
+        models.Redacao.criado_em,
+        models.Redacao.nota_final,
+        models.Redacao.notas_competencias,
+    ).where(models.Redacao.user_id == current_user.id)
+    if cursor:
+        criado_em, redacao_id = _decodificar_cursor(cursor)
+        consulta = consulta.where(
+            tuple_(models.Redacao.criado_em, models.Redacao.id) < tuple_(criado_em, redacao_id)
+        )
+    # Uma linha a mais só para saber se há próxima página
+    linhas = (
+        await db.executar(
+            consulta.order_by(models.Redacao.criado_em.desc(), models.Redacao.id.desc()).limit(limite + 1)
+        )
+    ).all()
+
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = _codificar_cursor(linhas[-1].criado_em, linhas[-1].id)
+    return {"itens": linhas, "proximo_cursor": proximo_cursor}
 
 
 @router.get("/{redacao_id}", response_model=schemas.RedacaoResult)
-def read_redacao(
+async def read_redacao(
+    redacao_id: int,
+    request: Request,
+    response: Response,
+    db: SessaoLeitura = Depends(get_db_leitura),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    """Suporta GET condicional (If-None-Match / If-Modified-Since) com a versão status + atualizado_em."""
+    versao = (
+        await db.executar(
+            select(models.Redacao.status, models.Redacao.atualizado_em).where(
+                models.Redacao.id == redacao_id, models.Redacao.user_id == current_user.id
+            )
+        )
+    ).first()
+    if versao is None:
+        raise HTTPException(status_code=404, detail="Redação não encontrada")
+    etag = condicional.gerar_etag("redacao", redacao_id, versao.status, versao.atualizado_em)
+    nao_modificado = condicional.responder_se_nao_modificado(request, response, etag, versao.atualizado_em)
+    if nao_modificado is not None:
+        return nao_modificado
+
+    redacao = (
+        await db.executar(
+            select(models.Redacao).where(
+                models.Redacao.id == redacao_id, models.Redacao.user_id == current_user.id
+            )
+        )
+    ).scalars().first()
+    if redacao is None:
+        raise HTTPException(status_code=404, detail="Redação não encontrada")
+    return redacao
+
+
+@router.get(
+    "/{redacao_id}/detalhes",
+    response_model=schemas.RedacaoDetalhes,
+    summary="Correções individuais de cada corretor (auditoria)",
+)
+def read_detalhes_redacao(
     redacao_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
 ):
+    """
+    Devolve as correções completas dos Corretores 1, 2 e do Supervisor, guardadas
+    comprimidas fora do resultado consolidado. Vazio enquanto a correção não termina.
+    """
     redacao = (
         db.query(models.Redacao)
+        .options(undefer(models.Redacao.detalhes_comprimidos))
         .filter(
             models.Redacao.id == redacao_id, models.Redacao.user_id == current_user.id
         )
         .first()
     )
+    if redacao is None:
+        raise HTTPException(status_code=404, detail="Redação não encontrada")
+    return {"id": redacao.id, "detalhes": redacao.detalhes or []}
+
+
+def _formatar_sse(tipo: str, dados: Dict[str, Any]) -> str:
+    return f"event: {tipo}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+
+
+STATUS_FINAIS = (RedacaoStatusEnum.CONCLUIDO, RedacaoStatusEnum.ERRO)
+
+
+def _buscar_redacao(db: Session, redacao_id: int, user_id: int) -> models.Redacao:
+    redacao = (
+        db.query(models.Redacao)
+        .filter(models.Redacao.id == redacao_id, models.Redacao.user_id == user_id)
+        .first()
+    )
     if redacao is None:
         raise HTTPException(status_code=404, detail="Redação não encontrada")
     return redacao
 
 
+async def _transmitir_eventos(
+    redacao: Union[models.Redacao, models.Transcricao],
+    db: Session,
+    tipos: Optional[Set[str]] = None,
+    enviar_status_inicial: bool = False,
+    canal: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Repassa por SSE os eventos publicados pelo worker para a redação até o `fim`.
+    `tipos` filtra os eventos repassados (o `fim` sempre passa). Com
+    `enviar_status_inicial`, o primeiro evento é o status atual do banco.
+    Transcrições passam o próprio `canal`.
+    """
+    def _evento_status(status_redacao: str) -> str:
+        return _formatar_sse(eventos.EVENTO_STATUS, {"tipo": eventos.EVENTO_STATUS, "status": status_redacao})
+
+    def _resposta_final(status_redacao: str) -> StreamingResponse:
+        mensagens = [_evento_status(status_redacao)] if enviar_status_inicial else []
+        mensagens.append(_formatar_sse(eventos.EVENTO_FIM, {"tipo": eventos.EVENTO_FIM, "status": status_redacao}))
+        return StreamingResponse(iter(mensagens), media_type="text/event-stream")
+
+    if redacao.status in STATUS_FINAIS:
+        return _resposta_final(redacao.status)
+
+    # Assina antes de reconsultar o status para não perder o evento de fim
+    assinatura = eventos.Assinatura(redacao.id, canal=canal)
+    try:
+        await assinatura.__aenter__()
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Acompanhamento em tempo real indisponível. Consulte o status da redação.",
+        )
+
+    await run_in_threadpool(db.refresh, redacao)
+    status_atual = redacao.status
+    if status_atual in STATUS_FINAIS:
+        await assinatura.__aexit__(None, None, None)
+        return _resposta_final(status_atual)
+    # A conexão fica aberta pela correção inteira: não segura uma conexão do pool
+    await run_in_threadpool(db.close)
+
+    async def _repassar():
+        try:
+            if enviar_status_inicial:
+                yield _evento_status(status_atual)
+            async for evento in assinatura.eventos():
+                if evento is None:
+                    yield ": keepalive\n\n"
+                    continue
+                tipo = evento.get("tipo", "mensagem")
+                if tipos is None or tipo in tipos or tipo == eventos.EVENTO_FIM:
+                    yield _formatar_sse(tipo, evento)
+        finally:
+            await assinatura.__aexit__(None, None, None)
+
+    return StreamingResponse(
+        _repassar(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get(
+    "/{redacao_id}/status/stream",
+    summary="Acompanhar o status da correção em tempo real (Server-Sent Events)",
+)
+async def stream_status(
+    redacao_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    """
+    Substitui o polling de `GET /{redacao_id}`: envia o status atual (evento `status`),
+    cada mudança publicada pelo worker (PENDENTE -> PROCESSANDO, retentativas) e
+    encerra com o evento `fim` (CONCLUIDO ou ERRO). Depois dele, busque o resultado uma vez.
+    """
+    redacao = await run_in_threadpool(_buscar_redacao, db, redacao_id, current_user.id)
+    return await _transmitir_eventos(
+        redacao, db, tipos={eventos.EVENTO_STATUS}, enviar_status_inicial=True
+    )
+
+
+@router.get(
+    "/{redacao_id}/feedback/stream",
+    summary="Acompanhar o feedback geral em tempo real (Server-Sent Events)",
+)
+async def stream_feedback(
+    redacao_id: int,
+    db: Session = Depends(get_db),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
+):
+    """
+    Repassa os trechos do comentário geral de cada corretor conforme o LLM os gera
+    (evento `feedback`) e encerra com o evento `fim` quando a correção termina.
+    """
+    redacao = await run_in_threadpool(_buscar_redacao, db, redacao_id, current_user.id)
+    return await _transmitir_eventos(redacao, db, tipos={eventos.EVENTO_FEEDBACK})
+
+
 @router.delete("/{redacao_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_redacao(
     redacao_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: UsuarioAutenticado = Depends(get_current_user),
 ):
     redacao = (
         db.query(models.Redacao)
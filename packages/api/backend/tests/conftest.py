@@ -65,3 +65,26 @@ def mock_celery(monkeypatch):
     mock_send_task = MagicMock()
     monkeypatch.setattr(celery_app, "send_task", mock_send_task)
     return mock_send_task
+
+@pytest.fixture(autouse=True)
+def cotas_sem_redis(monkeypatch):
+    """
+    Cotas de uso isoladas por teste, no contador alternativo (banco / memória).
+    """
+    from backend.core import limites
+
+    servico = limites.ServicoCotas("redis://indisponivel:6379/0")
+    monkeypatch.setattr(servico, "_consumir_redis", lambda *args: None)
+    monkeypatch.setattr(limites, "_servico", servico)
+    return servico
+
+@pytest.fixture(autouse=True)
+def cache_de_usuarios_limpo():
+    """
+    Cada teste cria um banco novo: ids e emails se repetem entre testes.
+    """
+    from backend.core.cache_usuarios import obter_cache
+
+    obter_cache().limpar()
+    yield
+    obter_cache().limpar()
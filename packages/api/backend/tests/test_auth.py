@@ -1,3 +1,5 @@
+import pytest
+
 def test_register_user(client):
     response = client.post("/register", json={"email": "test@example.com", "password": "securepassword"})
     assert response.status_code == 200
@@ -24,3 +26,158 @@ def test_login_invalid_credentials(client):
     response = client.post("/token", data={"username": "fail@example.com", "password": "wrong"})
     assert response.status_code == 401
     assert response.json()["detail"] == "Incorrect username or password"
+
+def _png(lado=8):
+    import struct
+    import zlib
+
+    def _bloco(tipo, dados):
+        return struct.pack(">I", len(dados)) + tipo + dados + struct.pack(">I", zlib.crc32(tipo + dados))
+
+    linhas = b"".join(b"\x00" + b"\xff\x00\x00" * lado for _ in range(lado))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _bloco(b"IHDR", struct.pack(">IIBBBBB", lado, lado, 8, 2, 0, 0, 0))
+        + _bloco(b"IDAT", zlib.compress(linhas))
+        + _bloco(b"IEND", b"")
+    )
+
+def _login(client, email):
+    client.post("/register", json={"email": email, "password": "pass"})
+    token = client.post("/token", data={"username": email, "password": "pass"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def armazenamento(monkeypatch, tmp_path):
+    from shared import armazenamento as modulo
+
+    local = modulo.ArmazenamentoLocal(str(tmp_path))
+    monkeypatch.setattr(modulo, "_armazenamento", local)
+    return local
+
+def test_foto_de_perfil_no_armazenamento_com_etag_e_range(client, armazenamento):
+    headers = _login(client, "foto@example.com")
+    foto = _png()
+    resposta = client.post("/profile/photo", files={"file": ("foto.png", foto, "image/png")}, headers=headers)
+    assert resposta.status_code == 200
+    user_id = client.get("/me", headers=headers).json()["id"]
+
+    baixada = client.get(f"/profile/photo/{user_id}")
+    assert baixada.status_code == 200
+    assert baixada.content == foto
+    assert baixada.headers["content-type"] == "image/png"
+    etag = baixada.headers["etag"]
+    assert etag == f'"{armazenamento.chave(foto)}"'
+    assert armazenamento.existe(armazenamento.chave(foto))
+
+    assert client.get(f"/profile/photo/{user_id}", headers={"If-None-Match": etag}).status_code == 304
+    parcial = client.get(f"/profile/photo/{user_id}", headers={"Range": "bytes=0-7"})
+    assert parcial.status_code == 206
+    assert parcial.content == foto[:8]
+
+    # Miniatura (ou o original, sem Pillow) e tamanho fora da lista
+    assert client.get(f"/profile/photo/{user_id}?tamanho=64").status_code == 200
+    assert client.get(f"/profile/photo/{user_id}?tamanho=65").status_code == 400
+
+    assert client.delete("/profile/photo", headers=headers).status_code == 200
+    assert client.get(f"/profile/photo/{user_id}").status_code == 404
+    assert not armazenamento.existe(armazenamento.chave(foto))
+
+def test_upload_de_foto_valida_formato_e_tamanho(client, armazenamento, monkeypatch):
+    from shared.config import settings
+
+    headers = _login(client, "invalida@example.com")
+    texto = client.post("/profile/photo", files={"file": ("foto.png", b"nao sou imagem", "image/png")}, headers=headers)
+    assert texto.status_code == 415
+
+    monkeypatch.setattr(settings, "FOTO_TAMANHO_MAXIMO", 100)
+    grande = client.post("/profile/photo", files={"file": ("foto.png", _png(64), "image/png")}, headers=headers)
+    assert grande.status_code == 413
+
+def test_usuario_autenticado_vem_do_cache_ate_o_perfil_mudar(client, db_session):
+    from sqlalchemy import event
+
+    headers = _login(client, "cache@example.com")
+    consultas = []
+
+    def _registrar(conn, cursor, statement, *args):
+        if "FROM users" in statement:
+            consultas.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", _registrar)
+    try:
+        assert client.get("/me", headers=headers).json()["name"] is None
+        assert client.get("/me", headers=headers).status_code == 200
+        assert len(consultas) == 1
+
+        assert client.patch("/profile", json={"name": "Novo Nome"}, headers=headers).status_code == 200
+        assert client.get("/me", headers=headers).json()["name"] == "Novo Nome"
+    finally:
+        event.remove(db_session.bind, "before_cursor_execute", _registrar)
+
+def test_cache_ttl_expira_e_descarta_o_menos_usado(monkeypatch):
+    import time
+
+    from backend.core import cache_usuarios
+
+    cache = cache_usuarios.CacheTTL(max_entradas=2)
+    cache.guardar("a", 1, ttl=60)
+    cache.guardar("b", 2, ttl=60)
+    cache.obter("a")
+    cache.guardar("c", 3, ttl=60)
+    assert (cache.obter("a"), cache.obter("b"), cache.obter("c")) == (1, None, 3)
+
+    agora = time.monotonic()
+    monkeypatch.setattr(cache_usuarios.time, "monotonic", lambda: agora + 61)
+    assert cache.obter("a") is None
+
+def test_cache_nao_estende_a_validade_do_token():
+    import time
+
+    from backend.core.cache_usuarios import CacheAutenticacao
+
+    cache = CacheAutenticacao(max_entradas=10)
+    cache.guardar_token("valido", {"sub": "a@b.c", "exp": time.time() + 3600})
+    cache.guardar_token("expirado", {"sub": "a@b.c", "exp": time.time() - 1})
+    assert cache.obter_token("valido")["sub"] == "a@b.c"
+    assert cache.obter_token("expirado") is None
+
+def test_login_refaz_o_hash_quando_o_custo_muda(client, db_session, monkeypatch):
+    from shared import models
+    from shared.config import settings
+
+    monkeypatch.setattr(settings, "SENHA_BCRYPT_CUSTO", 4)
+    client.post("/register", json={"email": "custo@example.com", "password": "senha"})
+    monkeypatch.setattr(settings, "SENHA_BCRYPT_CUSTO", 5)
+
+    response = client.post("/token", data={"username": "custo@example.com", "password": "senha"})
+    assert response.status_code == 200
+    user = db_session.query(models.User).filter(models.User.email == "custo@example.com").one()
+    db_session.refresh(user)
+    assert user.hashed_password.startswith("$2b$05$")
+
+def test_pool_de_senhas_cheio_responde_503(client, monkeypatch):
+    from backend.core import security
+    from shared.config import settings
+
+    monkeypatch.setattr(security, "_em_andamento", settings.SENHA_PROCESSOS + settings.SENHA_FILA_MAXIMA)
+    response = client.post("/token", data={"username": "qualquer@example.com", "password": "x"})
+    # Usuário inexistente não chega ao bcrypt
+    assert response.status_code == 401
+
+    response = client.post("/register", json={"email": "rajada@example.com", "password": "senha"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_trocar_a_foto_nao_apaga_imagem_de_transcricao_pendente(client, db_session, armazenamento):
+    from shared import models
+
+    headers = _login(client, "mesma-imagem@example.com")
+    foto = _png()
+    client.post("/profile/photo", files={"file": ("foto.png", foto, "image/png")}, headers=headers)
+    # Uma transcrição pendente com o mesmo arquivo (mesma chave)
+    db_session.add(models.Transcricao(status="PENDENTE", imagem_chave=armazenamento.chave(foto)))
+    db_session.commit()
+
+    assert client.delete("/profile/photo", headers=headers).status_code == 200
+    assert armazenamento.existe(armazenamento.chave(foto))
@@ -0,0 +1,24 @@
+from backend.core import database
+from shared.models import argumentos_pool
+
+
+def test_pool_separado_para_api_e_worker(monkeypatch):
+    monkeypatch.setattr(database.settings, "DB_POOL_API_TAMANHO", 12)
+    monkeypatch.setattr(database.settings, "DB_POOL_WORKER_TAMANHO", 3)
+    url = "postgresql://admin:senha@db:5432/enem"
+
+    api = argumentos_pool(url, "api")
+    worker = argumentos_pool(url, "worker")
+
+    assert (api["pool_size"], worker["pool_size"]) == (12, 3)
+    assert api["pool_pre_ping"] and api["pool_recycle"] == database.settings.DB_POOL_RECICLAR_SEGUNDOS
+    assert argumentos_pool("sqlite:///:memory:", "api") == {}
+
+
+def test_url_async_troca_o_driver(monkeypatch):
+    monkeypatch.setattr(database.settings, "DATABASE_URL_ASYNC", None)
+    monkeypatch.setattr(database, "DATABASE_URL", "postgresql://admin:senha@db:5432/enem")
+    assert database.url_async() == "postgresql+asyncpg://admin:senha@db:5432/enem"
+
+    monkeypatch.setattr(database.settings, "DATABASE_URL_ASYNC", "postgresql+asyncpg://outro/enem")
+    assert database.url_async() == "postgresql+asyncpg://outro/enem"
@@ -60,3 +60,327 @@ def test_submit_empty_essay(client):
         headers=headers
     )
     assert response.status_code == 422
+
+def criar_redacao_direto(client, db_session, headers, status=RedacaoStatusEnum.CONCLUIDO, **campos):
+    from shared import models
+
+    user_id = client.get("/me", headers=headers).json()["id"]
+    redacao = models.Redacao(
+        tema=campos.pop("tema", "Tema"),
+        texto_redacao=campos.pop("texto_redacao", "Texto " * 60),
+        status=status,
+        user_id=user_id,
+        **campos,
+    )
+    db_session.add(redacao)
+    db_session.commit()
+    db_session.refresh(redacao)
+    return redacao
+
+def test_stream_feedback_de_redacao_concluida_encerra_imediatamente(client, db_session):
+    token = get_auth_token(client, email="stream@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    redacao = criar_redacao_direto(client, db_session, headers)
+
+    response = client.get(f"/api/v1/redacoes/{redacao.id}/feedback/stream", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert "event: fim" in response.text
+    assert '"status": "CONCLUIDO"' in response.text
+
+def test_stream_status_envia_transicoes_ate_o_fim(client, db_session, monkeypatch):
+    from shared import eventos
+
+    class AssinaturaFalsa:
+        def __init__(self, redacao_id, canal=None):
+            self.redacao_id = redacao_id
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc_info):
+            pass
+
+        async def eventos(self, intervalo_keepalive=15.0):
+            yield {"tipo": eventos.EVENTO_STATUS, "status": "PROCESSANDO"}
+            yield {"tipo": eventos.EVENTO_FEEDBACK, "corretor": "Corretor 1", "trecho": "Bom texto"}
+            yield None
+            yield {"tipo": eventos.EVENTO_FIM, "status": "CONCLUIDO"}
+
+    monkeypatch.setattr(eventos, "Assinatura", AssinaturaFalsa)
+    token = get_auth_token(client, email="status@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    redacao = criar_redacao_direto(client, db_session, headers, status=RedacaoStatusEnum.PENDENTE)
+
+    response = client.get(f"/api/v1/redacoes/{redacao.id}/status/stream", headers=headers)
+
+    assert response.status_code == 200
+    blocos = [b for b in response.text.split("\n\n") if b.startswith("event:")]
+    assert [b.split("\n")[0] for b in blocos] == ["event: status", "event: status", "event: fim"]
+    assert '"status": "PENDENTE"' in blocos[0]
+    assert '"status": "PROCESSANDO"' in blocos[1]
+    assert "Bom texto" not in response.text
+
+def test_leitura_condicional_responde_304_ate_a_redacao_mudar(client, db_session):
+    token = get_auth_token(client, email="etag@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    redacao = criar_redacao_direto(client, db_session, headers, status=RedacaoStatusEnum.PROCESSANDO)
+    url = f"/api/v1/redacoes/{redacao.id}"
+
+    primeira = client.get(url, headers=headers)
+    etag = primeira.headers["etag"]
+    assert primeira.status_code == 200
+    assert "last-modified" in primeira.headers
+
+    repetida = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.content == b""
+
+    redacao.status = RedacaoStatusEnum.CONCLUIDO
+    redacao.resultado_json = {"nota_final": 800}
+    db_session.commit()
+
+    atualizada = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert atualizada.status_code == 200
+    assert atualizada.headers["etag"] != etag
+    assert atualizada.json()["resultado_json"] == {"nota_final": 800}
+
+
+def test_listagem_condicional_muda_com_nova_redacao(client, db_session):
+    token = get_auth_token(client, email="etag-lista@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    criar_redacao_direto(client, db_session, headers)
+
+    primeira = client.get("/api/v1/redacoes/", headers=headers)
+    etag = primeira.headers["etag"]
+    assert client.get("/api/v1/redacoes/", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    criar_redacao_direto(client, db_session, headers)
+    nova = client.get("/api/v1/redacoes/", headers={**headers, "If-None-Match": etag})
+    assert nova.status_code == 200
+    assert len(nova.json()) == 2
+
+def test_historico_paginado_por_cursor_sem_o_resultado_completo(client, db_session):
+    from datetime import datetime, timedelta
+
+    token = get_auth_token(client, email="historico@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    for i in range(5):
+        redacao = criar_redacao_direto(
+            client, db_session, headers, tema=f"Tema {i}",
+            # Duas redações no mesmo instante: o id desempata
+            criado_em=base + timedelta(minutes=min(i, 3)),
+        )
+        redacao.definir_resultado({"nota_final": 600 + i * 40, "competencias": [{"nota": 120}] * 5, "detalhes": []})
+    db_session.commit()
+
+    vistos = []
+    cursor = None
+    while True:
+        params = {"limite": 2, **({"cursor": cursor} if cursor else {})}
+        pagina = client.get("/api/v1/redacoes/historico", params=params, headers=headers).json()
+        vistos.extend(pagina["itens"])
+        cursor = pagina["proximo_cursor"]
+        if cursor is None:
+            break
+
+    assert [item["tema"] for item in vistos] == ["Tema 4", "Tema 3", "Tema 2", "Tema 1", "Tema 0"]
+    assert vistos[0]["nota_final"] == 760
+    assert vistos[0]["notas_competencias"] == [120] * 5
+    assert "resultado_json" not in vistos[0]
+    assert client.get("/api/v1/redacoes/historico", params={"cursor": "???"}, headers=headers).status_code == 400
+
+def test_detalhes_dos_corretores_ficam_comprimidos_fora_do_resultado(client, db_session):
+    token = get_auth_token(client, email="detalhes@test.com")
+    headers = {"Authorization": f"Bearer {token}"}
+    redacao = criar_redacao_direto(client, db_session, headers)
+    detalhes = [{"id_corretor": "Corretor 1", "nota_final": 800}, {"id_corretor": "Corretor 2", "nota_final": 760}]
+    redacao.definir_resultado({"nota_final": 780, "competencias": [], "detalhes": detalhes})
+    db_session.commit()
+
+    resultado = client.get(f"/api/v1/redacoes/{redacao.id}", headers=headers).json()["resultado_json"]
+    assert resultado == {"nota_final": 780, "competencias": []}
+
+    resposta = client.get(f"/api/v1/redacoes/{redacao.id}/detalhes", headers=headers)
+    assert resposta.status_code == 200
+    assert resposta.json() == {"id": redacao.id, "detalhes": detalhes}
+
+
+def test_compressao_le_os_dois_formatos(monkeypatch):
+    from shared import compressao
+
+    valor = {"justificativa": "Texto repetido " * 50}
+    monkeypatch.setattr(compressao.settings, "COMPRESSAO_ALGORITMO", "zlib")
+    em_zlib = compressao.comprimir_json(valor)
+    monkeypatch.setattr(compressao.settings, "COMPRESSAO_ALGORITMO", "zstd")
+    em_zstd = compressao.comprimir_json(valor)
+
+    assert em_zlib[:1] != em_zstd[:1] or compressao.zstandard is None
+    assert compressao.descomprimir_json(em_zlib) == compressao.descomprimir_json(em_zstd) == valor
+    assert len(em_zstd) < len(str(valor))
+
+def test_cota_de_correcoes_responde_429_com_retry_after(client, monkeypatch):
+    from shared.config import settings
+
+    monkeypatch.setattr(settings, "LIMITES_USO", {"correcao": {"limite": 2, "janela": 3600}})
+    headers = {"Authorization": f"Bearer {get_auth_token(client, email='cota@test.com')}"}
+    redacao = {"tema": "Tema da cota", "texto_redacao": "Texto " * 60}
+
+    respostas = [
+        client.post("/api/v1/redacoes/", json=redacao, headers=headers)
+        for _ in range(3)
+    ]
+
+    assert [r.status_code for r in respostas] == [202, 202, 429]
+    assert respostas[0].headers["RateLimit-Remaining"] == "1"
+    assert "(2/2 redações hoje)" in respostas[1].json()["message"]
+    assert respostas[2].headers["RateLimit-Limit"] == "2"
+    assert 0 < int(respostas[2].headers["Retry-After"]) <= 3600
+
+    # Outro usuário tem a própria cota
+    outro = {"Authorization": f"Bearer {get_auth_token(client, email='outro@test.com')}"}
+    assert client.post("/api/v1/redacoes/", json=redacao, headers=outro).status_code == 202
+
+def test_sugestao_de_tema_exige_login_e_respeita_a_cota(client, monkeypatch):
+    from backend.routers import redacoes
+    from shared.config import settings
+
+    async def _tema_falso():
+        return {"tema": "Tema"}
+
+    monkeypatch.setattr(redacoes, "gerar_sugestao_tema_async", _tema_falso)
+    monkeypatch.setattr(settings, "LIMITES_USO", {"sugestao_tema": {"limite": 1, "janela": 60}})
+    assert client.get("/api/v1/redacoes/sugestao-tema").status_code == 401
+
+    headers = {"Authorization": f"Bearer {get_auth_token(client, email='tema@test.com')}"}
+    assert client.get("/api/v1/redacoes/sugestao-tema", headers=headers).status_code == 200
+    bloqueada = client.get("/api/v1/redacoes/sugestao-tema", headers=headers)
+    assert bloqueada.status_code == 429
+    assert bloqueada.headers["RateLimit-Remaining"] == "0"
+
+def test_cota_usa_o_redis_quando_disponivel(monkeypatch):
+    from backend.core import limites
+
+    servico = limites.ServicoCotas("redis://redis:6379/0")
+    chamadas = []
+
+    def _script(keys, args):
+        chamadas.append((keys, args))
+        return [0, 3, "12.5"]
+
+    monkeypatch.setattr(servico, "_redis", lambda: None)
+    servico._script = _script
+    resultado = servico.consumir("ocr", 7)
+
+    assert chamadas[0][0] == ["atena:limite:ocr:7"]
+    assert not resultado.permitido
+    assert resultado.cabecalhos()["Retry-After"] == "13"
+
+def test_transcricao_vira_job_na_fila_de_ocr(client, db_session, mock_celery, monkeypatch, tmp_path):
+    from shared import armazenamento, models
+
+    local = armazenamento.ArmazenamentoLocal(str(tmp_path))
+    monkeypatch.setattr(armazenamento, "_armazenamento", local)
+    headers = {"Authorization": f"Bearer {get_auth_token(client, email='ocr@test.com')}"}
+    foto = b"\xff\xd8\xff\xe0" + b"0" * 256
+
+    response = client.post(
+        "/api/v1/redacoes/transcricoes", files={"file": ("redacao.jpg", foto, "image/jpeg")}, headers=headers
+    )
+
+    assert response.status_code == 202
+    transcricao_id = response.json()["id"]
+    assert response.json()["status"] == RedacaoStatusEnum.PENDENTE
+    mock_celery.assert_called_once_with("transcribe_essay", args=[transcricao_id], queue="ocr")
+    assert local.ler(local.chave(foto)) == foto
+
+    # O worker conclui a transcrição
+    transcricao = db_session.get(models.Transcricao, transcricao_id)
+    transcricao.status, transcricao.texto = RedacaoStatusEnum.CONCLUIDO, "Texto transcrito"
+    db_session.commit()
+
+    resultado = client.get(f"/api/v1/redacoes/transcricoes/{transcricao_id}", headers=headers).json()
+    assert resultado["status"] == RedacaoStatusEnum.CONCLUIDO
+    assert resultado["texto"] == "Texto transcrito"
+    stream = client.get(f"/api/v1/redacoes/transcricoes/{transcricao_id}/stream", headers=headers)
+    assert "event: fim" in stream.text
+
+    outro = {"Authorization": f"Bearer {get_auth_token(client, email='outro-ocr@test.com')}"}
+    assert client.get(f"/api/v1/redacoes/transcricoes/{transcricao_id}", headers=outro).status_code == 404
+
+def test_falha_no_ocr_ou_corpo_invalido_nao_gasta_a_cota(client, monkeypatch):
+    from backend.core import limites
+    from backend.routers import redacoes
+    from shared.config import settings
+
+    async def _ocr_fora_do_ar(imagem, mime_type="image/jpeg"):
+        raise RuntimeError("Gemini indisponível")
+
+    monkeypatch.setattr(redacoes, "extrair_texto_da_imagem_async", _ocr_fora_do_ar)
+    monkeypatch.setattr(settings, "LIMITES_USO", {"ocr": {"limite": 1, "janela": 3600}})
+    headers = {"Authorization": f"Bearer {get_auth_token(client, email='ocr-falho@test.com')}"}
+    foto = {"file": ("foto.png", b"\x89PNG\r\n\x1a\n" + b"0" * 32, "image/png")}
+
+    for _ in range(3):
+        assert client.post("/api/v1/redacoes/extract-text", files=foto, headers=headers).status_code == 500
+    usos = limites.obter_servico()._local._usos
+    assert all(not fila for fila in usos.values())
+
+    # Com o OCR de volta, o único uso do período continua disponível
+    async def _ocr(imagem, mime_type="image/jpeg"):
+        return "Texto"
+
+    monkeypatch.setattr(redacoes, "extrair_texto_da_imagem_async", _ocr)
+    assert client.post("/api/v1/redacoes/extract-text", files=foto, headers=headers).status_code == 200
+    assert client.post("/api/v1/redacoes/extract-text", files=foto, headers=headers).status_code == 429
+
+    # Erro na sugestão de tema também não conta
+    monkeypatch.setattr(settings, "LIMITES_USO", {"sugestao_tema": {"limite": 1, "janela": 60}})
+
+    async def _tema_falho():
+        raise RuntimeError("LLM fora do ar")
+
+    monkeypatch.setattr(redacoes, "gerar_sugestao_tema_async", _tema_falho)
+    assert client.get("/api/v1/redacoes/sugestao-tema", headers=headers).status_code == 500
+    assert client.get("/api/v1/redacoes/sugestao-tema", headers=headers).status_code == 500
+
+
+def test_corpo_invalido_devolve_o_uso_registrado_no_redis(client, cotas_sem_redis, monkeypatch):
+    from backend.core import limites
+
+    removidos = []
+
+    class _Cliente:
+        def zrem(self, chave, membro):
+            removidos.append((chave, membro))
+
+    def _consumir_redis(endpoint, user_id, limite, janela):
+        return limites.ResultadoCota(True, limite, 1, janela, ("redis", "uso-1"))
+
+    monkeypatch.setattr(cotas_sem_redis, "_consumir_redis", _consumir_redis)
+    monkeypatch.setattr(cotas_sem_redis, "_redis", lambda: _Cliente())
+    headers = {"Authorization": f"Bearer {get_auth_token(client, email='corpo-invalido@test.com')}"}
+
+    resposta = client.post("/api/v1/redacoes/", json={"tema": "Tema", "texto_redacao": "curto"}, headers=headers)
+
+    assert resposta.status_code == 422
+    assert [membro for _, membro in removidos] == ["uso-1"]
+
+
+def test_cota_no_redis_devolve_o_uso_pelo_membro(monkeypatch):
+    from backend.core import limites
+
+    servico = limites.ServicoCotas("redis://redis:6379/0")
+    removidos = []
+
+    class _Cliente:
+        def zrem(self, chave, membro):
+            removidos.append((chave, membro))
+
+    monkeypatch.setattr(servico, "_redis", lambda: _Cliente())
+    servico._script = lambda keys, args: [1, 1, "60"]
+    resultado = servico.consumir("ocr", 7)
+    servico.devolver("ocr", 7, resultado)
+
+    assert removidos == [("atena:limite:ocr:7", resultado.registro[1])]
@@ -0,0 +1,98 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Armazenamento de arquivos binários (fotos de perfil) fora do banco, endereçado
+# pelo conteúdo: a chave é o sha256 dos bytes, então o mesmo arquivo é gravado
+# uma vez só e a chave serve de ETag. Backend padrão: diretório local
+# (ARMAZENAMENTO_DIRETORIO), em subpastas pelos dois primeiros bytes da chave.
+
+
+class ArmazenamentoLocal:
+    def __init__(self, diretorio: str):
+        self.diretorio = diretorio
+
+    @staticmethod
+    def chave(dados: bytes) -> str:
+        return hashlib.sha256(dados).hexdigest()
+
+    def caminho(self, chave: str) -> str:
+        if len(chave) != 64 or any(c not in "0123456789abcdef" for c in chave):
+            raise ValueError(f"Chave de arquivo inválida: {chave!r}")
+        return os.path.join(self.diretorio, chave[:2], chave[2:4], chave)
+
+    def existe(self, chave: str) -> bool:
+        return os.path.exists(self.caminho(chave))
+
+    def salvar(self, dados: bytes) -> str:
+        """Grava os bytes (se ainda não existirem) e devolve a chave."""
+        chave = self.chave(dados)
+        destino = self.caminho(chave)
+        if os.path.exists(destino):
+            return chave
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        # Escrita atômica: quem lê nunca vê um arquivo pela metade
+        descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(destino), prefix=".tmp-")
+        try:
+            with os.fdopen(descritor, "wb") as arquivo:
+                arquivo.write(dados)
+            os.replace(temporario, destino)
+        except BaseException:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        return chave
+
+    def ler(self, chave: str) -> bytes:
+        with open(self.caminho(chave), "rb") as arquivo:
+            return arquivo.read()
+
+    def remover(self, chave: str) -> None:
+        try:
+            os.remove(self.caminho(chave))
+        except FileNotFoundError:
+            pass
+
+
+def chave_em_uso(db, chave: str) -> bool:
+    """True se alguma foto de perfil ou transcrição pendente ainda aponta para o arquivo."""
+    from shared.models import Transcricao, User
+
+    return bool(
+        db.query(User.id).filter(User.foto_chave == chave).first()
+        or db.query(Transcricao.id).filter(Transcricao.imagem_chave == chave).first()
+    )
+
+
+def remover_sem_uso(db, *chaves: Optional[str]) -> None:
+    """
+    Remove os arquivos que ninguém mais referencia. Chame depois do commit que
+    soltou a referência: o mesmo conteúdo pode estar em outra foto ou transcrição.
+    """
+    armazenamento = obter_armazenamento()
+    for chave in chaves:
+        if chave and not chave_em_uso(db, chave):
+            armazenamento.remover(chave)
+
+
+_armazenamento: Optional[ArmazenamentoLocal] = None
+_armazenamento_lock = threading.Lock()
+
+
+def obter_armazenamento() -> ArmazenamentoLocal:
+    global _armazenamento
+    if _armazenamento is None:
+        with _armazenamento_lock:
+            if _armazenamento is None:
+                backend = settings.ARMAZENAMENTO_BACKEND.lower()
+                if backend != "local":
+                    raise ValueError(f"ARMAZENAMENTO_BACKEND não suportado: {settings.ARMAZENAMENTO_BACKEND}")
+                _armazenamento = ArmazenamentoLocal(settings.ARMAZENAMENTO_DIRETORIO)
+    return _armazenamento
@@ -0,0 +1,56 @@
+import json
+import logging
+import zlib
+from typing import Any, Optional
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Compressão de JSON guardado em colunas binárias (ex.: detalhes dos corretores).
+# O primeiro byte identifica o algoritmo, então dados antigos continuam legíveis
+# se COMPRESSAO_ALGORITMO mudar. zstd é opcional (pacote zstandard); sem ele, zlib.
+
+_ZLIB = b"\x01"
+_ZSTD = b"\x02"
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depende do ambiente
+    zstandard = None
+
+_avisou_sem_zstd = False
+
+
+def _usar_zstd() -> bool:
+    global _avisou_sem_zstd
+    if settings.COMPRESSAO_ALGORITMO.lower() != "zstd":
+        return False
+    if zstandard is None:
+        if not _avisou_sem_zstd:
+            _avisou_sem_zstd = True
+            logger.warning("COMPRESSAO_ALGORITMO=zstd, mas o pacote zstandard não está instalado. Usando zlib.")
+        return False
+    return True
+
+
+def comprimir_json(valor: Any) -> bytes:
+    dados = json.dumps(valor, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if _usar_zstd():
+        return _ZSTD + zstandard.ZstdCompressor(level=settings.COMPRESSAO_NIVEL).compress(dados)
+    return _ZLIB + zlib.compress(dados, min(settings.COMPRESSAO_NIVEL, 9))
+
+
+def descomprimir_json(dados: Optional[bytes]) -> Any:
+    if not dados:
+        return None
+    algoritmo, corpo = bytes(dados[:1]), bytes(dados[1:])
+    if algoritmo == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Dados comprimidos com zstd, mas o pacote zstandard não está instalado.")
+        bruto = zstandard.ZstdDecompressor().decompress(corpo)
+    elif algoritmo == _ZLIB:
+        bruto = zlib.decompress(corpo)
+    else:
+        raise ValueError(f"Formato de compressão desconhecido: {algoritmo!r}")
+    return json.loads(bruto)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # App
@@ -10,16 +10,59 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 525600 # 1 ano para facilitar uso no Mobile
+    # Hash de senhas (bcrypt) num pool de processos próprio; SENHA_FILA_MAXIMA pedidos
+    # esperando além dos em execução, depois 503. Mudar o custo refaz o hash no login.
+    SENHA_BCRYPT_CUSTO: int = 12
+    SENHA_PROCESSOS: int = 2
+    SENHA_FILA_MAXIMA: int = 32
+    # Cache de tokens decodificados e usuários autenticados (LRU no processo com TTL;
+    # com AUTH_CACHE_REDIS_URL, também no Redis, compartilhado pelas réplicas)
+    AUTH_CACHE_ATIVO: bool = True
+    AUTH_CACHE_TTL_SEGUNDOS: int = 60
+    AUTH_CACHE_MAX_ENTRADAS: int = 10000
+    AUTH_CACHE_REDIS_URL: Optional[str] = None
     
     # Database
     DATABASE_URL: str
     POSTGRES_USER: str = "admin"
     POSTGRES_PASSWORD: str = "supersecret"
     POSTGRES_DB: str = "enem_correcoes_db"
+    # Pool de conexões: perfil "api" ou "worker" (o worker define DB_POOL_PERFIL=worker)
+    DB_POOL_PERFIL: str = "api"
+    DB_POOL_API_TAMANHO: int = 10
+    DB_POOL_API_EXCEDENTE: int = 20
+    DB_POOL_WORKER_TAMANHO: int = 5
+    DB_POOL_WORKER_EXCEDENTE: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECICLAR_SEGUNDOS: int = 1800
+    # Consultas de leitura das rotas assíncronas da API pelo asyncpg, sem ocupar o threadpool
+    DB_ASYNC_ATIVO: bool = False
+    DATABASE_URL_ASYNC: Optional[str] = None  # Padrão: DATABASE_URL com o driver asyncpg
+    # Compressão dos detalhes dos corretores no banco: "zstd" (pacote zstandard) ou "zlib"
+    COMPRESSAO_ALGORITMO: str = "zstd"
+    COMPRESSAO_NIVEL: int = 6
+
+    # Arquivos (fotos de perfil) fora do banco, endereçados pelo conteúdo
+    ARMAZENAMENTO_BACKEND: str = "local"
+    ARMAZENAMENTO_DIRETORIO: str = "/data/atena/arquivos"
+    FOTO_TAMANHO_MAXIMO: int = 5 * 1024 * 1024
+    FOTO_MINIATURAS: List[int] = [64, 256]
 
     # Worker / Celery
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: Optional[str] = None
+    WORKER_MODO_EXECUCAO: str = "assincrono"  # Ou "prefork"; ver .env.example
+    WORKER_CORRECOES_SIMULTANEAS: int = 8
+    # Transcrição (OCR) de fotos de redação: fila "ocr", atendida por um worker próprio
+    OCR_TAMANHO_MAXIMO: int = 10 * 1024 * 1024
+    # Redis para eventos em tempo real (pub/sub); padrão: CELERY_BROKER_URL
+    REDIS_URL: Optional[str] = None
+
+    # Cotas de uso por usuário (janela deslizante no Redis em REDIS_URL). Endpoints:
+    # "correcao", "ocr" e "sugestao_tema"; ex.: {"ocr": {"limite": 40, "janela": 3600}}
+    LIMITES_ATIVOS: bool = True
+    LIMITES_USO: Dict[str, Dict[str, int]] = {}
     
     # LLM Keys
     GOOGLE_API_KEY: Optional[str] = None
@@ -27,6 +70,73 @@ class Settings(BaseSettings):
     LLM_PROVIDER: str = "gemini"
     LLM_MODEL: str = "gemini-2.0-flash"
 
+    # Provedor reserva (hedging e failover): "gemini", "perplexity" ou "openai"
+    # (qualquer API compatível com OpenAI em LLM_BACKUP_BASE_URL). Vazio desativa.
+    LLM_BACKUP_PROVIDER: Optional[str] = None
+    LLM_BACKUP_MODEL: Optional[str] = None
+    LLM_BACKUP_BASE_URL: Optional[str] = None
+    LLM_BACKUP_API_KEY: Optional[str] = None
+    # O reserva é acionado quando o principal passa do percentil de latência recente
+    LLM_HEDGE_PERCENTIL: float = 0.95
+    LLM_HEDGE_MIN_AMOSTRAS: int = 20
+    LLM_HEDGE_ATRASO_PADRAO: float = 20.0  # Segundos, enquanto não há amostras suficientes
+    # Failover: taxa de erro do principal na janela que desvia tudo para o reserva
+    LLM_FAILOVER_TAXA_ERRO: float = 0.5
+    LLM_FAILOVER_JANELA: int = 20
+    LLM_FAILOVER_DURACAO: float = 60.0
+
+    # Cassetes do tráfego com o LLM: "desativado", "gravar" ou "reproduzir" (sem rede)
+    LLM_CASSETE_MODO: str = "desativado"
+    LLM_CASSETE_ARQUIVO: str = "/tmp/atena_cassete.jsonl.gz"
+    LLM_CASSETE_SIMULAR_LATENCIA: bool = False  # Reproduz com a latência gravada
+
+    # Provedor falso (LLM_PROVIDER=fake): sem rede, para testes de carga e benchmark.
+    # Distribuições de latência: "fixa", "uniforme", "exponencial" ou "lognormal"
+    LLM_FAKE_SEMENTE: int = 0
+    LLM_FAKE_LATENCIA_MEDIA: float = 1.0  # Segundos
+    LLM_FAKE_LATENCIA_DISTRIBUICAO: str = "lognormal"
+    LLM_FAKE_LATENCIA_SIGMA: float = 0.5  # Só na lognormal
+    LLM_FAKE_TAXA_429: float = 0.0
+    LLM_FAKE_TAXA_MALFORMADA: float = 0.0
+
+    # Correção: "sequencial", "concorrente" (competências de um corretor em paralelo)
+    # ou "chamada_unica" (as cinco competências em uma só chamada ao LLM)
+    LLM_MODO_CORRECAO: str = "concorrente"
+    LLM_CONCORRENCIA_POR_CORRETOR: int = 5
+    LLM_CONCORRENCIA_PROCESSO: int = 10
+
+    # Cache de respostas do LLM: "sqlite", "redis" ou "desativado"
+    LLM_CACHE_BACKEND: str = "sqlite"
+    LLM_CACHE_SQLITE_PATH: str = "/tmp/atena_llm_cache.sqlite3"
+    LLM_CACHE_REDIS_URL: Optional[str] = None  # Padrão: CELERY_BROKER_URL
+    LLM_CACHE_TTL_SEGUNDOS: int = 7 * 24 * 3600
+    LLM_CACHE_MAX_ENTRADAS: int = 50000
+
+    # Governador de cota do LLM (baldes de fichas no Redis, compartilhados por todos os processos)
+    LLM_COTA_ATIVA: bool = True
+    LLM_COTA_REDIS_URL: Optional[str] = None  # Padrão: CELERY_BROKER_URL
+    LLM_COTA_RPM: int = 15
+    LLM_COTA_TPM: int = 1_000_000
+    # Limites por "provedor:modelo", ex.: {"gemini:gemini-2.0-flash": {"rpm": 2000, "tpm": 4000000}}
+    LLM_COTA_LIMITES: Dict[str, Dict[str, int]] = {}
+
+    # Resiliência: retentativas com backoff exponencial e circuit breaker por provedor
+    LLM_MAX_TENTATIVAS: int = 5
+    LLM_BACKOFF_BASE: float = 2.0
+    LLM_BACKOFF_MAXIMO: float = 60.0
+    LLM_CIRCUITO_FALHAS: int = 5
+    LLM_CIRCUITO_SEGUNDOS_ABERTO: float = 30.0
+    # Prazo total de uma correção; ao estourar, as chamadas pendentes são canceladas
+    CORRECAO_PRAZO_SEGUNDOS: float = 600.0
+    # Retentativas automáticas da task, retomando do checkpoint (progresso_json)
+    CORRECAO_MAX_RETENTATIVAS: int = 3
+    CORRECAO_RETENTATIVA_ATRASO: float = 30.0  # Dobra a cada nova tentativa
+
+    # Banca: inicia o supervisor assim que uma competência diverge, antes de C1 e C2 terminarem
+    SUPERVISOR_ESPECULATIVO: bool = False
+    # Supervisor reavalia só as competências discrepantes (todas se o total divergir)
+    SUPERVISOR_PARCIAL: bool = False
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Eventos de uma redação publicados pelo worker no Redis (pub/sub) e
+# repassados pela API aos clientes conectados. Cada redação tem seu canal;
+# as transcrições (OCR) usam o mesmo formato em canais próprios.
+#
+# Formato: {"tipo": "...", ...}
+#   - "status": mudança de status (PENDENTE -> PROCESSANDO, ou de volta a PENDENTE numa retentativa)
+#   - "feedback": trecho do comentário geral de um corretor (streaming)
+#   - "fim": a correção terminou (CONCLUIDO ou ERRO)
+
+EVENTO_STATUS = "status"
+EVENTO_FEEDBACK = "feedback"
+EVENTO_FIM = "fim"
+
+
+def canal_redacao(redacao_id: int) -> str:
+    return f"atena:redacao:{redacao_id}"
+
+
+def canal_transcricao(transcricao_id: int) -> str:
+    return f"atena:transcricao:{transcricao_id}"
+
+
+def _url_redis() -> str:
+    return settings.REDIS_URL or settings.CELERY_BROKER_URL
+
+
+_cliente = None
+
+
+def _cliente_sync():
+    global _cliente
+    if _cliente is None:
+        import redis
+
+        _cliente = redis.Redis.from_url(_url_redis(), socket_timeout=2, socket_connect_timeout=2)
+    return _cliente
+
+
+def publicar(redacao_id: int, evento: Dict[str, Any], canal: Optional[str] = None) -> None:
+    """Publica um evento no canal da redação (ou em `canal`). Falhas não interrompem a correção."""
+    canal = canal or canal_redacao(redacao_id)
+    try:
+        _cliente_sync().publish(canal, json.dumps(evento, ensure_ascii=False))
+    except Exception as e:
+        logger.warning(f"Falha ao publicar evento em {canal}: {e}")
+
+
+async def publicar_async(redacao_id: int, evento: Dict[str, Any], canal: Optional[str] = None) -> None:
+    await asyncio.to_thread(publicar, redacao_id, evento, canal)
+
+
+class Assinatura:
+    """
+    Assinatura assíncrona do canal de uma redação.
+    Use `async with` e itere com `eventos()`; assine antes de consultar o status
+    no banco para não perder um evento publicado nesse intervalo.
+    """
+
+    def __init__(self, redacao_id: int, canal: Optional[str] = None):
+        self.redacao_id = redacao_id
+        self.canal = canal or canal_redacao(redacao_id)
+        self._cliente = None
+        self._pubsub = None
+
+    async def __aenter__(self) -> "Assinatura":
+        import redis.asyncio as redis_async
+
+        self._cliente = redis_async.Redis.from_url(_url_redis())
+        self._pubsub = self._cliente.pubsub()
+        await self._pubsub.subscribe(self.canal)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        try:
+            await self._pubsub.unsubscribe()
+            await self._pubsub.aclose()
+        finally:
+            await self._cliente.aclose()
+
+    async def proximo(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Próximo evento, ou None se nada chegar em `timeout` segundos."""
+        mensagem = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if mensagem is None:
+            return None
+        return json.loads(mensagem["data"])
+
+    async def eventos(self, intervalo_keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """Gera eventos até o "fim"; gera None a cada `intervalo_keepalive` sem mensagens."""
+        while True:
+            evento = await self.proximo(intervalo_keepalive)
+            yield evento
+            if evento is not None and evento.get("tipo") == EVENTO_FIM:
+                return
@@ -1,11 +1,34 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, JSON, ForeignKey, LargeBinary, DateTime
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy import create_engine, Column, Integer, String, Text, JSON, ForeignKey, LargeBinary, DateTime, Index
+from sqlalchemy.orm import sessionmaker, relationship, deferred
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
+from typing import Any, Dict, Optional
 from shared.config import settings
+from shared.compressao import comprimir_json, descomprimir_json
 
 DATABASE_URL = settings.DATABASE_URL
-engine = create_engine(DATABASE_URL)
+
+
+def argumentos_pool(url: str, perfil: Optional[str] = None) -> Dict[str, Any]:
+    """Configuração do pool de conexões do perfil ("api" ou "worker"; padrão: DB_POOL_PERFIL)."""
+    if url.startswith("sqlite"):
+        # SQLite (testes, scripts) usa o pool próprio do dialeto
+        return {}
+    perfil = (perfil or settings.DB_POOL_PERFIL).lower()
+    if perfil == "worker":
+        tamanho, excedente = settings.DB_POOL_WORKER_TAMANHO, settings.DB_POOL_WORKER_EXCEDENTE
+    else:
+        tamanho, excedente = settings.DB_POOL_API_TAMANHO, settings.DB_POOL_API_EXCEDENTE
+    return {
+        "pool_size": tamanho,
+        "max_overflow": excedente,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECICLAR_SEGUNDOS,
+    }
+
+
+engine = create_engine(DATABASE_URL, **argumentos_pool(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -17,7 +40,11 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
     name = Column(String, nullable=True)
-    profile_pic = Column(LargeBinary, nullable=True)
+    # Foto de perfil no armazenamento de arquivos (shared.armazenamento): chave
+    # (sha256) do original e das miniaturas, {"64": chave, ...}
+    foto_chave = Column(String(64), nullable=True)
+    foto_tipo = Column(String, nullable=True)
+    foto_miniaturas = Column(JSON, nullable=True)
 
     redacoes = relationship("Redacao", back_populates="owner")
 
@@ -27,13 +54,62 @@ class Redacao(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     tema = Column(String, index=True)
-    texto_redacao = Column(Text, nullable=False)
+    # Carregado só quando acessado: listagens e leituras de resultado não precisam do texto
+    texto_redacao = deferred(Column(Text, nullable=False))
     status = Column(String, default="PENDENTE")
+    # Resultado consolidado (notas e justificativas finais), sem as correções individuais
     resultado_json = Column(JSON, nullable=True)
+    # Correções completas de cada corretor (auditoria), JSON comprimido e carregado sob demanda
+    detalhes_comprimidos = deferred(Column(LargeBinary, nullable=True))
+    # Checkpoint da correção em andamento (corretores e competências já avaliados),
+    # usado pelas retentativas; limpo quando a correção termina
+    progresso_json = Column(JSON, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     criado_em = Column(DateTime(timezone=True), server_default=func.now())
-    
+    # Muda a cada UPDATE: junto com o status, forma a versão (ETag) da redação e da listagem
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Cópias das notas de resultado_json para o histórico paginado, que não lê o JSON
+    nota_final = Column(Integer, nullable=True)
+    notas_competencias = Column(JSON, nullable=True)
+
+    __table_args__ = (
+        Index("ix_redacoes_user_id_atualizado_em", "user_id", "atualizado_em"),
+        # Paginação por cursor do histórico: (criado_em, id) decrescentes de um usuário
+        Index("ix_redacoes_user_id_criado_em_id", "user_id", "criado_em", "id"),
+    )
+
     owner = relationship("User", back_populates="redacoes")
 
+    def definir_resultado(self, resultado):
+        """
+        Grava o resultado da correção: o consolidado em resultado_json, os `detalhes`
+        dos corretores comprimidos à parte e as notas desnormalizadas do histórico.
+        """
+        consolidado = {chave: valor for chave, valor in resultado.items() if chave != "detalhes"}
+        self.resultado_json = consolidado
+        detalhes = resultado.get("detalhes")
+        self.detalhes_comprimidos = comprimir_json(detalhes) if detalhes is not None else None
+        self.nota_final = consolidado.get("nota_final")
+        self.notas_competencias = [c.get("nota") for c in consolidado.get("competencias", [])]
 
+    @property
+    def detalhes(self):
+        """Correções de cada corretor (dispara a leitura da coluna comprimida)."""
+        return descomprimir_json(self.detalhes_comprimidos)
 
+
+class Transcricao(Base):
+    """Transcrição (OCR) de uma foto de redação, feita pelo worker na fila "ocr"."""
+
+    __tablename__ = "transcricoes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="PENDENTE")
+    # Foto no armazenamento de arquivos (shared.armazenamento) até o worker terminar
+    imagem_chave = Column(String(64), nullable=True)
+    imagem_tipo = Column(String, nullable=True)
+    texto = Column(Text, nullable=True)
+    erro = Column(String, nullable=True)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
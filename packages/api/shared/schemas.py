@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field 
-from typing import Optional, Dict, Any 
+from typing import Optional, Dict, Any, List
+from datetime import datetime
 
 from enum import Enum
 
@@ -54,6 +55,40 @@ class RedacaoResult(BaseModel):
     class Config:
         from_attributes = True
 
+class TranscricaoStatus(BaseModel):
+    id: int
+    status: RedacaoStatusEnum
+    texto: Optional[str] = None
+    erro: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class RedacaoDetalhes(BaseModel):
+    id: int
+    # Correções completas de cada corretor, na ordem em que foram usadas na banca
+    detalhes: List[Dict[str, Any]]
+
+
+class RedacaoResumo(BaseModel):
+    """Item do histórico: só colunas leves, sem o texto nem o resultado completo."""
+    id: int
+    tema: str
+    status: RedacaoStatusEnum
+    criado_em: Optional[datetime] = None
+    nota_final: Optional[int] = None
+    notas_competencias: Optional[List[Optional[int]]] = None
+
+    class Config:
+        from_attributes = True
+
+
+class PaginaHistorico(BaseModel):
+    itens: List[RedacaoResumo]
+    # Passe em `cursor` para a próxima página; None quando não há mais
+    proximo_cursor: Optional[str] = None
+
+
 class AvaliacaoCompetencia(BaseModel):
     competencia: int = Field(description="O número da competência (de 1 a 5)")
     analise_critica: str = Field(description="Análise detalhada dos erros encontrados e raciocínio antes da nota.")
@@ -61,5 +96,9 @@ class AvaliacaoCompetencia(BaseModel):
     justificativa: str = Field(description="A justificativa final resumida para a nota atribuída.")
 
 
+class AvaliacaoCompleta(BaseModel):
+    competencias: List[AvaliacaoCompetencia] = Field(description="As avaliações das competências 1 a 5, uma por item.")
+
+
 class ProfileUpdate(BaseModel):
     name: Optional[str] = None
\ No newline at end of file
@@ -71,6 +71,14 @@ def consultar_resultado(redacao_id):
     except Exception as e:
         return {"status": "ERRO", "error": str(e)}
 
+def consultar_detalhes(redacao_id):
+    """Correções individuais dos corretores (ficam fora do resultado consolidado)"""
+    try:
+        resp = requests.get(f"{BASE_URL}{redacao_id}/detalhes", headers={"Authorization": f"Bearer {TOKEN}"})
+        return resp.json().get('detalhes', [])
+    except Exception:
+        return []
+
 def main():
     print("="*80)
     print(f"TESTE COMPLETO DE PRECISÃO - {len(REDACOES)} REDAÇÕES")
@@ -116,7 +124,7 @@ def main():
                 diff = nota_ia - nota_oficial
                 
                 # Check discrepância (pra ver se o sistema de banca funcionou)
-                detalhes = res_json.get('detalhes', [])
+                detalhes = consultar_detalhes(rid)
                 num_corretores = len(detalhes)
                 info_banca = f"({num_corretores} corr)"
                 
@@ -0,0 +1,277 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from langchain_core.language_models import BaseChatModel
+
+from .prompts import VERSAO_RUBRICA
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cache de respostas do LLM endereçado pelo conteúdo: a chave é o hash de tudo
+# que influencia a resposta (texto normalizado, tema, competência, persona,
+# modelo, temperatura e versão da rubrica). Reenvios da mesma redação e
+# retentativas do app deixam de custar chamadas ao LLM.
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza apenas o que não muda a correção: unicode, quebras de linha e espaços repetidos.
+    Maiúsculas e pontuação são mantidas, pois contam na Competência 1.
+    """
+    texto = unicodedata.normalize("NFC", texto or "")
+    texto = texto.replace("\r\n", "\n").replace("\r", "\n")
+    linhas = [re.sub(r"[ \t]+", " ", linha).strip() for linha in texto.split("\n")]
+    texto = "\n".join(linhas).strip()
+    return re.sub(r"\n{3,}", "\n\n", texto)
+
+
+def descrever_llm(llm: BaseChatModel) -> Dict[str, Any]:
+    """Identifica o cliente (provedor, modelo e temperatura) para compor a chave."""
+    # O gravador de cassetes envolve o cliente real: vale a identidade do de dentro
+    llm = getattr(llm, "interno", llm)
+    return {
+        "provedor": type(llm).__name__,
+        "modelo": getattr(llm, "model", None) or getattr(llm, "model_name", None),
+        "temperatura": getattr(llm, "temperature", None),
+    }
+
+
+def gerar_chave(tipo: str, **partes: Any) -> str:
+    conteudo = json.dumps(
+        {"tipo": tipo, "rubrica": VERSAO_RUBRICA, **partes},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return f"{tipo}:{hashlib.sha256(conteudo.encode('utf-8')).hexdigest()}"
+
+
+def chave_competencia(
+    llm: BaseChatModel, texto_redacao: str, tema: str, competencia: Any, instrucoes_persona: str
+) -> str:
+    return gerar_chave(
+        "competencia",
+        redacao=normalizar_texto(texto_redacao),
+        tema=normalizar_texto(tema),
+        competencia=competencia,
+        persona=instrucoes_persona,
+        **descrever_llm(llm),
+    )
+
+
+def chave_feedback(llm: BaseChatModel, avaliacoes: Any) -> str:
+    return gerar_chave(
+        "feedback",
+        avaliacoes=json.dumps(avaliacoes, sort_keys=True, ensure_ascii=False),
+        **descrever_llm(llm),
+    )
+
+
+# --- Backends ---
+
+class CacheDesativado:
+    def obter(self, chave: str) -> Optional[Any]:
+        return None
+
+    def salvar(self, chave: str, valor: Any) -> None:
+        pass
+
+
+class CacheSQLite:
+    """
+    Cache local em SQLite. Entradas expiram pelo TTL e, acima de `max_entradas`,
+    as menos acessadas recentemente são removidas.
+    """
+
+    def __init__(self, caminho: str, ttl_segundos: int, max_entradas: int):
+        self.caminho = caminho
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+        self._local = threading.local()
+        self._escritas = 0
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=10)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS respostas_llm ("
+                " chave TEXT PRIMARY KEY,"
+                " valor TEXT NOT NULL,"
+                " expira_em REAL NOT NULL,"
+                " acessado_em REAL NOT NULL)"
+            )
+            conexao.execute(
+                "CREATE INDEX IF NOT EXISTS ix_respostas_llm_acessado_em ON respostas_llm (acessado_em)"
+            )
+            conexao.commit()
+            self._local.conexao = conexao
+        return conexao
+
+    def obter(self, chave: str) -> Optional[Any]:
+        conexao = self._conexao()
+        agora = time.time()
+        linha = conexao.execute(
+            "SELECT valor FROM respostas_llm WHERE chave = ? AND expira_em > ?", (chave, agora)
+        ).fetchone()
+        if linha is None:
+            return None
+        conexao.execute("UPDATE respostas_llm SET acessado_em = ? WHERE chave = ?", (agora, chave))
+        conexao.commit()
+        return json.loads(linha[0])
+
+    def salvar(self, chave: str, valor: Any) -> None:
+        conexao = self._conexao()
+        agora = time.time()
+        conexao.execute(
+            "INSERT OR REPLACE INTO respostas_llm (chave, valor, expira_em, acessado_em) VALUES (?, ?, ?, ?)",
+            (chave, json.dumps(valor, ensure_ascii=False), agora + self.ttl_segundos, agora),
+        )
+        conexao.commit()
+        self._escritas += 1
+        # Poda periódica para não pagar um DELETE a cada escrita
+        if self._escritas % 50 == 1:
+            self._podar(conexao, agora)
+
+    def _podar(self, conexao: sqlite3.Connection, agora: float) -> None:
+        conexao.execute("DELETE FROM respostas_llm WHERE expira_em <= ?", (agora,))
+        conexao.execute(
+            "DELETE FROM respostas_llm WHERE chave IN ("
+            " SELECT chave FROM respostas_llm ORDER BY acessado_em DESC LIMIT -1 OFFSET ?)",
+            (self.max_entradas,),
+        )
+        conexao.commit()
+
+
+class CacheRedis:
+    """
+    Cache compartilhado por todos os workers. O TTL fica a cargo do Redis e um
+    índice ordenado por acesso limita o total de entradas.
+    """
+
+    PREFIXO = "atena:llm_cache:"
+    INDICE = "atena:llm_cache:indice"
+
+    def __init__(self, url: str, ttl_segundos: int, max_entradas: int):
+        import redis
+
+        self.cliente = redis.Redis.from_url(url)
+        self.ttl_segundos = ttl_segundos
+        self.max_entradas = max_entradas
+
+    def obter(self, chave: str) -> Optional[Any]:
+        valor = self.cliente.get(self.PREFIXO + chave)
+        if valor is None:
+            return None
+        self.cliente.zadd(self.INDICE, {chave: time.time()})
+        return json.loads(valor)
+
+    def salvar(self, chave: str, valor: Any) -> None:
+        pipe = self.cliente.pipeline()
+        pipe.set(self.PREFIXO + chave, json.dumps(valor, ensure_ascii=False), ex=self.ttl_segundos)
+        pipe.zadd(self.INDICE, {chave: time.time()})
+        pipe.zcard(self.INDICE)
+        total = pipe.execute()[-1]
+        excedente = total - self.max_entradas
+        if excedente > 0:
+            removidas = [c.decode() for c, _ in self.cliente.zpopmin(self.INDICE, excedente)]
+            if removidas:
+                self.cliente.delete(*(self.PREFIXO + c for c in removidas))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def obter_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _criar_backend()
+    return _backend
+
+
+def _criar_backend():
+    tipo = settings.LLM_CACHE_BACKEND.lower()
+    if (settings.LLM_CASSETE_MODO or "").lower() == "gravar":
+        # Respostas do cache não chegariam ao provedor e ficariam fora do cassete
+        logger.info("Cache de LLM desativado durante a gravação de cassetes.")
+        return CacheDesativado()
+    ttl = settings.LLM_CACHE_TTL_SEGUNDOS
+    max_entradas = settings.LLM_CACHE_MAX_ENTRADAS
+    if tipo == "sqlite":
+        logger.info(f"Cache de LLM em SQLite: {settings.LLM_CACHE_SQLITE_PATH}")
+        return CacheSQLite(settings.LLM_CACHE_SQLITE_PATH, ttl, max_entradas)
+    if tipo == "redis":
+        url = settings.LLM_CACHE_REDIS_URL or settings.CELERY_BROKER_URL
+        logger.info("Cache de LLM no Redis.")
+        return CacheRedis(url, ttl, max_entradas)
+    return CacheDesativado()
+
+
+# --- Métricas ---
+
+_estatisticas = {"acertos": 0, "faltas": 0, "erros": 0}
+_estatisticas_lock = threading.Lock()
+
+# Contadores da correção atual (cada task do Celery define os seus)
+contadores_correcao: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar(
+    "contadores_cache_correcao", default=None
+)
+
+
+def _registrar(evento: str) -> None:
+    with _estatisticas_lock:
+        _estatisticas[evento] += 1
+    contadores = contadores_correcao.get()
+    if contadores is not None:
+        contadores[evento] = contadores.get(evento, 0) + 1
+
+
+def estatisticas() -> Dict[str, int]:
+    """Totais do processo desde o início: acertos, faltas e erros do backend."""
+    with _estatisticas_lock:
+        return dict(_estatisticas)
+
+
+def iniciar_contagem() -> Dict[str, int]:
+    """Começa a contar acertos/faltas do cache para a correção em andamento."""
+    contadores = {"acertos": 0, "faltas": 0, "erros": 0}
+    contadores_correcao.set(contadores)
+    return contadores
+
+
+async def obter(chave: str) -> Optional[Any]:
+    try:
+        valor = await asyncio.to_thread(obter_backend().obter, chave)
+    except Exception as e:
+        # Cache nunca derruba a correção: na dúvida, chama o LLM
+        logger.warning(f"Falha ao ler cache de LLM: {e}")
+        _registrar("erros")
+        return None
+    if valor is None:
+        _registrar("faltas")
+    else:
+        _registrar("acertos")
+        logger.info(f"Cache de LLM: acerto em {chave.split(':')[0]} ({chave[-12:]}).")
+    return valor
+
+
+async def salvar(chave: str, valor: Any) -> None:
+    try:
+        await asyncio.to_thread(obter_backend().salvar, chave, valor)
+    except Exception as e:
+        logger.warning(f"Falha ao gravar cache de LLM: {e}")
+        _registrar("erros")
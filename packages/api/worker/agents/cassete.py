@@ -0,0 +1,210 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from . import resiliencia
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Gravação e reprodução ("cassetes") do tráfego com os provedores de LLM, para
+# suítes de regressão com respostas reais, sem rede e sem chave de API.
+#
+# Modos (LLM_CASSETE_MODO):
+#   - "gravar": as chamadas vão ao provedor e cada resposta é anexada ao cassete
+#     (LLM_CASSETE_ARQUIVO, JSONL comprimido com gzip), com a latência original.
+#   - "reproduzir": nenhuma chamada sai do processo; a resposta vem do cassete pela
+#     impressão digital da requisição (provedor, modelo, parâmetros e mensagens).
+#     Requisição sem gravação levanta CasseteAusente. Com LLM_CASSETE_SIMULAR_LATENCIA,
+#     espera a latência gravada.
+#
+# Requisições idênticas gravadas mais de uma vez são reproduzidas na mesma ordem
+# (a última se repete), então retentativas seguem o que aconteceu na gravação.
+
+MODOS = ("desativado", "gravar", "reproduzir")
+
+
+class CasseteAusente(resiliencia.FalhaLLM):
+    """Requisição sem resposta gravada no cassete (modo reproduzir): a correção falha, sem nota 0."""
+
+
+def modo() -> str:
+    return (settings.LLM_CASSETE_MODO or "desativado").lower()
+
+
+def impressao_digital(tipo: str, **partes: Any) -> str:
+    conteudo = json.dumps({"tipo": tipo, **partes}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+class Cassete:
+    """Arquivo de gravações: um JSON por linha, em membros gzip anexados a cada gravação."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._gravacoes: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursores: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._carregar()
+
+    def _carregar(self) -> None:
+        if not os.path.exists(self.caminho):
+            return
+        with gzip.open(self.caminho, "rt", encoding="utf-8") as arquivo:
+            try:
+                for linha in arquivo:
+                    try:
+                        registro = json.loads(linha)
+                    except json.JSONDecodeError:
+                        continue
+                    self._gravacoes.setdefault(registro["chave"], []).append(registro)
+            except EOFError:
+                # Gravação interrompida no meio do último membro
+                pass
+        logger.info(f"Cassete {self.caminho}: {len(self._gravacoes)} requisições gravadas.")
+
+    def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            gravacoes = self._gravacoes.get(chave)
+            if not gravacoes:
+                return None
+            indice = self._cursores.get(chave, 0)
+            self._cursores[chave] = indice + 1
+            return gravacoes[min(indice, len(gravacoes) - 1)]
+
+    def gravar(self, chave: str, registro: Dict[str, Any]) -> None:
+        registro = {"chave": chave, **registro}
+        with self._lock:
+            self._gravacoes.setdefault(chave, []).append(registro)
+            diretorio = os.path.dirname(self.caminho)
+            if diretorio:
+                os.makedirs(diretorio, exist_ok=True)
+            with gzip.open(self.caminho, "at", encoding="utf-8") as arquivo:
+                arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+
+_cassete: Optional[Cassete] = None
+_cassete_lock = threading.Lock()
+
+
+def obter_cassete() -> Cassete:
+    global _cassete
+    if _cassete is None:
+        with _cassete_lock:
+            if _cassete is None:
+                _cassete = Cassete(settings.LLM_CASSETE_ARQUIVO)
+    return _cassete
+
+
+async def _reproduzir(chave: str, descricao: str) -> Dict[str, Any]:
+    registro = obter_cassete().obter(chave)
+    if registro is None:
+        raise CasseteAusente(f"{descricao}: requisição não gravada em {settings.LLM_CASSETE_ARQUIVO}.")
+    if settings.LLM_CASSETE_SIMULAR_LATENCIA:
+        await asyncio.sleep(registro.get("latencia", 0.0))
+    return registro
+
+
+async def interceptar(chave: str, chamar: Callable[[], Awaitable[str]], descricao: str = "LLM") -> str:
+    """Chamada de texto fora do LangChain (ex.: OCR pelo SDK do Gemini) passando pelo cassete."""
+    atual = modo()
+    if atual == "reproduzir":
+        return (await _reproduzir(chave, descricao))["resposta"]
+    if atual != "gravar":
+        return await chamar()
+    inicio = time.monotonic()
+    resposta = await chamar()
+    obter_cassete().gravar(chave, {"resposta": resposta, "latencia": time.monotonic() - inicio})
+    return resposta
+
+
+class ChatCassete(BaseChatModel):
+    """
+    Envolve um chat model do LangChain gravando ou reproduzindo suas respostas.
+    `model` e `temperature` espelham os do cliente real (chaves de cache, cota e hedging).
+    """
+
+    interno: BaseChatModel
+    model: Optional[str] = None
+    temperature: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return f"cassete-{self.interno._llm_type}"
+
+    def _chave(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> str:
+        return impressao_digital(
+            "chat",
+            provedor=type(self.interno).__name__,
+            modelo=self.model,
+            temperatura=self.temperature,
+            parametros=getattr(self.interno, "model_kwargs", None),
+            stop=stop,
+            mensagens=[(m.type, m.content) for m in messages],
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        chave = self._chave(messages, stop)
+        if modo() == "reproduzir":
+            registro = await _reproduzir(chave, f"{type(self.interno).__name__}:{self.model}")
+            conteudo = registro.get("resposta") or "".join(registro.get("trechos", []))
+        else:
+            inicio = time.monotonic()
+            resposta = await self.interno.ainvoke(messages, stop=stop, **kwargs)
+            conteudo = resposta.content
+            if modo() == "gravar":
+                obter_cassete().gravar(chave, {"resposta": conteudo, "latencia": time.monotonic() - inicio})
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=conteudo))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        # Caminho síncrono (scripts): o worker usa sempre o assíncrono
+        chave = self._chave(messages, stop)
+        if modo() == "reproduzir":
+            registro = obter_cassete().obter(chave)
+            if registro is None:
+                raise CasseteAusente(f"Requisição não gravada em {settings.LLM_CASSETE_ARQUIVO}.")
+            conteudo = registro.get("resposta") or "".join(registro.get("trechos", []))
+        else:
+            inicio = time.monotonic()
+            conteudo = self.interno.invoke(messages, stop=stop, **kwargs).content
+            if modo() == "gravar":
+                obter_cassete().gravar(chave, {"resposta": conteudo, "latencia": time.monotonic() - inicio})
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=conteudo))])
+
+    async def _astream(
+        self, messages, stop=None, run_manager=None, **kwargs
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chave = self._chave(messages, stop)
+        if modo() == "reproduzir":
+            registro = await _reproduzir(chave, f"{type(self.interno).__name__}:{self.model}")
+            for trecho in registro.get("trechos") or [registro.get("resposta", "")]:
+                yield ChatGenerationChunk(message=AIMessageChunk(content=trecho))
+            return
+        inicio = time.monotonic()
+        trechos = []
+        async for pedaco in self.interno.astream(messages, stop=stop, **kwargs):
+            trechos.append(pedaco.content)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=pedaco.content))
+        if modo() == "gravar":
+            obter_cassete().gravar(chave, {"trechos": trechos, "latencia": time.monotonic() - inicio})
+
+
+def envolver(llm: BaseChatModel) -> BaseChatModel:
+    """Envolve o cliente no cassete quando a gravação ou a reprodução estiver ativa."""
+    if modo() == "desativado":
+        return llm
+    return ChatCassete(
+        interno=llm,
+        model=getattr(llm, "model", None) or getattr(llm, "model_name", None),
+        temperature=getattr(llm, "temperature", None),
+    )
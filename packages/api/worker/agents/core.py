@@ -2,29 +2,30 @@ import asyncio
 import json
 import logging
 import os
-from google.api_core.exceptions import ResourceExhausted
-from typing import Dict, Any, List
+import weakref
+from typing import Dict, Any, List, Awaitable, Callable, Optional
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models import BaseChatModel
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 
-from .prompts import PROMPT_AGENTE_COMPETENCIA, COMPETENCIAS_INFO
-from shared.schemas import AvaliacaoCompetencia
+from . import cache, cassete, cota, hedging, registro, resiliencia
+from .prompts import (
+    PROMPT_AGENTE_COMPETENCIA,
+    PROMPT_AGENTE_TODAS_COMPETENCIAS,
+    PROMPT_FEEDBACK_GERAL,
+    COMPETENCIAS_INFO,
+    formatar_criterios_todas_competencias,
+)
+from shared.schemas import AvaliacaoCompetencia, AvaliacaoCompleta
 from shared.config import settings
 
 logger = logging.getLogger(__name__)
 
-# Configuração Google Gemini / Perplexity
-# Pega do ambiente ou usa o Flash Latest como fallback
-LLM_PROVIDER = settings.LLM_PROVIDER.lower()
-MODEL_NAME = settings.LLM_MODEL
-
 # Temperaturas mais altas para correções mais humanas e menos mecânicas
 TEMP_CORRETOR_PADRAO = 0.35  # Corretor 2 (equilibrado)
 TEMP_CORRETOR_RIGOROSO = 0.30  # Corretor 1 (atento mas justo)
+TEMP_FEEDBACK = 0.7  # Texto livre do comentário final
 
 # Personas humanizadas: Professores encorajadores que querem ajudar
 PERSONAS = {
@@ -33,138 +34,510 @@ PERSONAS = {
     "Corretor Supervisor": "Você é um AVALIADOR EQUILIBRADO que busca o melhor no texto do aluno. Valorize a estrutura, clareza e esforço. Seja justo e reconheça quando o texto merece nota alta. Feedback construtivo e motivador.",
 }
 
+# Semáforo por processo: limita as chamadas simultâneas ao LLM somando todos os corretores.
+# Primitivas do asyncio ficam presas ao loop em que foram usadas, por isso um por event loop.
+_semaforos_processo: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _semaforo_do_processo() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    semaforo = _semaforos_processo.get(loop)
+    if semaforo is None:
+        semaforo = asyncio.Semaphore(max(1, settings.LLM_CONCORRENCIA_PROCESSO))
+        _semaforos_processo[loop] = semaforo
+    return semaforo
+
+
+class LimitadorCorretor:
+    """
+    Limita as competências avaliadas ao mesmo tempo por um corretor.
+    Ao primeiro 429 o limite cai para 1 e o restante segue em série,
+    evitando que as cinco chamadas voltem juntas e estourem a cota de novo.
+    """
+
+    def __init__(self, limite: int):
+        self.limite = max(1, limite)
+        self._em_uso = 0
+        self._condicao = asyncio.Condition()
+
+    def reduzir(self) -> None:
+        if self.limite > 1:
+            logger.warning("Rate Limit (429) durante avaliação concorrente. Seguindo em modo sequencial.")
+            self.limite = 1
+
+    async def __aenter__(self):
+        async with self._condicao:
+            await self._condicao.wait_for(lambda: self._em_uso < self.limite)
+            self._em_uso += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condicao:
+            self._em_uso -= 1
+            self._condicao.notify_all()
+
+
 async def avaliar_competencia_individual(
     llm: BaseChatModel, 
     texto_redacao: str, 
     tema: str, 
     comp_info: Dict[str, Any],
-    instrucoes_persona: str
+    instrucoes_persona: str,
+    ao_receber_429: Optional[Callable[[], None]] = None,
 ) -> Dict[str, Any]:
     """
     Avalia uma competência.
+    `ao_receber_429` é chamado a cada Rate Limit, antes da pausa.
     """
-    # Loop infinito de "Semáforo" para Rate Limit
-    while True:
-        try:
-            parser = JsonOutputParser(pydantic_object=AvaliacaoCompetencia)
-            
-            chain = PROMPT_AGENTE_COMPETENCIA | llm | parser
-
-            # Aumentei o timeout aqui também por segurança
-            resultado = await chain.ainvoke({
-                "instrucoes_persona": instrucoes_persona,
-                "competencia_numero": comp_info["numero"],
-                "criterios_competencia": comp_info["criterios"],
-                "criterios_negativos": comp_info.get("criterios_negativos", ""), 
-                "redacao": texto_redacao,
-                "tema": tema,
-                "format_instructions": parser.get_format_instructions(),
-            })
-
-            return resultado
-
-        except ResourceExhausted as e:
-            # Semáforo Vermelho 🔴
-            wait_time = 30.0 # Default
-            # Tenta pegar tempo sugerido pelo Google
-            if hasattr(e, 'retry_after'):
-                wait_time = float(e.retry_after)
-            
-            logger.warning(f"Rate Limit (429) no Gemini. Pausando por {wait_time}s antes de tentar de novo...")
-            await asyncio.sleep(wait_time)
-            continue # Tenta de novo (Semáforo Verde 🟢)
-
-        except Exception as e:
-            logger.error(f"Erro ao avaliar competência {comp_info.get('numero')}: {e}")
-            return {
-                "competencia": comp_info.get("numero"),
-                "nota": 0,
-                "justificativa": f"Erro sistêmico: {str(e)}"
-            }
+    chave_cache = cache.chave_competencia(
+        llm, texto_redacao, tema, comp_info["numero"], instrucoes_persona
+    )
+    em_cache = await cache.obter(chave_cache)
+    if em_cache is not None:
+        return em_cache
+
+    try:
+        _, format_instructions = registro.obter_chain_json(
+            PROMPT_AGENTE_COMPETENCIA, llm, AvaliacaoCompetencia
+        )
+
+        entrada = {
+            "instrucoes_persona": instrucoes_persona,
+            "competencia_numero": comp_info["numero"],
+            "criterios_competencia": comp_info["criterios"],
+            "criterios_negativos": comp_info.get("criterios_negativos", ""), 
+            "redacao": texto_redacao,
+            "tema": tema,
+            "format_instructions": format_instructions,
+        }
+        tokens = cota.estimar_tokens(PROMPT_AGENTE_COMPETENCIA, *entrada.values())
+
+        async def _chamar(cliente: BaseChatModel) -> Any:
+            # Semáforo distribuído: só envia com cota disponível (cada provedor tem a sua)
+            chain_cliente, _ = registro.obter_chain_json(
+                PROMPT_AGENTE_COMPETENCIA, cliente, AvaliacaoCompetencia
+            )
+            await cota.adquirir_para(cliente, tokens)
+            hedging.marcar_envio()
+            async with resiliencia.protegido(cliente):
+                resposta = await chain_cliente.ainvoke(entrada)
+            # O parser aceita JSON truncado (parcial): sem validar, uma avaliação sem "nota" seguiria adiante
+            return AvaliacaoCompetencia.model_validate(resposta).model_dump()
+
+        resultado = await resiliencia.com_retentativas(
+            lambda: hedging.executar(_chamar, llm, get_llm_reserva(llm)),
+            llm,
+            descricao=f"Competência {comp_info['numero']}",
+            ao_receber_429=ao_receber_429,
+        )
+
+        await cache.salvar(chave_cache, resultado)
+        return resultado
+
+    except resiliencia.FalhaLLM:
+        # Prazo, circuito aberto ou tentativas esgotadas: a correção inteira falha
+        raise
+
+    except Exception as e:
+        logger.error(f"Erro ao avaliar competência {comp_info.get('numero')}: {e}")
+        return {
+            "competencia": comp_info.get("numero"),
+            "nota": 0,
+            "justificativa": f"Erro sistêmico: {str(e)}",
+            "erro": True,
+        }
+
+
+def validar_avaliacao_completa(resultado: Any) -> List[Dict[str, Any]]:
+    """
+    Valida a resposta da chamada única: exatamente uma avaliação por competência.
+    Levanta ValueError (ou ValidationError) quando a resposta não serve.
+    """
+    if isinstance(resultado, list):
+        resultado = {"competencias": resultado}
+    avaliacao = AvaliacaoCompleta.model_validate(resultado)
+
+    esperadas = sorted(info["numero"] for info in COMPETENCIAS_INFO)
+    por_numero = {a.competencia: a.model_dump() for a in avaliacao.competencias}
+    if len(avaliacao.competencias) != len(esperadas) or sorted(por_numero) != esperadas:
+        raise ValueError(
+            f"Resposta com competências inesperadas: {[a.competencia for a in avaliacao.competencias]}"
+        )
+    return [por_numero[numero] for numero in esperadas]
+
+
+async def avaliar_todas_competencias(
+    llm: BaseChatModel,
+    texto_redacao: str,
+    tema: str,
+    instrucoes_persona: str,
+) -> List[Dict[str, Any]]:
+    """
+    Avalia C1–C5 em uma única chamada ao LLM.
+    Diferente da avaliação individual, erros são propagados para quem chamou decidir o fallback.
+    """
+    chave_cache = cache.chave_competencia(llm, texto_redacao, tema, "todas", instrucoes_persona)
+    em_cache = await cache.obter(chave_cache)
+    if em_cache is not None:
+        return em_cache
+
+    _, format_instructions = registro.obter_chain_json(
+        PROMPT_AGENTE_TODAS_COMPETENCIAS, llm, AvaliacaoCompleta
+    )
+
+    entrada = {
+        "instrucoes_persona": instrucoes_persona,
+        "criterios_todas_competencias": formatar_criterios_todas_competencias(),
+        "redacao": texto_redacao,
+        "tema": tema,
+        "format_instructions": format_instructions,
+    }
+    tokens = cota.estimar_tokens(PROMPT_AGENTE_TODAS_COMPETENCIAS, *entrada.values(), saida=4096)
+
+    async def _chamar(cliente: BaseChatModel) -> List[Dict[str, Any]]:
+        chain_cliente, _ = registro.obter_chain_json(
+            PROMPT_AGENTE_TODAS_COMPETENCIAS, cliente, AvaliacaoCompleta
+        )
+        await cota.adquirir_para(cliente, tokens)
+        hedging.marcar_envio()
+        async with resiliencia.protegido(cliente):
+            resposta = await chain_cliente.ainvoke(entrada)
+        # Validação dentro da chamada: resposta inválida de um provedor não vence o hedge
+        return validar_avaliacao_completa(resposta)
+
+    resultados = await resiliencia.com_retentativas(
+        lambda: hedging.executar(_chamar, llm, get_llm_reserva(llm)),
+        llm,
+        descricao="Chamada única",
+    )
+    await cache.salvar(chave_cache, resultados)
+    return resultados
 
 
 async def _gerar_feedback_geral(
     llm: BaseChatModel, 
-    avaliacoes: List[Dict[str, Any]]
+    avaliacoes: List[Dict[str, Any]],
+    ao_receber_trecho: Optional[Callable[[str], Awaitable[None]]] = None,
 ) -> str:
-    while True:
-        try:
-            prompt_comentario = ChatPromptTemplate.from_template(
-                "Com base nestas avaliações, escreva um feedback geral curto e motivador para o aluno. "
-                "Texto corrido apenas. Avaliações: {avaliacoes}"
-            )
-            chain = prompt_comentario | llm
-            resultado = await chain.ainvoke({"avaliacoes": json.dumps(avaliacoes, ensure_ascii=False)})
+    """
+    Gera o comentário geral em texto livre.
+    Com `ao_receber_trecho`, usa a API de streaming do provedor e repassa cada trecho assim que chega.
+    """
+    chave_cache = cache.chave_feedback(llm, avaliacoes)
+    em_cache = await cache.obter(chave_cache)
+    if em_cache is not None:
+        if ao_receber_trecho:
+            await ao_receber_trecho(em_cache)
+        return em_cache
+
+    chain = registro.obter_chain_texto(PROMPT_FEEDBACK_GERAL, llm)
+    avaliacoes_json = json.dumps(avaliacoes, ensure_ascii=False)
+
+    # Trechos já repassados não têm como ser desfeitos no stream: se a conexão cair
+    # no meio, a nova tentativa é sem streaming e o comentário completo fica só no
+    # resultado final (o cliente não recebe o texto repetido)
+    repassou_trecho = False
+
+    async def _chamar() -> str:
+        nonlocal repassou_trecho
+        await cota.adquirir_para(llm, cota.estimar_tokens(avaliacoes_json, saida=512))
+        async with resiliencia.protegido(llm):
+            if ao_receber_trecho and not repassou_trecho:
+                trechos = []
+                async for pedaco in chain.astream({"avaliacoes": avaliacoes_json}):
+                    if pedaco.content:
+                        trechos.append(pedaco.content)
+                        repassou_trecho = True
+                        await ao_receber_trecho(pedaco.content)
+                return "".join(trechos)
+            resultado = await chain.ainvoke({"avaliacoes": avaliacoes_json})
             return resultado.content
-            
-        except ResourceExhausted as e:
-            # Semáforo Vermelho 🔴
-            wait_time = 30.0
-            logger.warning(f"Rate Limit no Feedback. Pausando por {wait_time}s...")
-            await asyncio.sleep(wait_time)
-            continue
 
-        except Exception as e:
-            logger.error(f"Erro ao gerar feedback geral: {e}")
-            return "Erro ao gerar comentário final."
+    try:
+        comentario = await resiliencia.com_retentativas(_chamar, llm, descricao="Feedback geral")
+        await cache.salvar(chave_cache, comentario)
+        return comentario
+
+    except resiliencia.PrazoEsgotado:
+        raise
+
+    except Exception as e:
+        # As notas já estão prontas: sem o comentário, a correção segue mesmo assim
+        logger.error(f"Erro ao gerar feedback geral: {e}")
+        return "Erro ao gerar comentário final."
 
 
-def get_llm_client(temperature: float = 0.2, json_mode: bool = True) -> BaseChatModel:
+def get_llm_client(
+    temperature: float = 0.2,
+    json_mode: bool = True,
+    max_output_tokens: int = 2048,
+    reserva: bool = False,
+) -> BaseChatModel:
     """
-    Fábrica de LLMs: Retorna Gemini ou Perplexity conforme configuração.
+    Fábrica de LLMs: Retorna Gemini, Perplexity ou o provedor falso (fake) conforme configuração.
+    Com `reserva`, devolve o cliente do provedor reserva (LLM_BACKUP_*).
+    O cliente é criado uma vez por processo e reaproveitado (ver agents/registro.py)
+    e, com LLM_CASSETE_MODO, passa pelo gravador de cassetes (ver agents/cassete.py).
     """
-    if LLM_PROVIDER == "perplexity":
-        pplx_key = settings.PPLX_API_KEY
+    if reserva:
+        provedor = (settings.LLM_BACKUP_PROVIDER or "").lower()
+        modelo = settings.LLM_BACKUP_MODEL or settings.LLM_MODEL
+        base_url, api_key = settings.LLM_BACKUP_BASE_URL, settings.LLM_BACKUP_API_KEY
+    else:
+        # Lido a cada chamada (não na importação) para o benchmark poder trocar de provedor
+        provedor, modelo = settings.LLM_PROVIDER.lower(), settings.LLM_MODEL
+        base_url, api_key = None, None
+    if cassete.modo() == "reproduzir":
+        # Nada sai do processo: o cliente real só empresta a identidade (dispensa chave de API)
+        api_key = api_key or "cassete"
+
+    chave = (provedor, modelo, base_url, temperature, json_mode, max_output_tokens)
+    return registro.obter_cliente(
+        chave,
+        lambda: cassete.envolver(_criar_llm_client(
+            provedor, modelo, temperature, json_mode, max_output_tokens, base_url, api_key
+        )),
+    )
+
+
+def get_llm_reserva(llm: BaseChatModel) -> Optional[BaseChatModel]:
+    """Cliente reserva equivalente a `llm` (mesma temperatura e formato), se houver reserva configurado."""
+    if not settings.LLM_BACKUP_PROVIDER:
+        return None
+    chave = registro.chave_do_cliente(llm)
+    if chave is None:
+        return None
+    _, _, _, temperature, json_mode, max_output_tokens = chave
+    return get_llm_client(temperature, json_mode, max_output_tokens, reserva=True)
+
+
+def _criar_llm_client(
+    provedor: str,
+    modelo: str,
+    temperature: float,
+    json_mode: bool,
+    max_output_tokens: int,
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+) -> BaseChatModel:
+    if provedor == "perplexity":
+        pplx_key = api_key or settings.PPLX_API_KEY
         if not pplx_key:
             logger.error("PERPLEXITY_API_KEY não configurada!")
         
         return ChatOpenAI(
-            model=MODEL_NAME, 
+            model=modelo, 
             temperature=temperature,
             openai_api_key=pplx_key,
-            base_url="https://api.perplexity.ai",
-            max_tokens=2048,
+            base_url=base_url or "https://api.perplexity.ai",
+            max_tokens=max_output_tokens,
+            timeout=60.0,
+        )
+
+    if provedor == "fake":
+        # Respostas determinísticas sem rede: testes de carga e benchmark (agents/fake.py)
+        from .fake import ChatFalso
+        return ChatFalso(
+            model=modelo,
+            temperature=temperature,
+            json_mode=json_mode,
+            semente=settings.LLM_FAKE_SEMENTE,
+            latencia_media=settings.LLM_FAKE_LATENCIA_MEDIA,
+            latencia_distribuicao=settings.LLM_FAKE_LATENCIA_DISTRIBUICAO,
+            latencia_sigma=settings.LLM_FAKE_LATENCIA_SIGMA,
+            taxa_429=settings.LLM_FAKE_TAXA_429,
+            taxa_malformada=settings.LLM_FAKE_TAXA_MALFORMADA,
+        )
+
+    if provedor == "openai":
+        # Qualquer API compatível com OpenAI (usado como provedor reserva)
+        kwargs = {}
+        if json_mode:
+            kwargs["response_format"] = {"type": "json_object"}
+        return ChatOpenAI(
+            model=modelo,
+            temperature=temperature,
+            openai_api_key=api_key,
+            base_url=base_url,
+            max_tokens=max_output_tokens,
             timeout=60.0,
+            model_kwargs=kwargs,
         )
     
     # Default: Gemini
-    api_key = settings.GOOGLE_API_KEY
+    api_key = api_key or settings.GOOGLE_API_KEY
     kwargs = {}
     if json_mode:
         kwargs["response_mime_type"] = "application/json"
 
     return ChatGoogleGenerativeAI(
-        model=MODEL_NAME,
+        model=modelo,
         temperature=temperature,
         google_api_key=api_key,
-        max_output_tokens=2048,
+        max_output_tokens=max_output_tokens,
         timeout=60.0,
         model_kwargs=kwargs
     )
 
 
+async def _avaliar_competencias_sequencial(
+    llm: BaseChatModel,
+    id_corretor: str,
+    texto_redacao: str,
+    tema: str,
+    persona_instrucao: str,
+    ao_concluir: Optional[Callable[[Dict[str, Any]], None]] = None,
+    infos: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    resultados = []
+    for info in infos or COMPETENCIAS_INFO:
+        logger.info(f"[{id_corretor}] Processando Competência {info['numero']}...")
+        res = await avaliar_competencia_individual(llm, texto_redacao, tema, info, persona_instrucao)
+        if ao_concluir:
+            ao_concluir(res)
+        resultados.append(res)
+    return resultados
+
+
+async def _avaliar_competencias_concorrente(
+    llm: BaseChatModel,
+    id_corretor: str,
+    texto_redacao: str,
+    tema: str,
+    persona_instrucao: str,
+    ao_concluir: Optional[Callable[[Dict[str, Any]], None]] = None,
+    infos: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Dispara as competências juntas, limitadas pelo corretor e pelo processo.
+    O gather devolve os resultados na ordem de COMPETENCIAS_INFO.
+    """
+    limitador = LimitadorCorretor(settings.LLM_CONCORRENCIA_POR_CORRETOR)
+    semaforo = _semaforo_do_processo()
+
+    async def _avaliar(info: Dict[str, Any]) -> Dict[str, Any]:
+        async with limitador:
+            async with semaforo:
+                logger.info(f"[{id_corretor}] Processando Competência {info['numero']}...")
+                res = await avaliar_competencia_individual(
+                    llm, texto_redacao, tema, info, persona_instrucao,
+                    ao_receber_429=limitador.reduzir,
+                )
+        if ao_concluir:
+            ao_concluir(res)
+        return res
+
+    return list(await asyncio.gather(*(_avaliar(info) for info in infos or COMPETENCIAS_INFO)))
+
+
+async def _avaliar_competencias_chamada_unica(
+    llm: BaseChatModel,
+    id_corretor: str,
+    texto_redacao: str,
+    tema: str,
+    persona_instrucao: str,
+    ao_concluir: Optional[Callable[[Dict[str, Any]], None]] = None,
+    infos: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    if infos and len(infos) < len(COMPETENCIAS_INFO):
+        # Para poucas competências (ex.: supervisor parcial) a chamada individual sai mais barata
+        return await _avaliar_competencias_concorrente(
+            llm, id_corretor, texto_redacao, tema, persona_instrucao, ao_concluir, infos
+        )
+    logger.info(f"[{id_corretor}] Avaliando as 5 competências em chamada única...")
+    try:
+        resultados = await avaliar_todas_competencias(llm, texto_redacao, tema, persona_instrucao)
+    except resiliencia.FalhaLLM:
+        raise
+    except Exception as e:
+        logger.warning(
+            f"[{id_corretor}] Chamada única inválida ({e}). Recorrendo à avaliação por competência..."
+        )
+        return await _avaliar_competencias_concorrente(
+            llm, id_corretor, texto_redacao, tema, persona_instrucao, ao_concluir
+        )
+    if ao_concluir:
+        for res in resultados:
+            ao_concluir(res)
+    return resultados
+
+
+MODOS_CORRECAO = {
+    "sequencial": _avaliar_competencias_sequencial,
+    "concorrente": _avaliar_competencias_concorrente,
+    "chamada_unica": _avaliar_competencias_chamada_unica,
+}
+
+# A chamada única devolve cinco análises no mesmo JSON
+MAX_TOKENS_CHAMADA_UNICA = 8192
+
+
+def _max_tokens_do_modo(modo: str) -> int:
+    return MAX_TOKENS_CHAMADA_UNICA if modo == "chamada_unica" else 2048
+
+
+def aquecer_clientes() -> None:
+    """
+    Cria de antemão os clientes e chains dos corretores e do feedback.
+    Chamado no worker_process_init para a primeira correção não pagar a construção.
+    """
+    modo = settings.LLM_MODO_CORRECAO.lower()
+    for temperatura in (TEMP_CORRETOR_RIGOROSO, TEMP_CORRETOR_PADRAO):
+        llm = get_llm_client(
+            temperature=temperatura, json_mode=True, max_output_tokens=_max_tokens_do_modo(modo)
+        )
+        registro.obter_chain_json(PROMPT_AGENTE_COMPETENCIA, llm, AvaliacaoCompetencia)
+        if modo == "chamada_unica":
+            registro.obter_chain_json(PROMPT_AGENTE_TODAS_COMPETENCIAS, llm, AvaliacaoCompleta)
+
+    llm_texto = get_llm_client(temperature=TEMP_FEEDBACK, json_mode=False)
+    registro.obter_chain_texto(PROMPT_FEEDBACK_GERAL, llm_texto)
+    logger.info(f"Clientes LLM aquecidos: {registro.resumo()}")
+
+
 async def executar_correcao_completa_async(
     id_corretor: str, 
     texto_redacao: str, 
-    tema: str
+    tema: str,
+    ao_concluir_competencia: Optional[Callable[[Dict[str, Any]], None]] = None,
+    competencias: Optional[List[int]] = None,
+    gerar_feedback: bool = True,
+    ao_receber_trecho_feedback: Optional[Callable[[str], Awaitable[None]]] = None,
+    avaliacoes_prontas: Optional[Dict[int, Dict[str, Any]]] = None,
 ) -> Dict[str, Any]:
     """
-    Orquestrador SEQUENCIAL (Modelo Gemini).
+    Orquestrador de um corretor. O modo (sequencial, concorrente ou chamada_unica)
+    vem de LLM_MODO_CORRECAO.
+    `ao_concluir_competencia` recebe cada avaliação assim que fica pronta.
+    `competencias` restringe a correção a alguns números (ex.: supervisor parcial).
+    `ao_receber_trecho_feedback` recebe o comentário geral em trechos, via streaming.
+    `avaliacoes_prontas` (número -> avaliação) vêm de uma tentativa anterior e não são refeitas.
     """
     persona_instrucao = PERSONAS.get(id_corretor, PERSONAS["Corretor Supervisor"])
-    logger.info(f"[{id_corretor}] Iniciando correção COM {LLM_PROVIDER.upper()} e persona: {persona_instrucao[:30]}...")
+    logger.info(f"[{id_corretor}] Iniciando correção COM {settings.LLM_PROVIDER.upper()} e persona: {persona_instrucao[:30]}...")
 
     temperatura = TEMP_CORRETOR_RIGOROSO if id_corretor == "Corretor 1" else TEMP_CORRETOR_PADRAO
     
-    llm = get_llm_client(temperature=temperatura, json_mode=True)
+    modo = settings.LLM_MODO_CORRECAO.lower()
+    avaliar = MODOS_CORRECAO.get(modo, _avaliar_competencias_concorrente)
 
-    resultados_competencias = []
+    llm = get_llm_client(temperature=temperatura, json_mode=True, max_output_tokens=_max_tokens_do_modo(modo))
 
-    # --- LOOP SEQUENCIAL ---
-    for info in COMPETENCIAS_INFO:
-        logger.info(f"[{id_corretor}] Processando Competência {info['numero']}...")
-        res = await avaliar_competencia_individual(llm, texto_redacao, tema, info, persona_instrucao)
-        resultados_competencias.append(res)
+    infos = [info for info in COMPETENCIAS_INFO if competencias is None or info["numero"] in competencias]
+    prontas = [
+        (avaliacoes_prontas or {})[info["numero"]]
+        for info in infos if info["numero"] in (avaliacoes_prontas or {})
+    ]
+    if prontas:
+        logger.info(f"[{id_corretor}] Reaproveitando {len(prontas)} competência(s) da tentativa anterior.")
+        infos = [info for info in infos if info["numero"] not in avaliacoes_prontas]
+
+    resultados_competencias = prontas
+    if infos:
+        resultados_competencias = prontas + await avaliar(
+            llm, id_corretor, texto_redacao, tema, persona_instrucao, ao_concluir_competencia, infos
+        )
 
     # Ordenação
     resultados_competencias.sort(key=lambda x: x.get("competencia", 0))
@@ -179,11 +552,14 @@ async def executar_correcao_completa_async(
                 competencias_validas += 1
 
     # Feedback (Se tudo deu certo)
-    else:
+    comentario_geral = ""
+    if gerar_feedback:
         logger.info(f"[{id_corretor}] Gerando feedback final...")
         # Instância sem JSON forçado para o texto livre
-        llm_texto = get_llm_client(temperature=0.7, json_mode=False)
-        comentario_geral = await _gerar_feedback_geral(llm_texto, resultados_competencias)
+        llm_texto = get_llm_client(temperature=TEMP_FEEDBACK, json_mode=False)
+        comentario_geral = await _gerar_feedback_geral(
+            llm_texto, resultados_competencias, ao_receber_trecho_feedback
+        )
 
     logger.info(f"[{id_corretor}] FIM. Nota: {nota_final_calculada}")
 
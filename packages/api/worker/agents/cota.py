@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from google.api_core.exceptions import ResourceExhausted
+from langchain_core.language_models import BaseChatModel
+from langchain_core.prompts import ChatPromptTemplate
+
+from .cache import descrever_llm
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Governador de cota do LLM compartilhado por todos os processos (worker e API).
+# Cada provedor/modelo tem dois baldes de fichas no Redis: requisições/min e
+# tokens/min. Toda chamada retira fichas antes de sair; ao receber um 429 o
+# ritmo cai pela metade e volta a subir aos poucos, respeitando o retry_after.
+#
+# Os scripts Lua rodam atômicos no Redis; calcular_aquisicao e calcular_limite
+# repetem a mesma conta em Python (e são elas que os testes cobrem). Alterou um,
+# altere o outro.
+
+_SCRIPT_ADQUIRIR = """
+local chave = KEYS[1]
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local custo = tonumber(ARGV[3])
+local recuperacao = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local estado = redis.call('HMGET', chave, 'req', 'tok', 'ts', 'fator', 'pausa_ate')
+local fator = tonumber(estado[4]) or 1.0
+local ts = tonumber(estado[3]) or agora
+local pausa_ate = tonumber(estado[5]) or 0
+local decorrido = math.max(0, agora - ts)
+
+fator = math.min(1.0, fator + decorrido * recuperacao)
+local req = math.min(rpm * fator, (tonumber(estado[1]) or rpm) + decorrido * rpm * fator / 60)
+local tok = math.min(tpm * fator, (tonumber(estado[2]) or tpm) + decorrido * tpm * fator / 60)
+custo = math.min(custo, tpm * fator)
+
+local espera = 0
+if pausa_ate > agora then
+    espera = pausa_ate - agora
+else
+    if req < 1 then
+        espera = math.max(espera, (1 - req) * 60 / (rpm * fator))
+    end
+    if tok < custo then
+        espera = math.max(espera, (custo - tok) * 60 / (tpm * fator))
+    end
+    if espera == 0 then
+        req = req - 1
+        tok = tok - custo
+    end
+end
+
+redis.call('HSET', chave, 'req', req, 'tok', tok, 'ts', agora, 'fator', fator, 'pausa_ate', pausa_ate)
+redis.call('EXPIRE', chave, 3600)
+return tostring(espera)
+"""
+
+_SCRIPT_LIMITE = """
+local chave = KEYS[1]
+local retry_after = tonumber(ARGV[1])
+local piso = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local agora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local estado = redis.call('HMGET', chave, 'fator', 'pausa_ate', 'reduzido_em')
+local fator = tonumber(estado[1]) or 1.0
+local pausa_ate = math.max(tonumber(estado[2]) or 0, agora + retry_after)
+local reduzido_em = tonumber(estado[3]) or 0
+
+-- Vários 429 da mesma rajada contam como um só
+if agora - reduzido_em > 5 then
+    fator = math.max(piso, fator * 0.5)
+    reduzido_em = agora
+end
+
+redis.call('HSET', chave, 'req', 0, 'tok', 0, 'ts', agora, 'fator', fator,
+           'pausa_ate', pausa_ate, 'reduzido_em', reduzido_em)
+redis.call('EXPIRE', chave, 3600)
+return tostring(fator)
+"""
+
+Estado = Dict[str, Optional[float]]
+
+
+def _ou(valor: Optional[float], padrao: float) -> float:
+    # Como o "tonumber(x) or padrao" do Lua: 0 é um valor, só a ausência vira o padrão
+    return padrao if valor is None else valor
+
+
+def calcular_aquisicao(
+    estado: Estado, agora: float, rpm: int, tpm: int, custo: float, recuperacao: float
+) -> Tuple[Estado, float]:
+    """Espelho de _SCRIPT_ADQUIRIR: (novo estado do balde, segundos de espera; 0 se liberado)."""
+    fator = _ou(estado.get("fator"), 1.0)
+    ts = _ou(estado.get("ts"), agora)
+    pausa_ate = _ou(estado.get("pausa_ate"), 0)
+    decorrido = max(0, agora - ts)
+
+    fator = min(1.0, fator + decorrido * recuperacao)
+    req = min(rpm * fator, _ou(estado.get("req"), rpm) + decorrido * rpm * fator / 60)
+    tok = min(tpm * fator, _ou(estado.get("tok"), tpm) + decorrido * tpm * fator / 60)
+    custo = min(custo, tpm * fator)
+
+    espera = 0.0
+    if pausa_ate > agora:
+        espera = pausa_ate - agora
+    else:
+        if req < 1:
+            espera = max(espera, (1 - req) * 60 / (rpm * fator))
+        if tok < custo:
+            espera = max(espera, (custo - tok) * 60 / (tpm * fator))
+        if espera == 0:
+            req -= 1
+            tok -= custo
+
+    novo = {**estado, "req": req, "tok": tok, "ts": agora, "fator": fator, "pausa_ate": pausa_ate}
+    return novo, espera
+
+
+def calcular_limite(estado: Estado, agora: float, retry_after: float, piso: float) -> Tuple[Estado, float]:
+    """Espelho de _SCRIPT_LIMITE: (novo estado do balde, novo fator de ritmo)."""
+    fator = _ou(estado.get("fator"), 1.0)
+    pausa_ate = max(_ou(estado.get("pausa_ate"), 0), agora + retry_after)
+    reduzido_em = _ou(estado.get("reduzido_em"), 0)
+
+    # Vários 429 da mesma rajada contam como um só
+    if agora - reduzido_em > 5:
+        fator = max(piso, fator * 0.5)
+        reduzido_em = agora
+
+    novo = {
+        **estado,
+        "req": 0, "tok": 0, "ts": agora, "fator": fator,
+        "pausa_ate": pausa_ate, "reduzido_em": reduzido_em,
+    }
+    return novo, fator
+
+
+# Fração do ritmo recuperada por segundo após um 429 (de 50% a 100% em ~50s)
+RECUPERACAO_POR_SEGUNDO = 0.01
+FATOR_MINIMO = 0.1
+# Espera máxima entre duas consultas ao balde, para reagir a mudanças de ritmo
+ESPERA_MAXIMA_POR_CICLO = 5.0
+
+
+class GovernadorCota:
+    def __init__(self, url: str):
+        import redis
+
+        self.cliente = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+        self._adquirir = self.cliente.register_script(_SCRIPT_ADQUIRIR)
+        self._limite = self.cliente.register_script(_SCRIPT_LIMITE)
+
+    @staticmethod
+    def chave(provedor: str, modelo: str) -> str:
+        return f"atena:cota:{provedor}:{modelo}"
+
+    def tentar_adquirir(self, provedor: str, modelo: str, tokens: int) -> float:
+        """Retira fichas do balde. Devolve 0 se liberado ou quantos segundos esperar."""
+        rpm, tpm = limites(provedor, modelo)
+        espera = self._adquirir(
+            keys=[self.chave(provedor, modelo)],
+            args=[rpm, tpm, tokens, RECUPERACAO_POR_SEGUNDO],
+        )
+        return float(espera)
+
+    def registrar_limite(self, provedor: str, modelo: str, retry_after: float) -> float:
+        """Registra um 429: pausa todos até `retry_after` e reduz o ritmo. Devolve o novo fator."""
+        fator = self._limite(
+            keys=[self.chave(provedor, modelo)],
+            args=[retry_after, FATOR_MINIMO],
+        )
+        return float(fator)
+
+
+def limites(provedor: str, modelo: str) -> Tuple[int, int]:
+    """(requisições/min, tokens/min) do provedor/modelo, com LLM_COTA_LIMITES sobrepondo o padrão."""
+    especifico = settings.LLM_COTA_LIMITES.get(f"{provedor}:{modelo}", {})
+    return (
+        int(especifico.get("rpm", settings.LLM_COTA_RPM)),
+        int(especifico.get("tpm", settings.LLM_COTA_TPM)),
+    )
+
+
+_governador: Optional[GovernadorCota] = None
+_governador_lock = threading.Lock()
+_ultimo_aviso_indisponivel = 0.0
+# Após uma falha de conexão, o Redis só é consultado de novo depois desse instante
+_indisponivel_ate = 0.0
+
+
+def obter_governador() -> GovernadorCota:
+    global _governador
+    if _governador is None:
+        with _governador_lock:
+            if _governador is None:
+                _governador = GovernadorCota(settings.LLM_COTA_REDIS_URL or settings.CELERY_BROKER_URL)
+    return _governador
+
+
+def _disponivel() -> bool:
+    return settings.LLM_COTA_ATIVA and time.monotonic() >= _indisponivel_ate
+
+
+def _avisar_indisponivel(e: Exception) -> None:
+    global _ultimo_aviso_indisponivel, _indisponivel_ate
+    agora = time.monotonic()
+    _indisponivel_ate = agora + 30
+    if agora - _ultimo_aviso_indisponivel > 60:
+        _ultimo_aviso_indisponivel = agora
+        logger.warning(f"Governador de cota indisponível ({e}). Seguindo sem controle distribuído.")
+
+
+def identificar_llm(llm: BaseChatModel) -> Tuple[str, str]:
+    descricao = descrever_llm(llm)
+    provedor = {"ChatGoogleGenerativeAI": "gemini", "ChatOpenAI": "openai"}.get(
+        descricao["provedor"], descricao["provedor"]
+    )
+    # O Gemini via LangChain usa "models/<nome>"; o balde é o mesmo do SDK direto (OCR)
+    return provedor, str(descricao["modelo"]).removeprefix("models/")
+
+
+def estimar_tokens(*partes: Any, saida: int = 1024) -> int:
+    """
+    Estimativa grosseira (~4 caracteres por token) somada à saída esperada.
+    Aceita textos e templates de prompt (conta o texto do template).
+    """
+    total = 0
+    for parte in partes:
+        if isinstance(parte, ChatPromptTemplate):
+            total += sum(len(getattr(getattr(m, "prompt", None), "template", "")) for m in parte.messages)
+        else:
+            total += len(str(parte))
+    return total // 4 + saida
+
+
+def retry_after(e: Exception, padrao: float = 30.0) -> float:
+    """Tempo sugerido pelo provedor no 429, quando houver."""
+    valor = getattr(e, "retry_after", None)
+    try:
+        return float(valor) if valor is not None else padrao
+    except (TypeError, ValueError):
+        return padrao
+
+
+async def adquirir(provedor: str, modelo: str, tokens: int) -> None:
+    """Aguarda até haver cota para uma chamada de `tokens` tokens."""
+    if not _disponivel():
+        return
+    inicio = time.monotonic()
+    while True:
+        try:
+            espera = await asyncio.to_thread(
+                obter_governador().tentar_adquirir, provedor, modelo, tokens
+            )
+        except Exception as e:
+            # Sem Redis não travamos a correção; os 429 continuam tratados por quem chama
+            _avisar_indisponivel(e)
+            return
+        if espera <= 0:
+            aguardado = time.monotonic() - inicio
+            if aguardado > 1:
+                logger.info(f"Cota {provedor}:{modelo} liberada após {aguardado:.1f}s de espera.")
+            return
+        # Jitter para os workers não acordarem todos juntos
+        await asyncio.sleep(min(espera, ESPERA_MAXIMA_POR_CICLO) * random.uniform(1.0, 1.2))
+
+
+async def registrar_limite(
+    provedor: str, modelo: str, espera: float, pausar_localmente: bool = True
+) -> bool:
+    """
+    Informa um 429 ao governador. A próxima `adquirir` já respeita a pausa;
+    se o governador estiver fora do ar, a pausa é feita aqui mesmo (quando `pausar_localmente`).
+    Devolve True se o governador registrou a pausa.
+    """
+    if _disponivel():
+        try:
+            fator = await asyncio.to_thread(
+                obter_governador().registrar_limite, provedor, modelo, espera
+            )
+            logger.warning(
+                f"Rate Limit (429) em {provedor}:{modelo}. Pausa de {espera:.0f}s e ritmo reduzido a {fator:.0%}."
+            )
+            return True
+        except Exception as e:
+            _avisar_indisponivel(e)
+    if pausar_localmente:
+        logger.warning(f"Rate Limit (429) em {provedor}:{modelo}. Pausando por {espera:.0f}s...")
+        await asyncio.sleep(espera)
+    return False
+
+
+async def adquirir_para(llm: BaseChatModel, tokens: int) -> None:
+    await adquirir(*identificar_llm(llm), tokens)
+
+
+async def registrar_limite_para(llm: BaseChatModel, e: ResourceExhausted, padrao: float = 30.0) -> None:
+    await registrar_limite(*identificar_llm(llm), retry_after(e, padrao))
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import ResourceExhausted
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Provedor falso e determinístico (LLM_PROVIDER=fake), para medir o custo do próprio
+# pipeline e o comportamento sob concorrência sem gastar cota: testes e benchmark.py.
+#
+# A resposta depende só do prompt e de LLM_FAKE_SEMENTE: a mesma redação recebe
+# sempre as mesmas notas, e personas diferentes (Corretor 1, 2, Supervisor) podem
+# divergir, exercitando o supervisor. Latência, 429 e saídas malformadas são
+# sorteados por chamada (prompt + número da tentativa), então retentativas não
+# repetem a mesma falha e o resultado não depende da ordem de agendamento.
+
+NOTAS_POSSIVEIS = (80, 120, 120, 160, 160, 160, 200, 200)
+
+_RE_COMPETENCIA = re.compile(r"Avalie a Competência (\d)")
+_RE_TODAS = re.compile(r"Avalie TODAS as cinco competências")
+
+# Totais do processo, para o benchmark calcular chamadas por redação
+_contadores: Counter = Counter()
+_tentativas: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def estatisticas() -> Dict[str, int]:
+    """Chamadas atendidas, 429 injetados e respostas malformadas desde o início do processo."""
+    with _lock:
+        return dict(_contadores)
+
+
+def zerar_estatisticas() -> None:
+    with _lock:
+        _contadores.clear()
+        _tentativas.clear()
+
+
+def _sortear_latencia(rng: random.Random, media: float, distribuicao: str, sigma: float) -> float:
+    if media <= 0:
+        return 0.0
+    if distribuicao == "fixa":
+        return media
+    if distribuicao == "uniforme":
+        return rng.uniform(0, 2 * media)
+    if distribuicao == "exponencial":
+        return rng.expovariate(1 / media)
+    # lognormal (padrão): cauda longa, parecida com a de APIs reais; média = `media`
+    return rng.lognormvariate(math.log(media) - sigma ** 2 / 2, sigma)
+
+
+class ChatFalso(BaseChatModel):
+    """Chat model que devolve avaliações válidas (AvaliacaoCompetencia) sem rede."""
+
+    model: str = "falso"
+    temperature: float = 0.0
+    json_mode: bool = True
+    semente: int = 0
+    latencia_media: float = 1.0
+    latencia_distribuicao: str = "lognormal"
+    latencia_sigma: float = 0.5
+    taxa_429: float = 0.0
+    taxa_malformada: float = 0.0
+    retry_after_429: float = 1.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "temperature": self.temperature, "semente": self.semente}
+
+    def _sortear(self, prompt: str) -> Tuple[float, Optional[Exception], str]:
+        """(latência, erro a levantar, conteúdo) para esta chamada."""
+        digest = hashlib.sha256(f"{self.semente}:{self.temperature}:{prompt}".encode()).hexdigest()
+        with _lock:
+            tentativa = _tentativas.get(digest, 0)
+            _tentativas[digest] = tentativa + 1
+            _contadores["chamadas"] += 1
+
+        rng = random.Random(f"{digest}:{tentativa}")
+        latencia = _sortear_latencia(
+            rng, self.latencia_media, self.latencia_distribuicao.lower(), self.latencia_sigma
+        )
+        if rng.random() < self.taxa_429:
+            with _lock:
+                _contadores["429"] += 1
+            erro = ResourceExhausted("429 Resource exhausted (provedor falso)")
+            erro.retry_after = self.retry_after_429
+            # Um 429 real volta rápido, sem gerar resposta
+            return latencia * 0.1, erro, ""
+
+        conteudo = self._responder(prompt, random.Random(digest))
+        if rng.random() < self.taxa_malformada:
+            with _lock:
+                _contadores["malformadas"] += 1
+            conteudo = conteudo[: len(conteudo) // 2]
+        return latencia, None, conteudo
+
+    def _responder(self, prompt: str, rng: random.Random) -> str:
+        if not self.json_mode:
+            return (
+                "Seu texto mostra domínio do tema e boa organização das ideias. "
+                "Revise a pontuação e detalhe melhor a proposta de intervenção."
+            )
+        if _RE_TODAS.search(prompt):
+            return json.dumps(
+                {"competencias": [self._avaliacao(n, rng) for n in range(1, 6)]}, ensure_ascii=False
+            )
+        encontrado = _RE_COMPETENCIA.search(prompt)
+        numero = int(encontrado.group(1)) if encontrado else 1
+        return json.dumps(self._avaliacao(numero, rng), ensure_ascii=False)
+
+    @staticmethod
+    def _avaliacao(numero: int, rng: random.Random) -> Dict[str, Any]:
+        nota = rng.choice(NOTAS_POSSIVEIS)
+        return {
+            "competencia": numero,
+            "analise_critica": f"Pontos fortes e melhorias da competência {numero} (avaliação simulada).",
+            "nota": nota,
+            "justificativa": f"Nota {nota} atribuída pelo provedor falso.",
+        }
+
+    @staticmethod
+    def _texto_do_prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        latencia, erro, conteudo = self._sortear(self._texto_do_prompt(messages))
+        time.sleep(latencia)
+        if erro is not None:
+            raise erro
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=conteudo))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        latencia, erro, conteudo = self._sortear(self._texto_do_prompt(messages))
+        await asyncio.sleep(latencia)
+        if erro is not None:
+            raise erro
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=conteudo))])
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from langchain_core.language_models import BaseChatModel
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Requisições "hedged" entre o provedor principal e o de reserva (LLM_BACKUP_*).
+# Se o principal não responde dentro do percentil configurado das suas latências
+# recentes, a mesma chamada sai para o reserva e vale a primeira resposta.
+# Quando a taxa de erro do principal dispara, todo o tráfego vai para o reserva
+# por um tempo (failover) antes de o principal ser testado de novo.
+
+T = TypeVar("T")
+
+
+class _Envio:
+    """Momento em que a chamada medida saiu para o provedor (depois da cota)."""
+
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.enviado = asyncio.Event()
+
+    def marcar(self) -> None:
+        self.inicio = time.monotonic()
+        self.enviado.set()
+
+
+# Envio da chamada em curso. Quem chama marca o envio depois da cota (marcar_envio):
+# a espera pela cota não é latência do provedor, não entra no percentil e não
+# conta para o relógio do hedge.
+_envio_atual: ContextVar[Optional[_Envio]] = ContextVar("envio_llm", default=None)
+
+
+def marcar_envio() -> None:
+    """Marca o envio da chamada ao provedor: início da latência medida e do relógio do hedge."""
+    envio = _envio_atual.get()
+    if envio is not None:
+        envio.marcar()
+
+
+class EstatisticasProvedor:
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.latencias: Deque[float] = deque(maxlen=200)
+        self.resultados: Deque[bool] = deque(maxlen=max(1, settings.LLM_FAILOVER_JANELA))
+        self.failover_ate = 0.0
+
+    def registrar(self, sucesso: bool, latencia: Optional[float] = None) -> None:
+        self.resultados.append(sucesso)
+        if sucesso and latencia is not None:
+            self.latencias.append(latencia)
+
+    def limiar_hedge(self) -> float:
+        """Segundos de espera antes de disparar o reserva: percentil das latências recentes."""
+        if len(self.latencias) < settings.LLM_HEDGE_MIN_AMOSTRAS:
+            return settings.LLM_HEDGE_ATRASO_PADRAO
+        ordenadas = sorted(self.latencias)
+        indice = min(len(ordenadas) - 1, int(settings.LLM_HEDGE_PERCENTIL * len(ordenadas)))
+        return ordenadas[indice]
+
+    def taxa_erro(self) -> float:
+        if not self.resultados:
+            return 0.0
+        return self.resultados.count(False) / len(self.resultados)
+
+    def em_failover(self) -> bool:
+        return time.monotonic() < self.failover_ate
+
+
+class Hedger:
+    def __init__(self):
+        self._estatisticas: Dict[str, EstatisticasProvedor] = {}
+        self._lock = threading.Lock()
+        self.contadores = {"hedges": 0, "vitorias_backup": 0, "failovers": 0, "desvios_failover": 0}
+
+    def estatisticas_de(self, llm: BaseChatModel) -> EstatisticasProvedor:
+        nome = f"{type(llm).__name__}:{getattr(llm, 'model', None) or getattr(llm, 'model_name', None)}"
+        with self._lock:
+            if nome not in self._estatisticas:
+                self._estatisticas[nome] = EstatisticasProvedor(nome)
+            return self._estatisticas[nome]
+
+    def _contar(self, evento: str) -> None:
+        with self._lock:
+            self.contadores[evento] += 1
+
+    def _registrar_erro_principal(self, estatisticas: EstatisticasProvedor) -> None:
+        estatisticas.registrar(False)
+        janela_cheia = len(estatisticas.resultados) >= estatisticas.resultados.maxlen
+        if (
+            janela_cheia
+            and not estatisticas.em_failover()
+            and estatisticas.taxa_erro() >= settings.LLM_FAILOVER_TAXA_ERRO
+        ):
+            estatisticas.failover_ate = time.monotonic() + settings.LLM_FAILOVER_DURACAO
+            estatisticas.resultados.clear()
+            self._contar("failovers")
+            logger.warning(
+                f"Taxa de erro alta em {estatisticas.nome}. Failover para o provedor reserva "
+                f"por {settings.LLM_FAILOVER_DURACAO:.0f}s."
+            )
+
+    async def _medir(
+        self,
+        chamar: Callable[[BaseChatModel], Awaitable[T]],
+        llm: BaseChatModel,
+        principal: bool,
+        envio: Optional[_Envio] = None,
+    ) -> T:
+        estatisticas = self.estatisticas_de(llm)
+        # Cada _medir roda na própria task, então a marca não vaza para a outra chamada do hedge
+        envio = envio or _Envio()
+        marca = _envio_atual.set(envio)
+        try:
+            resultado = await chamar(llm)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if principal:
+                self._registrar_erro_principal(estatisticas)
+            else:
+                estatisticas.registrar(False)
+            raise
+        finally:
+            _envio_atual.reset(marca)
+        estatisticas.registrar(True, time.monotonic() - envio.inicio)
+        return resultado
+
+    async def executar(
+        self,
+        chamar: Callable[[BaseChatModel], Awaitable[T]],
+        principal: BaseChatModel,
+        backup: Optional[BaseChatModel],
+    ) -> T:
+        """
+        Executa `chamar(cliente)` no principal, com hedge e failover para o `backup` quando houver.
+        `chamar` deve chamar marcar_envio() ao enviar: o reserva só entra `limiar` segundos depois disso.
+        """
+        if backup is None:
+            return await chamar(principal)
+
+        estatisticas = self.estatisticas_de(principal)
+        if estatisticas.em_failover():
+            self._contar("desvios_failover")
+            return await self._medir(chamar, backup, principal=False)
+
+        envio = _Envio()
+        tarefa_principal = asyncio.ensure_future(self._medir(chamar, principal, True, envio))
+        espera_envio = asyncio.ensure_future(envio.enviado.wait())
+        try:
+            # O relógio do hedge começa no envio: fila na nossa própria cota não é lentidão do provedor
+            await asyncio.wait({tarefa_principal, espera_envio}, return_when=asyncio.FIRST_COMPLETED)
+            if not tarefa_principal.done():
+                await asyncio.wait({tarefa_principal}, timeout=estatisticas.limiar_hedge())
+        except asyncio.CancelledError:
+            tarefa_principal.cancel()
+            raise
+        finally:
+            espera_envio.cancel()
+
+        if tarefa_principal.done():
+            erro_principal = tarefa_principal.exception()
+            if erro_principal is None:
+                return tarefa_principal.result()
+            logger.warning(f"Falha no provedor principal ({erro_principal}). Tentando o reserva...")
+            return await self._medir(chamar, backup, principal=False)
+
+        # Principal atrasado: dispara o reserva e fica com a primeira resposta válida
+        self._contar("hedges")
+        tarefa_backup = asyncio.ensure_future(self._medir(chamar, backup, principal=False))
+        pendentes = {tarefa_principal, tarefa_backup}
+        erro: Optional[BaseException] = None
+        try:
+            while pendentes:
+                prontas, pendentes = await asyncio.wait(pendentes, return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in prontas:
+                    if tarefa.exception() is None:
+                        if tarefa is tarefa_backup:
+                            self._contar("vitorias_backup")
+                        return tarefa.result()
+                    # O erro do principal tem prioridade: é ele que o chamador sabe tratar (ex.: 429)
+                    if erro is None or tarefa is tarefa_principal:
+                        erro = tarefa.exception()
+            raise erro  # type: ignore[misc]
+        finally:
+            for tarefa in pendentes:
+                tarefa.cancel()
+
+
+_hedger = Hedger()
+
+
+def obter_hedger() -> Hedger:
+    return _hedger
+
+
+def estatisticas() -> Dict[str, int]:
+    """Totais do processo: hedges disparados, vitórias do reserva e failovers."""
+    with _hedger._lock:
+        return dict(_hedger.contadores)
+
+
+async def executar(
+    chamar: Callable[[BaseChatModel], Awaitable[T]],
+    principal: BaseChatModel,
+    backup: Optional[BaseChatModel],
+) -> T:
+    return await _hedger.executar(chamar, principal, backup)
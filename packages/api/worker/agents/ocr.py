@@ -1,22 +1,30 @@
 import logging
 import base64
+import hashlib
 from typing import Dict, Any
 from google.generativeai import GenerativeModel
 import google.generativeai as genai
+from google.api_core.exceptions import ResourceExhausted
 from shared.config import settings
+from . import cassete, cota
 
 logger = logging.getLogger(__name__)
 
+MODELO_OCR = "gemini-2.0-flash"
+# Uma imagem custa ~258 tokens no Gemini; a transcrição de uma página fica por volta de 1500
+TOKENS_IMAGEM = 258
+TOKENS_TRANSCRICAO = 1500
+
 # Configura o SDK do Google para Vision (mais direto que Langchain para arquivos brutos)
 genai.configure(api_key=settings.GOOGLE_API_KEY)
 
-async def extrair_texto_da_imagem_async(image_bytes: bytes) -> str:
+async def extrair_texto_da_imagem_async(image_bytes: bytes, mime_type: str = "image/jpeg") -> str:
     """
     Usa o modelo multimodal do Gemini para transcrever uma imagem de redação.
     """
     try:
         # Usamos o modelo Flash para velocidade e visão
-        model = genai.GenerativeModel(model_name="gemini-2.0-flash")
+        model = genai.GenerativeModel(model_name=MODELO_OCR)
         
         prompt = (
             "Você é um especialista em transcrição de manuscritos. "
@@ -33,15 +41,32 @@ async def extrair_texto_da_imagem_async(image_bytes: bytes) -> str:
         contents = [
             prompt,
             {
-                "mime_type": "image/jpeg",
+                "mime_type": mime_type,
                 "data": image_bytes
             }
         ]
 
-        logger.info("Enviando imagem para transcrição via Gemini Vision...")
-        response = model.generate_content(contents)
-        
-        texto_extraido = response.text.strip()
+        async def _transcrever() -> str:
+            await cota.adquirir(
+                "gemini", MODELO_OCR, cota.estimar_tokens(prompt, saida=TOKENS_IMAGEM + TOKENS_TRANSCRICAO)
+            )
+            logger.info("Enviando imagem para transcrição via Gemini Vision...")
+            try:
+                # Versão assíncrona do SDK: a chamada não trava o event loop (API ou worker)
+                response = await model.generate_content_async(contents)
+            except ResourceExhausted as e:
+                # Avisa o governador para os próximos pedidos esperarem; este falha para o usuário tentar de novo
+                await cota.registrar_limite(
+                    "gemini", MODELO_OCR, cota.retry_after(e), pausar_localmente=False
+                )
+                raise
+            return response.text
+
+        # A imagem entra na impressão digital pelo hash, não pelos bytes
+        chave = cassete.impressao_digital(
+            "ocr", modelo=MODELO_OCR, prompt=prompt, imagem=hashlib.sha256(image_bytes).hexdigest()
+        )
+        texto_extraido = (await cassete.interceptar(chave, _transcrever, descricao="OCR")).strip()
         
         if "[ERRO: IMAGEM INVÁLIDA]" in texto_extraido:
             raise ValueError("A imagem enviada não parece ser uma redação válida.")
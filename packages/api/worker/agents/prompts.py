@@ -1,6 +1,9 @@
 from typing import List, Dict, Any
 from langchain_core.prompts import ChatPromptTemplate
 
+# Incremente ao alterar prompts ou critérios: a versão entra na chave do cache de respostas do LLM
+VERSAO_RUBRICA = "1"
+
 # Prompt Humanizado: Corretor amigável e justo
 PROMPT_AGENTE_COMPETENCIA = ChatPromptTemplate.from_template(
     """Você é um professor de redação experiente e HUMANO. Seu papel é ajudar o aluno a melhorar.
@@ -44,6 +47,52 @@ Retorne JSON com:
 """
 )
 
+# Variante de chamada única: avalia as cinco competências de uma vez
+PROMPT_AGENTE_TODAS_COMPETENCIAS = ChatPromptTemplate.from_template(
+    """Você é um professor de redação experiente e HUMANO. Seu papel é ajudar o aluno a melhorar.
+{instrucoes_persona}
+
+Avalie TODAS as cinco competências do ENEM com justiça e empatia, cada uma de forma independente.
+
+=== DIRETRIZES IMPORTANTES ===
+- VALORIZE primeiro os pontos positivos do texto.
+- Seja GENEROSO com redações bem estruturadas - dê 180 ou 200 quando merecido!
+- Pequenos deslizes NÃO impedem notas altas se o texto é bom no geral.
+- Evite ser excessivamente punitivo ou mecânico.
+- Lembre: o objetivo é AJUDAR, não punir.
+
+=== CRITÉRIOS POR COMPETÊNCIA ===
+{criterios_todas_competencias}
+
+=== REDAÇÃO A AVALIAR ===
+{redacao}
+================
+
+Tema proposto: {tema}
+
+=== NOTAS ESPECIAIS ===
+- Se o texto tem boa qualidade geral, prefira notas 160-200.
+- Reserve notas baixas (0-80) apenas para problemas muito graves.
+- 120 é uma nota mediana - use para textos regulares.
+- 160-180 são para bons textos com pequenas falhas.
+- 200 é para excelência - mas não precisa ser perfeição absoluta!
+
+=== SAÍDA ===
+Retorne JSON com a chave "competencias": uma lista com exatamente 5 itens, um por competência (1 a 5), cada um com:
+- "competencia" (int): número da competência.
+- "analise_critica" (string): comece pelos PONTOS FORTES, depois sugira melhorias de forma construtiva.
+- "nota" (int): a nota justa (0, 40, 80, 120, 160, ou 200).
+- "justificativa" (string): explicação breve e encorajadora.
+{format_instructions}
+"""
+)
+
+# Feedback geral em texto livre, gerado a partir das avaliações de um corretor
+PROMPT_FEEDBACK_GERAL = ChatPromptTemplate.from_template(
+    "Com base nestas avaliações, escreva um feedback geral curto e motivador para o aluno. "
+    "Texto corrido apenas. Avaliações: {avaliacoes}"
+)
+
 # Critérios ajustados para serem mais justos e humanos
 COMPETENCIAS_INFO: List[Dict[str, Any]] = [
     {
@@ -137,4 +186,16 @@ COMPETENCIAS_INFO: List[Dict[str, Any]] = [
         - 0: Sem proposta de intervenção.
         """.strip(),
     },
-]
\ No newline at end of file
+]
+
+
+def formatar_criterios_todas_competencias() -> str:
+    """Monta o bloco de critérios das cinco competências para o prompt de chamada única."""
+    blocos = []
+    for info in COMPETENCIAS_INFO:
+        blocos.append(
+            f"--- Competência {info['numero']} ---\n"
+            f"{info['criterios']}\n"
+            f"Considerações específicas:\n{info.get('criterios_negativos', '').strip()}"
+        )
+    return "\n\n".join(blocos)
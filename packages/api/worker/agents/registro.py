@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Type
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# Registro do processo: clientes LLM e chains compilados uma única vez e
+# reaproveitados por todas as correções. Os clientes mantêm seus pools HTTP
+# abertos entre tasks, tirando construção de objetos e handshakes TLS do caminho crítico.
+#
+# Clientes assíncronos ficam presos ao event loop em que abriram conexões: cada
+# loop tem o seu registro (ex.: o loop persistente do worker e um asyncio.run de
+# benchmark ou de teste convivem sem um descartar os clientes do outro). Clientes
+# criados fora de um loop (aquecimento) ainda não abriram conexões e passam para
+# o primeiro loop que pedir um cliente.
+
+
+class _Registro:
+    def __init__(self):
+        self.clientes: Dict[Hashable, BaseChatModel] = {}
+        self.chains: Dict[Hashable, Tuple[Runnable, Optional[str]]] = {}
+        self.chaves: Dict[int, Hashable] = {}
+
+
+_por_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Registro]" = weakref.WeakKeyDictionary()
+_sem_loop = _Registro()
+_lock = threading.RLock()
+
+
+def _registro_atual() -> _Registro:
+    global _sem_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return _sem_loop
+    registro = _por_loop.get(loop)
+    if registro is None:
+        with _lock:
+            registro = _por_loop.get(loop)
+            if registro is None:
+                for antigo in [l for l in _por_loop if l.is_closed()]:
+                    del _por_loop[antigo]
+                if _sem_loop.clientes:
+                    registro, _sem_loop = _sem_loop, _Registro()
+                else:
+                    registro = _Registro()
+                _por_loop[loop] = registro
+    return registro
+
+
+def obter_cliente(chave: Hashable, fabrica: Callable[[], BaseChatModel]) -> BaseChatModel:
+    """Devolve o cliente registrado em `chave`, criando-o com `fabrica` na primeira vez."""
+    registro = _registro_atual()
+    cliente = registro.clientes.get(chave)
+    if cliente is None:
+        with _lock:
+            cliente = registro.clientes.get(chave)
+            if cliente is None:
+                cliente = fabrica()
+                registro.clientes[chave] = cliente
+                registro.chaves[id(cliente)] = chave
+    return cliente
+
+
+def chave_do_cliente(cliente: BaseChatModel) -> Optional[Hashable]:
+    """Chave com que o cliente foi registrado (None se não veio do registro)."""
+    registro = _registro_atual()
+    chave = registro.chaves.get(id(cliente))
+    if chave is not None and registro.clientes.get(chave) is cliente:
+        return chave
+    return None
+
+
+def obter_chain_json(
+    prompt: ChatPromptTemplate, llm: BaseChatModel, schema: Type[BaseModel]
+) -> Tuple[Runnable, str]:
+    """`prompt | llm | JsonOutputParser(schema)` compilado uma vez, com as format_instructions prontas."""
+    chains = _registro_atual().chains
+    chave = ("json", id(prompt), id(llm), schema)
+    item = chains.get(chave)
+    if item is None:
+        with _lock:
+            item = chains.get(chave)
+            if item is None:
+                parser = JsonOutputParser(pydantic_object=schema)
+                item = (prompt | llm | parser, parser.get_format_instructions())
+                chains[chave] = item
+    return item  # type: ignore[return-value]
+
+
+def obter_chain_texto(prompt: ChatPromptTemplate, llm: BaseChatModel) -> Runnable:
+    """`prompt | llm` para respostas em texto livre."""
+    chains = _registro_atual().chains
+    chave = ("texto", id(prompt), id(llm))
+    item = chains.get(chave)
+    if item is None:
+        with _lock:
+            item = chains.get(chave)
+            if item is None:
+                item = (prompt | llm, None)
+                chains[chave] = item
+    return item[0]
+
+
+def limpar() -> None:
+    """Descarta clientes e chains (testes ou troca de configuração)."""
+    global _sem_loop
+    with _lock:
+        _por_loop.clear()
+        _sem_loop = _Registro()
+
+
+def resumo() -> Dict[str, Any]:
+    """Totais do registro do loop atual (ou do aquecimento, fora de um loop)."""
+    registro = _registro_atual()
+    return {"clientes": len(registro.clientes), "chains": len(registro.chains)}
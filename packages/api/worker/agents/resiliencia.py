@@ -0,0 +1,257 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+import openai
+from google.api_core import exceptions as google_exceptions
+from google.api_core.exceptions import ResourceExhausted
+from langchain_core.language_models import BaseChatModel
+
+from . import cota
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Camada de resiliência de todas as chamadas ao LLM:
+#   - retentativas limitadas (LLM_MAX_TENTATIVAS) com backoff exponencial e jitter
+#     completo (espera sorteada entre 0 e o teto), para os workers não repetirem juntos;
+#   - circuit breaker por provedor/modelo: após falhas seguidas, as chamadas falham
+#     na hora por um tempo em vez de ocupar o worker esperando timeouts;
+#   - prazo da correção, definido na task e visível em cada chamada (contextvar).
+#     Ao estourar, o trabalho pendente é cancelado e a task termina com erro.
+
+T = TypeVar("T")
+
+
+class FalhaLLM(Exception):
+    """Falha definitiva de chamada ao LLM (a correção não deve seguir com nota 0)."""
+
+
+class PrazoEsgotado(FalhaLLM):
+    pass
+
+
+class CircuitoAberto(FalhaLLM):
+    pass
+
+
+class TentativasEsgotadas(FalhaLLM):
+    pass
+
+
+# Erros passageiros: vale tentar de novo depois de um tempo
+ERROS_TRANSITORIOS = (
+    asyncio.TimeoutError,
+    httpx.TransportError,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    openai.RateLimitError,
+)
+
+
+
+def vale_nova_tentativa(e: BaseException) -> bool:
+    """
+    Se a correção que falhou com `e` deve voltar para a fila: só falhas passageiras
+    do provedor. Prazo esgotado e respostas inválidas não melhoram repetindo.
+    """
+    return isinstance(e, (TentativasEsgotadas, CircuitoAberto, ResourceExhausted) + ERROS_TRANSITORIOS)
+
+# --- Prazo ---
+
+_prazo: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("prazo_correcao", default=None)
+
+
+def tempo_restante() -> Optional[float]:
+    """Segundos até o prazo da correção atual (None se não houver prazo)."""
+    limite = _prazo.get()
+    if limite is None:
+        return None
+    return limite - time.monotonic()
+
+
+@contextlib.asynccontextmanager
+async def prazo(segundos: float) -> AsyncIterator[None]:
+    """
+    Define o prazo do bloco. As tasks criadas dentro dele herdam o prazo;
+    ao estourar, tudo é cancelado e PrazoEsgotado é levantado.
+    """
+    token = _prazo.set(time.monotonic() + segundos)
+    controle = asyncio.timeout(segundos)
+    try:
+        async with controle:
+            yield
+    except TimeoutError as e:
+        if controle.expired():
+            raise PrazoEsgotado(f"Prazo de {segundos:.0f}s da correção esgotado.") from e
+        raise
+    finally:
+        _prazo.reset(token)
+
+
+# --- Circuit breaker ---
+
+class Circuito:
+    """
+    Fechado: chamadas passam. Após `limite_falhas` falhas seguidas, abre por
+    `segundos_aberto`; depois deixa uma chamada de teste passar (semiaberto),
+    que fecha o circuito se der certo ou o reabre se falhar.
+    """
+
+    def __init__(self, nome: str, limite_falhas: int, segundos_aberto: float):
+        self.nome = nome
+        self.limite_falhas = max(1, limite_falhas)
+        self.segundos_aberto = segundos_aberto
+        self.falhas_seguidas = 0
+        self.aberto_ate = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self) -> str:
+        if self.falhas_seguidas < self.limite_falhas:
+            return "fechado"
+        return "aberto" if time.monotonic() < self.aberto_ate else "semiaberto"
+
+    def permitir(self) -> bool:
+        with self._lock:
+            estado = self.estado
+            if estado == "fechado":
+                return True
+            if estado == "semiaberto" and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return True
+            return False
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            if self.falhas_seguidas >= self.limite_falhas:
+                logger.info(f"Circuito {self.nome} fechado: provedor respondendo de novo.")
+            self.falhas_seguidas = 0
+            self._teste_em_andamento = False
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self.falhas_seguidas += 1
+            self._teste_em_andamento = False
+            if self.falhas_seguidas >= self.limite_falhas:
+                self.aberto_ate = time.monotonic() + self.segundos_aberto
+                logger.warning(
+                    f"Circuito {self.nome} aberto por {self.segundos_aberto:.0f}s "
+                    f"após {self.falhas_seguidas} falhas seguidas."
+                )
+
+    def liberar(self) -> None:
+        """Chamada de teste terminou sem veredito (ex.: cancelada)."""
+        with self._lock:
+            self._teste_em_andamento = False
+
+
+_circuitos: Dict[str, Circuito] = {}
+_circuitos_lock = threading.Lock()
+
+
+def circuito_de(llm: BaseChatModel) -> Circuito:
+    nome = ":".join(cota.identificar_llm(llm))
+    with _circuitos_lock:
+        circuito = _circuitos.get(nome)
+        if circuito is None:
+            circuito = Circuito(
+                nome, settings.LLM_CIRCUITO_FALHAS, settings.LLM_CIRCUITO_SEGUNDOS_ABERTO
+            )
+            _circuitos[nome] = circuito
+        return circuito
+
+
+@contextlib.asynccontextmanager
+async def protegido(llm: BaseChatModel) -> AsyncIterator[None]:
+    """Envolve uma chamada ao `llm` no circuito do seu provedor."""
+    circuito = circuito_de(llm)
+    if not circuito.permitir():
+        raise CircuitoAberto(f"Circuito {circuito.nome} aberto: chamada recusada.")
+    try:
+        yield
+    except ERROS_TRANSITORIOS:
+        circuito.registrar_falha()
+        raise
+    except BaseException:
+        # 429, erros de parsing e cancelamentos não dizem nada sobre a saúde do provedor
+        circuito.liberar()
+        raise
+    else:
+        circuito.registrar_sucesso()
+
+
+# --- Retentativas ---
+
+def backoff(tentativa: int) -> float:
+    """Espera antes da `tentativa` seguinte: exponencial com jitter completo."""
+    teto = min(settings.LLM_BACKOFF_MAXIMO, settings.LLM_BACKOFF_BASE * (2 ** (tentativa - 1)))
+    return random.uniform(0, teto)
+
+
+async def _aguardar(espera: float, descricao: str) -> None:
+    restante = tempo_restante()
+    if restante is not None and espera >= restante:
+        # Não adianta esperar para bater no prazo: libera o worker já
+        raise PrazoEsgotado(f"{descricao}: sem tempo para nova tentativa antes do prazo.")
+    await asyncio.sleep(espera)
+
+
+async def com_retentativas(
+    chamar: Callable[[], Awaitable[T]],
+    llm: BaseChatModel,
+    descricao: str = "Chamada ao LLM",
+    ao_receber_429: Optional[Callable[[], None]] = None,
+    padrao_retry_429: float = 30.0,
+) -> T:
+    """
+    Executa `chamar()` com até LLM_MAX_TENTATIVAS tentativas.
+    429 e erros transitórios são repetidos com backoff; os demais erros sobem na hora.
+    Levanta PrazoEsgotado, CircuitoAberto ou TentativasEsgotadas quando desiste.
+    """
+    max_tentativas = max(1, settings.LLM_MAX_TENTATIVAS)
+    for tentativa in range(1, max_tentativas + 1):
+        restante = tempo_restante()
+        if restante is not None and restante <= 0:
+            raise PrazoEsgotado(f"{descricao}: prazo da correção esgotado.")
+        espera_minima = 0.0
+        try:
+            return await chamar()
+
+        except ResourceExhausted as e:
+            # Semáforo Vermelho 🔴: o governador pausa todos os workers pelo retry_after
+            if ao_receber_429:
+                ao_receber_429()
+            espera_429 = cota.retry_after(e, padrao_retry_429)
+            registrado = await cota.registrar_limite(
+                *cota.identificar_llm(llm), espera_429, pausar_localmente=False
+            )
+            if not registrado:
+                # Sem governador, a pausa pedida pelo provedor fica por nossa conta
+                espera_minima = espera_429
+            erro: Exception = e
+
+        except ERROS_TRANSITORIOS as e:
+            erro = e
+
+        if tentativa < max_tentativas:
+            espera = max(espera_minima, backoff(tentativa))
+            logger.warning(
+                f"{descricao}: tentativa {tentativa}/{max_tentativas} falhou ({type(erro).__name__}). "
+                f"Nova tentativa em {espera:.1f}s."
+            )
+            await _aguardar(espera, descricao)
+
+    raise TentativasEsgotadas(
+        f"{descricao}: {max_tentativas} tentativas sem sucesso ({type(erro).__name__}: {erro})."
+    ) from erro
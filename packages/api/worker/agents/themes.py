@@ -3,11 +3,10 @@ import json
 import logging
 from typing import Dict, Any, List
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 
 from .core import get_llm_client
-from google.api_core.exceptions import ResourceExhausted
+from . import cota, registro, resiliencia
 
 logger = logging.getLogger(__name__)
 
@@ -43,21 +42,21 @@ async def gerar_sugestao_tema_async() -> Dict[str, Any]:
     """
     # Usamos uma temperatura um pouco mais alta (0.7) para criatividade no tema
     llm = get_llm_client(temperature=0.8, json_mode=True)
-    parser = JsonOutputParser(pydantic_object=SugestaoTema)
-    
-    chain = PROMPT_SUGESTAO_TEMA | llm | parser
-
-    while True:
-        try:
-            resultado = await chain.ainvoke({
-                "format_instructions": parser.get_format_instructions(),
+    chain, format_instructions = registro.obter_chain_json(PROMPT_SUGESTAO_TEMA, llm, SugestaoTema)
+
+    async def _chamar() -> Dict[str, Any]:
+        await cota.adquirir_para(
+            llm, cota.estimar_tokens(PROMPT_SUGESTAO_TEMA, format_instructions)
+        )
+        async with resiliencia.protegido(llm):
+            return await chain.ainvoke({
+                "format_instructions": format_instructions,
             })
-            return resultado
-
-        except ResourceExhausted:
-            logger.warning("Rate limit ao sugerir tema. Aguardando...")
-            await asyncio.sleep(10)
-            continue
-        except Exception as e:
-            logger.error(f"Erro ao gerar sugestão de tema: {e}")
-            raise e
+
+    try:
+        return await resiliencia.com_retentativas(
+            _chamar, llm, descricao="Sugestão de tema", padrao_retry_429=10.0
+        )
+    except Exception as e:
+        logger.error(f"Erro ao gerar sugestão de tema: {e}")
+        raise e
@@ -1,4 +1,8 @@
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Set
+
+# Critérios oficiais de discrepância entre os dois corretores
+LIMITE_DISCREPANCIA_TOTAL = 100
+LIMITE_DISCREPANCIA_COMPETENCIA = 80
 
 
 def arredondar_nota_enem(nota: float) -> int:
@@ -10,13 +14,17 @@ def arredondar_nota_enem(nota: float) -> int:
     return min(valores_validos, key=lambda x: abs(x - nota))
 
 
+def competencia_discrepante(nota1: float, nota2: float) -> bool:
+    return abs(nota1 - nota2) > LIMITE_DISCREPANCIA_COMPETENCIA
+
+
 def verificar_discrepancia(c1: Dict[str, Any], c2: Dict[str, Any]) -> bool:
     """Verifica se há discrepância total ou por competência."""
-    if abs(c1["nota_final"] - c2["nota_final"]) > 100:
+    if abs(c1["nota_final"] - c2["nota_final"]) > LIMITE_DISCREPANCIA_TOTAL:
         print(f"Discrepância TOTAL detectada: {c1['nota_final']} vs {c2['nota_final']}")
         return True
     for comp1, comp2 in zip(c1["competencias"], c2["competencias"]):
-        if abs(comp1["nota"] - comp2["nota"]) > 80:
+        if competencia_discrepante(comp1["nota"], comp2["nota"]):
             print(
                 f"Discrepância na Competência {comp1['competencia']} detectada: {comp1['nota']} vs {comp2['nota']}"
             )
@@ -24,6 +32,65 @@ def verificar_discrepancia(c1: Dict[str, Any], c2: Dict[str, Any]) -> bool:
     return False
 
 
+def competencias_discrepantes(c1: Dict[str, Any], c2: Dict[str, Any]) -> List[int]:
+    """
+    Competências que o supervisor precisa reavaliar: as que ultrapassam o limite
+    por competência, ou todas quando a discrepância é no total.
+    """
+    if abs(c1["nota_final"] - c2["nota_final"]) > LIMITE_DISCREPANCIA_TOTAL:
+        return [i + 1 for i in range(len(c1["competencias"]))]
+    return [
+        comp1.get("competencia", i + 1)
+        for i, (comp1, comp2) in enumerate(zip(c1["competencias"], c2["competencias"]))
+        if competencia_discrepante(comp1["nota"], comp2["nota"])
+    ]
+
+
+def mesclar_correcoes_parciais(parciais: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Junta correções parciais do mesmo corretor (cada uma com algumas competências)."""
+    competencias = sorted(
+        (comp for parcial in parciais for comp in parcial["competencias"]),
+        key=lambda comp: comp["competencia"],
+    )
+    return {
+        "competencias": competencias,
+        "nota_final": sum(comp["nota"] for comp in competencias),
+        "comentarios_gerais": "",
+        "id_corretor": parciais[0].get("id_corretor") if parciais else None,
+    }
+
+
+class DetectorDiscrepancia:
+    """
+    Compara as notas dos Corretores 1 e 2 conforme cada competência fica pronta.
+    Chama `ao_detectar` uma vez para cada competência cujo par já ultrapassa o limite,
+    antes de os dois corretores terminarem.
+    """
+
+    def __init__(self, ao_detectar: Callable[[int], None]):
+        self.ao_detectar = ao_detectar
+        self.notas: Dict[str, Dict[int, float]] = {"Corretor 1": {}, "Corretor 2": {}}
+        self.competencias_detectadas: Set[int] = set()
+
+    def registrar(self, id_corretor: str, avaliacao: Dict[str, Any]) -> None:
+        competencia = avaliacao.get("competencia")
+        nota = avaliacao.get("nota")
+        if competencia is None or not isinstance(nota, (int, float)):
+            return
+        self.notas[id_corretor][competencia] = nota
+
+        outro = "Corretor 2" if id_corretor == "Corretor 1" else "Corretor 1"
+        nota_outro = self.notas[outro].get(competencia)
+        if (
+            competencia not in self.competencias_detectadas
+            and nota_outro is not None
+            and competencia_discrepante(nota, nota_outro)
+        ):
+            self.competencias_detectadas.add(competencia)
+            print(f"Discrepância antecipada na Competência {competencia}: {nota} vs {nota_outro}")
+            self.ao_detectar(competencia)
+
+
 def calcular_nota_consolidada(c1: Dict[str, Any], c2: Dict[str, Any]) -> Dict[str, Any]:
     """Calcula a média simples entre dois corretores."""
     print("--- SEM DISCREPÂNCIA. Calculando média por competência. ---")
@@ -56,22 +123,45 @@ def calcular_nota_consolidada(c1: Dict[str, Any], c2: Dict[str, Any]) -> Dict[st
 def resolver_discrepancia_com_supervisor(
     c1: Dict[str, Any], c2: Dict[str, Any], c3: Dict[str, Any]
 ) -> Dict[str, Any]:
-    """Calcula o consenso da banca pegando a média das 2 notas mais próximas."""
+    """
+    Calcula o consenso da banca pegando a média das 2 notas mais próximas.
+    O supervisor pode ter avaliado só parte das competências (adjudicação parcial):
+    nas que ele não avaliou, vale a média dos Corretores 1 e 2.
+    """
     print(
         "--- DISCREPÂNCIA DETECTADA! Resolvendo com base nas duas notas mais próximas por competência. ---"
     )
 
+    notas_supervisor = {
+        comp.get("competencia", i + 1): comp["nota"] for i, comp in enumerate(c3["competencias"])
+    }
+    parcial = len(notas_supervisor) < 5
+    fonte = "Consenso da Banca (média das 2 notas mais próximas)"
+    if parcial:
+        fonte += f" - Supervisor nas competências {sorted(notas_supervisor)}"
+
     correcao_final = {
         "competencias": [],
         "nota_final": 0,
-        "fonte_resultado": "Consenso da Banca (média das 2 notas mais próximas)",
+        "fonte_resultado": fonte,
         "detalhes": [c1, c2, c3],
     }
 
     for i in range(5):
         s1 = c1["competencias"][i]["nota"]
         s2 = c2["competencias"][i]["nota"]
-        s3 = c3["competencias"][i]["nota"]
+        s3 = notas_supervisor.get(i + 1)
+
+        if s3 is None:
+            nota_media = arredondar_nota_enem((s1 + s2) / 2)
+            correcao_final["competencias"].append(
+                {
+                    "competencia": i + 1,
+                    "nota": nota_media,
+                    "justificativa": f"[Média C{i+1}] Sem discrepância nesta competência: ({s1}, {s2}). Nota final da competência: {nota_media}.",
+                }
+            )
+            continue
 
         diff13 = abs(s1 - s3)
         diff23 = abs(s2 - s3)
@@ -0,0 +1,186 @@
+"""
+Benchmark de vazão do pipeline de correção com o provedor falso (agents/fake.py).
+
+Corrige redações sintéticas em rodadas de concorrência crescente, sem rede e sem
+cota, e mede o custo do próprio pipeline (corretores, supervisor, retentativas,
+semáforos): redações/s, latência p50/p95/p99 por redação e chamadas ao LLM por
+redação. Serve para pegar regressões de vazão sem gastar cota.
+
+Alvos:
+    pipeline  banca completa (pipeline.corrigir_redacao), o que a task correct_essay executa
+    corretor  um único corretor (executar_correcao_completa_async)
+
+Uso (no diretório do worker):
+    python benchmark.py --redacoes 200 --concorrencia 1,8,32 --latencia 0.5
+    python benchmark.py --taxa-429 0.05 --taxa-malformada 0.02 --saida bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from agents import fake, hedging
+from agents.core import executar_correcao_completa_async
+from pipeline import corrigir_redacao
+from shared.config import settings
+
+logger = logging.getLogger("benchmark")
+
+ALVOS = ("pipeline", "corretor")
+
+_PARAGRAFO = (
+    "A persistência de desigualdades no acesso à educação no Brasil revela um desafio "
+    "estrutural que compromete o desenvolvimento social. "
+)
+
+
+def redacoes_sinteticas(quantidade: int, prefixo: str = "") -> List[Dict[str, str]]:
+    """Redações distintas (o provedor falso responde por prompt) e de tamanho realista."""
+    return [
+        {"tema": "Desafios da educação no Brasil", "texto": f"{prefixo}Redação {i}. " + _PARAGRAFO * 20}
+        for i in range(quantidade)
+    ]
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, int(p * len(ordenados)))]
+
+
+async def executar_rodada(
+    redacoes: List[Dict[str, str]], concorrencia: int, alvo: str = "pipeline"
+) -> Dict[str, Any]:
+    """Corrige todas as `redacoes` com até `concorrencia` simultâneas e devolve as métricas."""
+    limite = asyncio.Semaphore(concorrencia)
+    latencias: List[float] = []
+    erros = 0
+    antes, hedges_antes = fake.estatisticas(), hedging.estatisticas()
+
+    async def _corrigir(redacao: Dict[str, str]) -> None:
+        nonlocal erros
+        async with limite:
+            inicio = time.monotonic()
+            try:
+                if alvo == "corretor":
+                    await executar_correcao_completa_async(
+                        "Corretor 1", redacao["texto"], redacao["tema"]
+                    )
+                else:
+                    await corrigir_redacao(redacao["texto"], redacao["tema"])
+                latencias.append(time.monotonic() - inicio)
+            except Exception as e:
+                logger.error(f"Falha na correção: {e}")
+                erros += 1
+
+    inicio = time.monotonic()
+    await asyncio.gather(*(_corrigir(r) for r in redacoes))
+    decorrido = time.monotonic() - inicio
+
+    depois, hedges_depois = fake.estatisticas(), hedging.estatisticas()
+    ordenadas = sorted(latencias)
+    return {
+        "alvo": alvo,
+        "concorrencia": concorrencia,
+        "redacoes": len(redacoes),
+        "erros": erros,
+        "segundos": decorrido,
+        "redacoes_por_segundo": len(redacoes) / decorrido if decorrido else 0.0,
+        "p50": percentil(ordenadas, 0.50),
+        "p95": percentil(ordenadas, 0.95),
+        "p99": percentil(ordenadas, 0.99),
+        "chamadas_por_redacao": (depois.get("chamadas", 0) - antes.get("chamadas", 0)) / len(redacoes),
+        "erros_429": depois.get("429", 0) - antes.get("429", 0),
+        "malformadas": depois.get("malformadas", 0) - antes.get("malformadas", 0),
+        "hedges": hedges_depois.get("hedges", 0) - hedges_antes.get("hedges", 0),
+    }
+
+
+def formatar(resultados: List[Dict[str, Any]]) -> str:
+    linhas = [
+        "conc.   red/s     p50     p95     p99  LLM/red   429  malf.  erros",
+    ]
+    for r in resultados:
+        linhas.append(
+            f"{r['concorrencia']:>5} {r['redacoes_por_segundo']:>7.2f} {r['p50']:>7.2f} {r['p95']:>7.2f} "
+            f"{r['p99']:>7.2f} {r['chamadas_por_redacao']:>8.1f} {r['erros_429']:>5} "
+            f"{r['malformadas']:>6} {r['erros']:>6}"
+        )
+    return "\n".join(linhas)
+
+
+def configurar_provedor_falso(args: argparse.Namespace) -> None:
+    """Troca o provedor pelo falso e desliga o que depende de infraestrutura externa."""
+    settings.LLM_PROVIDER = "fake"
+    settings.LLM_MODEL = "falso"
+    settings.LLM_BACKUP_PROVIDER = "fake" if args.com_reserva else None
+    settings.LLM_BACKUP_MODEL = "falso-reserva" if args.com_reserva else None
+    # Cache e governador de cota mascarariam o custo do pipeline (e exigem SQLite/Redis)
+    settings.LLM_CACHE_BACKEND = "desativado"
+    settings.LLM_COTA_ATIVA = False
+    settings.LLM_FAKE_SEMENTE = args.semente
+    settings.LLM_FAKE_LATENCIA_MEDIA = args.latencia
+    settings.LLM_FAKE_LATENCIA_DISTRIBUICAO = args.distribuicao
+    settings.LLM_FAKE_TAXA_429 = args.taxa_429
+    settings.LLM_FAKE_TAXA_MALFORMADA = args.taxa_malformada
+    if args.modo:
+        settings.LLM_MODO_CORRECAO = args.modo
+    if args.concorrencia_llm:
+        settings.LLM_CONCORRENCIA_PROCESSO = args.concorrencia_llm
+
+
+async def executar_benchmark(
+    redacoes: int, niveis: List[int], alvo: str = "pipeline"
+) -> List[Dict[str, Any]]:
+    resultados = []
+    for concorrencia in niveis:
+        # Redações novas a cada rodada: nenhuma resposta repetida entre níveis
+        lote = redacoes_sinteticas(redacoes, prefixo=f"[c={concorrencia}] ")
+        logger.info(f"Rodada: {redacoes} redações, concorrência {concorrencia} ({alvo}).")
+        resultados.append(await executar_rodada(lote, concorrencia, alvo))
+    return resultados
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de vazão do pipeline com o provedor falso.")
+    parser.add_argument("-n", "--redacoes", type=int, default=50, help="Redações por rodada")
+    parser.add_argument(
+        "-c", "--concorrencia", default="1,4,16",
+        help="Níveis de concorrência (redações simultâneas), separados por vírgula",
+    )
+    parser.add_argument("--alvo", choices=ALVOS, default="pipeline")
+    parser.add_argument("--modo", default=None, help="LLM_MODO_CORRECAO (padrão: o configurado)")
+    parser.add_argument("--concorrencia-llm", type=int, default=None, help="LLM_CONCORRENCIA_PROCESSO")
+    parser.add_argument("--latencia", type=float, default=0.2, help="Latência média do LLM falso (s)")
+    parser.add_argument(
+        "--distribuicao", default="lognormal", choices=("fixa", "uniforme", "exponencial", "lognormal")
+    )
+    parser.add_argument("--taxa-429", type=float, default=0.0, help="Fração das chamadas com 429")
+    parser.add_argument("--taxa-malformada", type=float, default=0.0, help="Fração de JSON truncado")
+    parser.add_argument("--com-reserva", action="store_true", help="Provedor reserva (também falso) com hedging")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", default=None, help="Grava os resultados em JSON (comparação entre versões)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    configurar_provedor_falso(args)
+    niveis = [int(n) for n in args.concorrencia.split(",") if n.strip()]
+
+    # Os prints de andamento do pipeline poluiriam a tabela
+    with open(os.devnull, "w") as nulo, contextlib.redirect_stdout(nulo):
+        resultados = asyncio.run(executar_benchmark(args.redacoes, niveis, args.alvo))
+    print(formatar(resultados))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultados, arquivo, ensure_ascii=False, indent=2)
+    return 1 if any(r["erros"] for r in resultados) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
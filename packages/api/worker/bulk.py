@@ -0,0 +1,209 @@
+"""
+Correção em lote, fora da API: simulados, recorreções após mudança de rubrica etc.
+
+Lê redações de um JSONL ou CSV (campos: id, tema, texto), corrige com o mesmo
+fluxo da task (pipeline.corrigir_redacao) e grava um resultado por linha no JSONL
+de saída, assim que cada redação termina. A saída é o próprio checkpoint: ao
+rodar de novo com o mesmo arquivo, as redações já CONCLUIDAS são puladas e as
+com ERRO são refeitas (vale a última linha de cada id).
+
+Uso (no diretório do worker):
+    python bulk.py redacoes.jsonl -o resultados.jsonl --concorrencia 20
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from agents import cache
+from agents.core import aquecer_clientes
+from pipeline import corrigir_redacao
+from shared.config import settings
+
+logger = logging.getLogger("bulk")
+
+ETAPAS = ("corretor_1", "corretor_2", "supervisor", "total")
+
+
+def ler_redacoes(caminho: str) -> Iterator[Dict[str, Any]]:
+    """Gera as redações do arquivo sem carregá-lo inteiro. O id padrão é o número da linha."""
+    with open(caminho, encoding="utf-8", newline="") as arquivo:
+        if caminho.lower().endswith(".csv"):
+            linhas = enumerate(csv.DictReader(arquivo), start=1)
+        else:
+            linhas = ((n, json.loads(l)) for n, l in enumerate(arquivo, start=1) if l.strip())
+        for numero, registro in linhas:
+            texto = registro.get("texto") or registro.get("texto_redacao")
+            if not texto or not registro.get("tema"):
+                logger.warning(f"Linha {numero} ignorada: faltam 'tema' ou 'texto'.")
+                continue
+            yield {"id": str(registro.get("id") or numero), "tema": registro["tema"], "texto": texto}
+
+
+def descartar_linha_truncada(caminho: str) -> None:
+    """
+    Corta a saída de volta até a última quebra de linha. Uma queda no meio da
+    escrita deixa a última linha pela metade; sem o corte, o próximo resultado
+    seria anexado a ela e os dois se perderiam.
+    """
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, "rb+") as arquivo:
+        fim = arquivo.seek(0, os.SEEK_END)
+        posicao = fim
+        while posicao > 0:
+            inicio = max(0, posicao - 64 * 1024)
+            arquivo.seek(inicio)
+            bloco = arquivo.read(posicao - inicio)
+            if posicao == fim and bloco.endswith(b"\n"):
+                return
+            quebra = bloco.rfind(b"\n")
+            if quebra >= 0:
+                posicao = inicio + quebra + 1
+                break
+            posicao = inicio
+        logger.warning(f"Última linha de {caminho} truncada ({fim - posicao} bytes). Descartada.")
+        arquivo.truncate(posicao)
+
+
+def ler_concluidas(caminho: str) -> Set[str]:
+    """Ids já concluídos no JSONL de saída (checkpoint de uma execução anterior)."""
+    status: Dict[str, str] = {}
+    if not os.path.exists(caminho):
+        return set()
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            try:
+                resultado = json.loads(linha)
+            except json.JSONDecodeError:
+                # Última linha truncada por uma queda no meio da escrita
+                continue
+            status[str(resultado["id"])] = resultado.get("status")
+    return {id_ for id_, s in status.items() if s == "CONCLUIDO"}
+
+
+class Relatorio:
+    def __init__(self):
+        self.inicio = time.monotonic()
+        self.concluidas = 0
+        self.erros = 0
+        self.puladas = 0
+        self.tempos: Dict[str, List[float]] = {etapa: [] for etapa in ETAPAS}
+
+    def registrar(self, tempos: Dict[str, float], sucesso: bool) -> None:
+        if sucesso:
+            self.concluidas += 1
+        else:
+            self.erros += 1
+        for etapa, duracao in tempos.items():
+            self.tempos.setdefault(etapa, []).append(duracao)
+
+    def texto(self) -> str:
+        decorrido = time.monotonic() - self.inicio
+        processadas = self.concluidas + self.erros
+        linhas = [
+            f"Redações: {self.concluidas} concluídas, {self.erros} com erro, {self.puladas} puladas (checkpoint).",
+            f"Tempo total: {decorrido:.1f}s | Vazão: {processadas / decorrido * 60 if decorrido else 0:.1f} redações/min",
+            "Latência por etapa (s):     n      p50      p95      máx",
+        ]
+        for etapa, valores in self.tempos.items():
+            if not valores:
+                continue
+            ordenados = sorted(valores)
+            p95 = ordenados[min(len(ordenados) - 1, int(0.95 * len(ordenados)))]
+            linhas.append(
+                f"  {etapa:<22}{len(valores):>5} {statistics.median(ordenados):>8.2f} {p95:>8.2f} {ordenados[-1]:>8.2f}"
+            )
+        linhas.append(f"Cache de LLM: {cache.estatisticas()}")
+        return "\n".join(linhas)
+
+
+async def executar_lote(
+    entrada: str,
+    saida: str,
+    concorrencia: int = 10,
+    limite: Optional[int] = None,
+) -> Relatorio:
+    """Corrige as redações de `entrada` com até `concorrencia` simultâneas, anexando a `saida`."""
+    relatorio = Relatorio()
+    descartar_linha_truncada(saida)
+    concluidas = ler_concluidas(saida)
+    fila: asyncio.Queue = asyncio.Queue(maxsize=concorrencia * 2)
+
+    with open(saida, "a", encoding="utf-8") as arquivo_saida:
+
+        def _gravar(resultado: Dict[str, Any]) -> None:
+            # Uma linha inteira por vez: no máximo a última fica truncada numa queda
+            arquivo_saida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+            arquivo_saida.flush()
+
+        async def _corretor():
+            while True:
+                redacao = await fila.get()
+                if redacao is None:
+                    return
+                tempos: Dict[str, float] = {}
+                try:
+                    resultado = await corrigir_redacao(redacao["texto"], redacao["tema"], tempos=tempos)
+                    _gravar({"id": redacao["id"], "status": "CONCLUIDO", "resultado": resultado, "tempos": tempos})
+                    relatorio.registrar(tempos, sucesso=True)
+                except Exception as e:
+                    logger.error(f"Redação {redacao['id']}: {e}")
+                    _gravar({"id": redacao["id"], "status": "ERRO", "erro": str(e), "tempos": tempos})
+                    relatorio.registrar(tempos, sucesso=False)
+                processadas = relatorio.concluidas + relatorio.erros
+                if processadas % 50 == 0:
+                    logger.info(f"{processadas} redações processadas...")
+
+        corretores = [asyncio.create_task(_corretor()) for _ in range(concorrencia)]
+        enfileiradas = 0
+        for redacao in ler_redacoes(entrada):
+            if redacao["id"] in concluidas:
+                relatorio.puladas += 1
+                continue
+            if limite is not None and enfileiradas >= limite:
+                break
+            await fila.put(redacao)
+            enfileiradas += 1
+        for _ in corretores:
+            await fila.put(None)
+        await asyncio.gather(*corretores)
+        os.fsync(arquivo_saida.fileno())
+
+    return relatorio
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Correção de redações em lote (JSONL/CSV).")
+    parser.add_argument("entrada", help="Arquivo .jsonl ou .csv com id, tema e texto")
+    parser.add_argument("-o", "--saida", required=True, help="JSONL de resultados (também é o checkpoint)")
+    parser.add_argument("-c", "--concorrencia", type=int, default=10, help="Redações corrigidas ao mesmo tempo")
+    parser.add_argument(
+        "--concorrencia-llm", type=int, default=None,
+        help="Chamadas simultâneas ao LLM (padrão: LLM_CONCORRENCIA_PROCESSO)",
+    )
+    parser.add_argument("--limite", type=int, default=None, help="Corrige no máximo N redações nesta execução")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if args.concorrencia_llm:
+        settings.LLM_CONCORRENCIA_PROCESSO = args.concorrencia_llm
+    try:
+        aquecer_clientes()
+    except Exception as e:
+        logger.warning(f"Falha ao aquecer clientes LLM: {e}")
+
+    relatorio = asyncio.run(executar_lote(args.entrada, args.saida, args.concorrencia, args.limite))
+    print(relatorio.texto())
+    return 1 if relatorio.erros else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
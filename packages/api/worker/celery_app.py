@@ -1,4 +1,7 @@
+import logging
+
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_shutdown
 from shared.config import settings
 
 celery_app = Celery(
@@ -8,7 +11,49 @@ celery_app = Celery(
     include=['tasks'] 
 )
 
+# O ritmo de chamadas ao LLM é controlado pelo governador de cota (agents/cota.py),
+# não por um rate limit fixo de tasks.
 celery_app.conf.update(
-    task_routes={"correct_essay": {"queue": "correcoes"}}, 
-    task_rate_limit="1/m"
-)
\ No newline at end of file
+    task_routes={"correct_essay": {"queue": "correcoes"}, "transcribe_essay": {"queue": "ocr"}},
+)
+
+if settings.WORKER_MODO_EXECUCAO.lower() == "assincrono":
+    # Cada thread do pool só espera a corrotina no loop do processo; reservar
+    # mensagens além das vagas apenas seguraria redações que outro worker poderia pegar
+    celery_app.conf.update(
+        worker_pool="threads",
+        worker_concurrency=settings.WORKER_CORRECOES_SIMULTANEAS,
+        worker_prefetch_multiplier=1,
+    )
+
+
+def _aquecer():
+    from loop_processo import obter_loop
+    from agents.core import aquecer_clientes
+
+    obter_loop()
+    try:
+        aquecer_clientes()
+    except Exception as e:
+        # Sem aquecimento os clientes são criados sob demanda na primeira correção
+        logging.getLogger(__name__).warning(f"Falha ao aquecer clientes LLM: {e}")
+
+
+@worker_process_init.connect
+def aquecer_processo(**kwargs):
+    """Prefork: prepara o loop e o registro de clientes LLM de cada filho antes da primeira task."""
+    _aquecer()
+
+
+@worker_init.connect
+def aquecer_worker(**kwargs):
+    """Modo assíncrono: o pool de threads vive no processo principal, que sobe o loop aqui."""
+    if settings.WORKER_MODO_EXECUCAO.lower() == "assincrono":
+        _aquecer()
+
+
+@worker_shutdown.connect
+def encerrar_loop(**kwargs):
+    from loop_processo import encerrar
+
+    encerrar()
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Coroutine, Optional
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Event loop único por processo do worker. Antes cada task fazia asyncio.run(),
+# criando e destruindo um loop (e os clientes HTTP presos a ele) por redação.
+# Com o loop persistente, clientes e pools do registro de LLMs sobrevivem entre tasks.
+#
+# Modos (WORKER_MODO_EXECUCAO):
+#   - "prefork": cada processo filho do Celery corrige uma redação por vez,
+#     rodando a corrotina no próprio thread (run_until_complete).
+#   - "assincrono": o loop roda num thread dedicado e as tasks chegam de um pool
+#     de threads do Celery (--pool threads). Cada thread só entrega a corrotina e
+#     espera o resultado; até WORKER_CORRECOES_SIMULTANEAS redações correm juntas
+#     no mesmo loop, dividindo clientes, pools de conexão e o semáforo do LLM.
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thread: Optional[threading.Thread] = None
+_lock = threading.Lock()
+# Criado dentro do loop em segundo plano (só ele o usa)
+_limite_correcoes: Optional[asyncio.Semaphore] = None
+
+
+def modo_assincrono() -> bool:
+    return settings.WORKER_MODO_EXECUCAO.lower() == "assincrono"
+
+
+def obter_loop() -> asyncio.AbstractEventLoop:
+    if modo_assincrono():
+        return iniciar_loop_em_segundo_plano()
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def iniciar_loop_em_segundo_plano() -> asyncio.AbstractEventLoop:
+    """Sobe (uma vez) o thread com o event loop que atende todas as tasks do processo."""
+    global _loop, _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return _loop
+        loop = asyncio.new_event_loop()
+        pronto = threading.Event()
+
+        def _rodar():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(pronto.set)
+            loop.run_forever()
+
+        _thread = threading.Thread(target=_rodar, name="loop-correcoes", daemon=True)
+        _thread.start()
+        pronto.wait()
+        _loop = loop
+        logger.info(
+            f"Event loop do worker em segundo plano: até {settings.WORKER_CORRECOES_SIMULTANEAS} "
+            "correções simultâneas."
+        )
+        return loop
+
+
+async def _limitada(coro: Coroutine[Any, Any, Any]) -> Any:
+    global _limite_correcoes
+    if _limite_correcoes is None:
+        _limite_correcoes = asyncio.Semaphore(max(1, settings.WORKER_CORRECOES_SIMULTANEAS))
+    async with _limite_correcoes:
+        return await coro
+
+
+def executar(coro: Coroutine[Any, Any, Any]) -> Any:
+    """Executa a corrotina até o fim no loop do processo."""
+    if modo_assincrono():
+        loop = iniciar_loop_em_segundo_plano()
+        return asyncio.run_coroutine_threadsafe(_limitada(coro), loop).result()
+    return obter_loop().run_until_complete(coro)
+
+
+def encerrar(timeout: float = 30.0) -> None:
+    """Para o loop em segundo plano (desligamento do worker)."""
+    global _loop, _thread, _limite_correcoes
+    with _lock:
+        if _thread is None:
+            return
+        _loop.call_soon_threadsafe(_loop.stop)
+        _thread.join(timeout)
+        if not _thread.is_alive():
+            _loop.close()
+        _loop, _thread, _limite_correcoes = None, None, None
@@ -0,0 +1,193 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from agents import resiliencia
+from agents.core import executar_correcao_completa_async
+from banca.rules import (
+    DetectorDiscrepancia,
+    competencias_discrepantes,
+    mesclar_correcoes_parciais,
+    verificar_discrepancia,
+    calcular_nota_consolidada,
+    resolver_discrepancia_com_supervisor,
+)
+from shared.config import settings
+
+# Fluxo completo da banca para uma redação: Corretores 1 e 2 em paralelo,
+# verificação de discrepância e Supervisor quando necessário.
+# Usado pela task do Celery (tasks.py) e pela correção em lote (bulk.py).
+
+# Recebe (id_corretor, trecho) do comentário geral em streaming
+AoReceberTrecho = Callable[[str, str], Awaitable[None]]
+# Recebem (id_corretor, avaliação da competência) e (id_corretor, correção completa)
+AoConcluirCompetencia = Callable[[str, Dict[str, Any]], None]
+AoConcluirCorretor = Callable[[str, Dict[str, Any]], None]
+
+
+async def corrigir_redacao(
+    texto_redacao: str,
+    tema: str,
+    c1: Optional[Dict[str, Any]] = None,
+    c2: Optional[Dict[str, Any]] = None,
+    c3: Optional[Dict[str, Any]] = None,
+    ao_receber_trecho_feedback: Optional[AoReceberTrecho] = None,
+    tempos: Optional[Dict[str, float]] = None,
+    avaliacoes_prontas: Optional[Dict[str, Dict[int, Dict[str, Any]]]] = None,
+    ao_concluir_competencia: Optional[AoConcluirCompetencia] = None,
+    ao_concluir_corretor: Optional[AoConcluirCorretor] = None,
+) -> Dict[str, Any]:
+    """
+    Corrige a redação e devolve o resultado consolidado.
+    `c1`, `c2` e `c3` são correções já existentes (retry), que não são refeitas.
+    `avaliacoes_prontas` (id_corretor -> número -> avaliação) são competências avaliadas
+    numa tentativa anterior por um corretor que não terminou.
+    `ao_concluir_competencia` e `ao_concluir_corretor` permitem salvar o progresso (checkpoint).
+    `tempos`, se informado, recebe a duração em segundos de cada etapa.
+    Tudo roda dentro do prazo CORRECAO_PRAZO_SEGUNDOS.
+    """
+    avaliacoes_prontas = avaliacoes_prontas or {}
+    inicio = time.monotonic()
+
+    async def _cronometrar(etapa: str, coro: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        inicio_etapa = time.monotonic()
+        try:
+            return await coro
+        finally:
+            if tempos is not None:
+                tempos[etapa] = time.monotonic() - inicio_etapa
+
+    def _publicar_feedback(id_corretor: str):
+        if ao_receber_trecho_feedback is None:
+            return None
+
+        async def _publicar(trecho: str):
+            await ao_receber_trecho_feedback(id_corretor, trecho)
+        return _publicar
+
+    # --- Supervisor ---
+    # Com SUPERVISOR_PARCIAL, o supervisor reavalia só as competências discrepantes
+    # (todas apenas quando o total diverge). Com SUPERVISOR_ESPECULATIVO, ele começa
+    # assim que alguma competência já diverge, sem esperar os dois corretores terminarem.
+    supervisor_tasks = []
+    competencias_cobertas = set()
+
+    def _iniciar_supervisor(competencias=None):
+        if c3:
+            return
+        if settings.SUPERVISOR_PARCIAL and competencias is not None:
+            novas = [n for n in competencias if n not in competencias_cobertas]
+            if not novas:
+                return
+            competencias_cobertas.update(novas)
+            print(f"Iniciando Supervisor para as competências {novas}.")
+            supervisor_tasks.append(asyncio.create_task(
+                executar_correcao_completa_async(
+                    "Corretor Supervisor", texto_redacao, tema,
+                    ao_concluir_competencia=_ao_concluir("Corretor Supervisor"),
+                    competencias=novas, gerar_feedback=False,
+                    avaliacoes_prontas=avaliacoes_prontas.get("Corretor Supervisor"),
+                )
+            ))
+        elif not supervisor_tasks:
+            print("Iniciando Supervisor para todas as competências.")
+            supervisor_tasks.append(asyncio.create_task(
+                executar_correcao_completa_async(
+                    "Corretor Supervisor", texto_redacao, tema,
+                    ao_concluir_competencia=_ao_concluir("Corretor Supervisor"),
+                    ao_receber_trecho_feedback=_publicar_feedback("Corretor Supervisor"),
+                    avaliacoes_prontas=avaliacoes_prontas.get("Corretor Supervisor"),
+                )
+            ))
+
+    detector = None
+    if settings.SUPERVISOR_ESPECULATIVO and not (c1 and c2):
+        detector = DetectorDiscrepancia(
+            ao_detectar=lambda competencia: _iniciar_supervisor([competencia])
+        )
+
+    def _ao_concluir(id_corretor: str):
+        def _registrar(avaliacao: Dict[str, Any]) -> None:
+            if detector is not None and id_corretor != "Corretor Supervisor":
+                detector.registrar(id_corretor, avaliacao)
+            # Avaliações com erro sistêmico não contam como feitas numa retomada
+            if ao_concluir_competencia is not None and not avaliacao.get("erro"):
+                ao_concluir_competencia(id_corretor, avaliacao)
+        return _registrar
+
+    def _concluir_corretor(id_corretor: str, correcao: Dict[str, Any]) -> Dict[str, Any]:
+        if ao_concluir_corretor is not None:
+            ao_concluir_corretor(id_corretor, correcao)
+        return correcao
+
+    # --- Corretores 1 e 2 (Paralelo) ---
+    async def _run_c1():
+        if c1:
+             print("Pulando Corretor 1 (já existe).")
+             return c1
+        print("Executando Corretor 1...")
+        correcao = await _cronometrar("corretor_1", executar_correcao_completa_async(
+            "Corretor 1", texto_redacao, tema,
+            ao_concluir_competencia=_ao_concluir("Corretor 1"),
+            ao_receber_trecho_feedback=_publicar_feedback("Corretor 1"),
+            avaliacoes_prontas=avaliacoes_prontas.get("Corretor 1"),
+        ))
+        return _concluir_corretor("Corretor 1", correcao)
+
+    async def _run_c2():
+        if c2:
+             print("Pulando Corretor 2 (já existe).")
+             return c2
+        print("Executando Corretor 2...")
+        correcao = await _cronometrar("corretor_2", executar_correcao_completa_async(
+            "Corretor 2", texto_redacao, tema,
+            ao_concluir_competencia=_ao_concluir("Corretor 2"),
+            ao_receber_trecho_feedback=_publicar_feedback("Corretor 2"),
+            avaliacoes_prontas=avaliacoes_prontas.get("Corretor 2"),
+        ))
+        return _concluir_corretor("Corretor 2", correcao)
+
+    # Prazo da correção: ao estourar, corretores e supervisor pendentes são cancelados
+    try:
+        async with resiliencia.prazo(settings.CORRECAO_PRAZO_SEGUNDOS):
+            try:
+                if detector is not None:
+                    # Correção retomada: as notas já existentes também entram na comparação
+                    for id_existente, existente in (("Corretor 1", c1), ("Corretor 2", c2)):
+                        avaliacoes = (existente or {}).get("competencias") or (
+                            avaliacoes_prontas.get(id_existente, {}).values()
+                        )
+                        for avaliacao in avaliacoes:
+                            detector.registrar(id_existente, avaliacao)
+
+                c1, c2 = await asyncio.gather(_run_c1(), _run_c2())
+
+                # --- Verificação ---
+                if not verificar_discrepancia(c1, c2):
+                    if supervisor_tasks:
+                        print("Notas finais consistentes. Cancelando Supervisor especulativo.")
+                    return calcular_nota_consolidada(c1, c2)
+
+                if c3:
+                    print("Pulando Supervisor (já existe).")
+                else:
+                    if supervisor_tasks:
+                        print("Discrepância confirmada. Supervisor já em andamento...")
+                    else:
+                        print("Discrepância detectada. Executando Supervisor...")
+                    # No modo parcial, inicia o que ainda faltar das competências discrepantes
+                    _iniciar_supervisor(competencias_discrepantes(c1, c2))
+                    parciais = await _cronometrar("supervisor", asyncio.gather(*supervisor_tasks))
+                    c3 = parciais[0] if len(parciais) == 1 else mesclar_correcoes_parciais(parciais)
+                    _concluir_corretor("Corretor Supervisor", c3)
+                    print("Corretor Supervisor finalizado (async).")
+
+                return resolver_discrepancia_com_supervisor(c1, c2, c3)
+            finally:
+                for task in supervisor_tasks:
+                    if not task.done():
+                        task.cancel()
+                await asyncio.gather(*supervisor_tasks, return_exceptions=True)
+    finally:
+        if tempos is not None:
+            tempos["total"] = time.monotonic() - inicio
@@ -1,19 +1,44 @@
+import copy
 import json
 import asyncio
+import logging
 import re
 import math
 import time
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm import Session
 from google.api_core.exceptions import ResourceExhausted
 
 from celery_app import celery_app
-from shared.models import SessionLocal, Redacao
-from agents.core import executar_correcao_completa_async
-from banca.rules import (
-    verificar_discrepancia,
-    calcular_nota_consolidada,
-    resolver_discrepancia_com_supervisor,
-)
+from loop_processo import executar
+from shared.models import SessionLocal, Redacao, Transcricao
+from shared.armazenamento import obter_armazenamento, remover_sem_uso
+from agents import cache, hedging, resiliencia
+from agents.ocr import extrair_texto_da_imagem_async
+from pipeline import corrigir_redacao
+from shared.config import settings
+from shared import eventos
+
+logger = logging.getLogger(__name__)
+
+
+async def _aguardar(tarefa):
+    if tarefa is not None:
+        try:
+            await tarefa
+        except Exception:
+            pass
+
+
+def _marcar(db: Session, registro, status, mensagem: str = None) -> None:
+    """Grava o status de uma redação que falhou (melhor esforço: o erro original é o que importa)."""
+    registro.status = status
+    if mensagem is not None:
+        registro.message = mensagem
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
 
 
 @celery_app.task(name="correct_essay", bind=True)
@@ -26,13 +51,18 @@ def correct_essay(
 ):
     """
     Ponto de entrada orquestrado para a tarefa de correção em background.
-    Usa um único Event Loop para evitar erros de 'Loop Closed' com clientes HTTP.
+    Roda no Event Loop persistente do processo, para os clientes HTTP do registro
+    de LLMs continuarem válidos entre uma task e outra (sem erros de 'Loop Closed').
+    No modo assíncrono, várias redações dividem esse loop ao mesmo tempo.
+    Em caso de falha, a task volta para a fila (até CORRECAO_MAX_RETENTATIVAS) e
+    retoma do checkpoint em progresso_json, sem refazer o que já foi avaliado.
     """
     
     # Função interna assíncrona que contém toda a lógica
     async def _fluxo_correcao_async():
         db: Session = SessionLocal()
         redacao = None
+        salvamento = None
         try:
             from shared.schemas import RedacaoStatusEnum
             
@@ -46,69 +76,198 @@ def correct_essay(
             c2 = json.loads(correcao_2_json) if correcao_2_json else None
             c3 = json.loads(correcao_supervisor_json) if correcao_supervisor_json else None
 
-            redacao = db.query(Redacao).filter(Redacao.id == redacao_id).first()
+            # Toda chamada à sessão vai para uma thread: no modo assíncrono o loop é
+            # dividido pelas outras redações, e uma ida lenta ao banco travaria todas
+            def _iniciar():
+                redacao = db.query(Redacao).filter(Redacao.id == redacao_id).first()
+                if not redacao:
+                    return None, None
+                # Lidos antes do commit, que expira os atributos (texto_redacao é deferred)
+                dados = (redacao.texto_redacao, redacao.tema, copy.deepcopy(redacao.progresso_json or {}))
+                redacao.status = RedacaoStatusEnum.PROCESSANDO
+                db.commit()
+                return redacao, dados
+
+            redacao, dados = await asyncio.to_thread(_iniciar)
             if not redacao:
                 print(f"Erro: Redação com ID {redacao_id} não encontrada.")
                 return
+            texto_redacao, tema, progresso = dados
+
+            contadores_cache = cache.iniciar_contagem()
+
+            # Checkpoint de tentativas anteriores: corretores concluídos e competências avulsas
+            corretores_prontos = progresso.get("corretores", {})
+            c1 = c1 or corretores_prontos.get("Corretor 1")
+            c2 = c2 or corretores_prontos.get("Corretor 2")
+            c3 = c3 or corretores_prontos.get("Corretor Supervisor")
+            avaliacoes_prontas = {
+                id_corretor: {int(numero): avaliacao for numero, avaliacao in avaliacoes.items()}
+                for id_corretor, avaliacoes in progresso.get("competencias", {}).items()
+            }
+            if progresso:
+                print(f"Retomando redação ID: {redacao_id} do checkpoint (tentativa {self.request.retries + 1}).")
 
             print(f"Iniciando correção da redação ID: {redacao_id}")
-            redacao.status = RedacaoStatusEnum.PROCESSANDO
-            db.commit()
-
-            # --- Corretores 1 e 2 (Paralelo) ---
-            async def _run_c1():
-                if c1:
-                     print("Pulando Corretor 1 (já existe).")
-                     return c1
-                print("Executando Corretor 1...")
-                return await executar_correcao_completa_async("Corretor 1", redacao.texto_redacao, redacao.tema)
-
-            async def _run_c2():
-                if c2:
-                     print("Pulando Corretor 2 (já existe).")
-                     return c2
-                print("Executando Corretor 2...")
-                return await executar_correcao_completa_async("Corretor 2", redacao.texto_redacao, redacao.tema)
-
-            c1, c2 = await asyncio.gather(_run_c1(), _run_c2())
-
-            # --- Verificação ---
-            if not verificar_discrepancia(c1, c2):
-                resultado_final = calcular_nota_consolidada(c1, c2)
-            else:
-                # --- Supervisor ---
-                if not c3:
-                    print("Discrepância detectada. Executando Supervisor...")
-                    c3 = await executar_correcao_completa_async(
-                        "Corretor Supervisor", redacao.texto_redacao, redacao.tema
-                    )
-                    print("Corretor Supervisor finalizado (async).")
-                else:
-                    print("Pulando Supervisor (já existe).")
-
-                resultado_final = resolver_discrepancia_com_supervisor(c1, c2, c3)
-
-            # Salva
-            redacao.resultado_json = resultado_final
-            redacao.status = RedacaoStatusEnum.CONCLUIDO
-            db.commit()
+            await eventos.publicar_async(
+                redacao_id, {"tipo": eventos.EVENTO_STATUS, "status": RedacaoStatusEnum.PROCESSANDO.value}
+            )
+
+            # Um salvamento de checkpoint por vez: o que chegar durante a gravação sai junto na próxima.
+            pendente = False
+
+            def _gravar_no_banco(copia: dict):
+                redacao.progresso_json = copia
+                try:
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    logger.warning(f"Falha ao salvar progresso da redação {redacao_id}: {e}")
+
+            async def _gravar_pendentes():
+                nonlocal pendente
+                while pendente:
+                    pendente = False
+                    # Objeto novo a cada vez: o SQLAlchemy não detecta mutações dentro do JSON
+                    await asyncio.to_thread(_gravar_no_banco, copy.deepcopy(progresso))
+
+            def _salvar_progresso():
+                nonlocal pendente, salvamento
+                pendente = True
+                if salvamento is None or salvamento.done():
+                    salvamento = asyncio.get_running_loop().create_task(_gravar_pendentes())
+
+            def _ao_concluir_competencia(id_corretor: str, avaliacao: dict):
+                competencias = progresso.setdefault("competencias", {}).setdefault(id_corretor, {})
+                competencias[str(avaliacao["competencia"])] = avaliacao
+                _salvar_progresso()
+
+            def _ao_concluir_corretor(id_corretor: str, correcao: dict):
+                progresso.setdefault("corretores", {})[id_corretor] = correcao
+                progresso.get("competencias", {}).pop(id_corretor, None)
+                _salvar_progresso()
+
+            async def _publicar_feedback(id_corretor: str, trecho: str):
+                await eventos.publicar_async(
+                    redacao_id,
+                    {"tipo": eventos.EVENTO_FEEDBACK, "corretor": id_corretor, "trecho": trecho},
+                )
+
+            resultado_final = await corrigir_redacao(
+                texto_redacao, tema, c1, c2, c3,
+                ao_receber_trecho_feedback=_publicar_feedback,
+                avaliacoes_prontas=avaliacoes_prontas,
+                ao_concluir_competencia=_ao_concluir_competencia,
+                ao_concluir_corretor=_ao_concluir_corretor,
+            )
+            await _aguardar(salvamento)
+
+            def _concluir():
+                redacao.definir_resultado(resultado_final)
+                redacao.progresso_json = None
+                redacao.status = RedacaoStatusEnum.CONCLUIDO
+                db.commit()
+
+            await asyncio.to_thread(_concluir)
+            await eventos.publicar_async(
+                redacao_id, {"tipo": eventos.EVENTO_FIM, "status": RedacaoStatusEnum.CONCLUIDO.value}
+            )
             print(f"Correção da redação ID: {redacao_id} finalizada com sucesso.")
+            print(
+                f"Cache de LLM: {contadores_cache['acertos']} chamadas evitadas, "
+                f"{contadores_cache['faltas']} faltas (total do processo: {cache.estatisticas()})."
+            )
+            if settings.LLM_BACKUP_PROVIDER:
+                print(f"Hedging/failover (total do processo): {hedging.estatisticas()}")
 
         except Exception as e:
-            db.rollback()
+            # A sessão não pode ser usada enquanto o checkpoint grava na thread
+            await _aguardar(salvamento)
+            await asyncio.to_thread(db.rollback)
             print(f"Erro fatal na Task: {e}")
+            reenfileirar = resiliencia.vale_nova_tentativa(e) or isinstance(e, OperationalError)
+            if redacao and reenfileirar and self.request.retries < settings.CORRECAO_MAX_RETENTATIVAS:
+                # Volta para a fila; o que já foi avaliado está salvo em progresso_json
+                await asyncio.to_thread(_marcar, db, redacao, RedacaoStatusEnum.PENDENTE)
+                await eventos.publicar_async(
+                    redacao_id, {"tipo": eventos.EVENTO_STATUS, "status": RedacaoStatusEnum.PENDENTE.value}
+                )
+                return True
             if redacao:
-                redacao.status = RedacaoStatusEnum.ERRO
-                redacao.message = str(e)
-                try:
-                    db.commit()
-                except:
-                    pass
+                await asyncio.to_thread(_marcar, db, redacao, RedacaoStatusEnum.ERRO, str(e))
+                await eventos.publicar_async(
+                    redacao_id, {"tipo": eventos.EVENTO_FIM, "status": RedacaoStatusEnum.ERRO.value}
+                )
         finally:
-            db.close()
+            await asyncio.to_thread(db.close)
 
-    # Executa tudo em UM único loop
-    # Isso garante que o httpx tenha tempo de abrir e fechar conexões dentro do mesmo loop
-    asyncio.run(_fluxo_correcao_async())
+    # Executa tudo no loop do processo, o mesmo de todas as tasks anteriores
+    if executar(_fluxo_correcao_async()):
+        atraso = settings.CORRECAO_RETENTATIVA_ATRASO * 2 ** self.request.retries
+        print(f"Nova tentativa da redação ID: {redacao_id} em {atraso:.0f}s.")
+        raise self.retry(countdown=atraso, max_retries=settings.CORRECAO_MAX_RETENTATIVAS)
+
+
+@celery_app.task(name="transcribe_essay")
+def transcribe_essay(transcricao_id: int):
+    """
+    Transcreve (OCR) a foto de uma redação enviada por POST /redacoes/transcricoes.
+    Roda na fila "ocr", num worker próprio, para as fotos não disputarem vaga com
+    as correções; o resultado fica na tabela transcricoes e o fim é publicado no
+    canal da transcrição. A foto sai do armazenamento quando a transcrição termina.
+    """
+    async def _fluxo_transcricao_async():
+        from shared.schemas import RedacaoStatusEnum
 
+        db: Session = SessionLocal()
+        canal = eventos.canal_transcricao(transcricao_id)
+        try:
+            # Sessão só em threads: o loop do worker de OCR é dividido pelas transcrições em curso
+            def _iniciar():
+                transcricao = db.query(Transcricao).filter(Transcricao.id == transcricao_id).first()
+                if not transcricao:
+                    return None, None
+                dados = (transcricao.imagem_chave, transcricao.imagem_tipo)
+                transcricao.status = RedacaoStatusEnum.PROCESSANDO
+                db.commit()
+                return transcricao, dados
+
+            transcricao, dados = await asyncio.to_thread(_iniciar)
+            if not transcricao:
+                print(f"Erro: Transcrição com ID {transcricao_id} não encontrada.")
+                return
+            chave, tipo = dados
+            texto, status_final, erro = None, RedacaoStatusEnum.CONCLUIDO, None
+            await eventos.publicar_async(
+                transcricao_id, {"tipo": eventos.EVENTO_STATUS, "status": RedacaoStatusEnum.PROCESSANDO.value}, canal
+            )
+
+            try:
+                imagem = await asyncio.to_thread(obter_armazenamento().ler, chave)
+                texto = await extrair_texto_da_imagem_async(imagem, tipo or "image/jpeg")
+            except ValueError as ve:
+                status_final, erro = RedacaoStatusEnum.ERRO, str(ve)
+            except ResourceExhausted:
+                status_final = RedacaoStatusEnum.ERRO
+                erro = "Serviço de transcrição sobrecarregado. Tente novamente em instantes."
+            except Exception as e:
+                print(f"Erro na transcrição ID {transcricao_id}: {e}")
+                status_final, erro = RedacaoStatusEnum.ERRO, f"Erro ao processar imagem: {e}"
+
+            def _finalizar():
+                transcricao.texto = texto
+                transcricao.status = status_final
+                transcricao.erro = erro
+                transcricao.imagem_chave = None
+                db.commit()
+                # Endereçada pelo conteúdo: só remove se nenhuma outra transcrição ou foto de perfil a usa
+                remover_sem_uso(db, chave)
+
+            await asyncio.to_thread(_finalizar)
+            await eventos.publicar_async(
+                transcricao_id, {"tipo": eventos.EVENTO_FIM, "status": status_final.value}, canal
+            )
+        finally:
+            await asyncio.to_thread(db.close)
 
+    executar(_fluxo_transcricao_async())
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Módulos de topo do worker (pipeline, bulk, tasks) importam "agents" e "banca"
+# como no container, onde /app é o diretório do worker. No fim do sys.path para
+# não esconder o pacote "shared" da raiz.
+sys.path.append(str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+import bulk
+import pipeline
+
+NOTAS = {
+    "Corretor 1": [160, 160, 160, 160, 160],
+    "Corretor 2": [160, 160, 160, 160, 120],
+}
+
+
+@pytest.fixture
+def corretores_falsos(monkeypatch):
+    chamadas = []
+
+    async def _corrigir(id_corretor, texto_redacao, tema, **kwargs):
+        chamadas.append((id_corretor, texto_redacao))
+        if texto_redacao == "falha":
+            raise RuntimeError("provedor fora do ar")
+        await asyncio.sleep(0.01)
+        competencias = [
+            {"competencia": i + 1, "nota": nota, "justificativa": "ok"}
+            for i, nota in enumerate(NOTAS[id_corretor])
+        ]
+        return {
+            "competencias": competencias,
+            "nota_final": sum(NOTAS[id_corretor]),
+            "comentarios_gerais": "",
+            "id_corretor": id_corretor,
+        }
+
+    monkeypatch.setattr(pipeline, "executar_correcao_completa_async", _corrigir)
+    return chamadas
+
+
+def _escrever_jsonl(caminho, registros):
+    caminho.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in registros), encoding="utf-8")
+
+
+def _ler_jsonl(caminho):
+    return [json.loads(l) for l in caminho.read_text(encoding="utf-8").splitlines()]
+
+
+def test_lote_corrige_e_grava_um_resultado_por_linha(tmp_path, corretores_falsos):
+    entrada, saida = tmp_path / "redacoes.jsonl", tmp_path / "resultados.jsonl"
+    _escrever_jsonl(entrada, [{"id": f"r{i}", "tema": "Tema", "texto": f"texto {i}"} for i in range(5)])
+
+    relatorio = asyncio.run(bulk.executar_lote(str(entrada), str(saida), concorrencia=3))
+
+    resultados = _ler_jsonl(saida)
+    assert sorted(r["id"] for r in resultados) == [f"r{i}" for i in range(5)]
+    assert all(r["status"] == "CONCLUIDO" for r in resultados)
+    assert resultados[0]["resultado"]["nota_final"] == 760
+    assert set(resultados[0]["tempos"]) == {"corretor_1", "corretor_2", "total"}
+    assert relatorio.concluidas == 5
+    assert "redações/min" in relatorio.texto()
+
+
+def test_lote_retoma_do_checkpoint_e_refaz_erros(tmp_path, corretores_falsos):
+    entrada, saida = tmp_path / "redacoes.jsonl", tmp_path / "resultados.jsonl"
+    _escrever_jsonl(entrada, [
+        {"id": "a", "tema": "Tema", "texto": "texto a"},
+        {"id": "b", "tema": "Tema", "texto": "falha"},
+    ])
+    asyncio.run(bulk.executar_lote(str(entrada), str(saida), concorrencia=2))
+    assert {r["id"]: r["status"] for r in _ler_jsonl(saida)} == {"a": "CONCLUIDO", "b": "ERRO"}
+
+    # Queda no meio da escrita: a linha truncada é ignorada na retomada
+    with open(saida, "a", encoding="utf-8") as arquivo:
+        arquivo.write('{"id": "c", "sta')
+    _escrever_jsonl(entrada, [
+        {"id": "a", "tema": "Tema", "texto": "texto a"},
+        {"id": "b", "tema": "Tema", "texto": "texto b corrigido"},
+    ])
+    corretores_falsos.clear()
+
+    relatorio = asyncio.run(bulk.executar_lote(str(entrada), str(saida), concorrencia=2))
+
+    assert relatorio.puladas == 1
+    assert relatorio.concluidas == 1
+    assert {texto for _, texto in corretores_falsos} == {"texto b corrigido"}
+    # A linha truncada foi cortada antes de anexar: o arquivo segue um JSON por linha
+    assert [(r["id"], r["status"]) for r in _ler_jsonl(saida)][-1] == ("b", "CONCLUIDO")
+    assert not any(r["id"] == "c" for r in _ler_jsonl(saida))
+
+
+def test_descarta_so_a_linha_truncada(tmp_path):
+    saida = tmp_path / "resultados.jsonl"
+    saida.write_bytes(b'{"id": "a"}\n{"id": "b"}\n{"id": "c", "sta')
+    bulk.descartar_linha_truncada(str(saida))
+    assert saida.read_bytes() == b'{"id": "a"}\n{"id": "b"}\n'
+
+    # Arquivo íntegro fica como está; só uma linha, truncada, vira arquivo vazio
+    bulk.descartar_linha_truncada(str(saida))
+    assert saida.read_bytes() == b'{"id": "a"}\n{"id": "b"}\n'
+    saida.write_bytes(b'{"id": "a", "st')
+    bulk.descartar_linha_truncada(str(saida))
+    assert saida.read_bytes() == b""
+
+
+def test_le_csv_com_id_padrao_pelo_numero_da_linha(tmp_path):
+    entrada = tmp_path / "redacoes.csv"
+    entrada.write_text("tema,texto\nTema 1,Texto 1\nTema 2,\"Texto, com vírgula\"\n", encoding="utf-8")
+
+    redacoes = list(bulk.ler_redacoes(str(entrada)))
+
+    assert redacoes == [
+        {"id": "1", "tema": "Tema 1", "texto": "Texto 1"},
+        {"id": "2", "tema": "Tema 2", "texto": "Texto, com vírgula"},
+    ]
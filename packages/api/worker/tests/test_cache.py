@@ -0,0 +1,43 @@
+import time
+
+from worker.agents import cache
+
+
+class LLMFalso:
+    def __init__(self, model="gemini-2.0-flash", temperature=0.3):
+        self.model = model
+        self.temperature = temperature
+
+
+def test_normalizacao_ignora_espacos_mas_preserva_maiusculas():
+    assert cache.normalizar_texto("Texto  com\r\n\r\n\r\nespaços \t extras ") == "Texto com\n\nespaços extras"
+    assert cache.normalizar_texto("Brasil") != cache.normalizar_texto("brasil")
+
+
+def test_chave_muda_com_persona_modelo_e_temperatura():
+    base = cache.chave_competencia(LLMFalso(), "Texto", "Tema", 1, "Persona A")
+    assert base == cache.chave_competencia(LLMFalso(), "Texto ", "Tema", 1, "Persona A")
+    assert base != cache.chave_competencia(LLMFalso(), "Texto", "Tema", 2, "Persona A")
+    assert base != cache.chave_competencia(LLMFalso(), "Texto", "Tema", 1, "Persona B")
+    assert base != cache.chave_competencia(LLMFalso(temperature=0.35), "Texto", "Tema", 1, "Persona A")
+    assert base != cache.chave_competencia(LLMFalso(model="outro"), "Texto", "Tema", 1, "Persona A")
+
+
+def test_sqlite_expira_pelo_ttl(tmp_path):
+    backend = cache.CacheSQLite(str(tmp_path / "cache.sqlite3"), ttl_segundos=1, max_entradas=10)
+    backend.salvar("competencia:a", {"nota": 160})
+    assert backend.obter("competencia:a") == {"nota": 160}
+
+    time.sleep(1.1)
+    assert backend.obter("competencia:a") is None
+
+
+def test_sqlite_remove_menos_acessadas_acima_do_limite(tmp_path):
+    backend = cache.CacheSQLite(str(tmp_path / "cache.sqlite3"), ttl_segundos=60, max_entradas=2)
+    for i in range(3):
+        backend.salvar(f"k{i}", i)
+        time.sleep(0.01)
+    backend._podar(backend._conexao(), time.time())
+
+    assert backend.obter("k0") is None
+    assert backend.obter("k2") == 2
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from worker.agents import cassete
+from worker.agents.fake import ChatFalso
+
+PROMPT = ChatPromptTemplate.from_template("Avalie a Competência {numero}. Redação: {redacao}")
+
+
+@pytest.fixture
+def arquivo_cassete(monkeypatch, tmp_path):
+    caminho = tmp_path / "cassete.jsonl.gz"
+    monkeypatch.setattr(cassete.settings, "LLM_CASSETE_ARQUIVO", str(caminho))
+    monkeypatch.setattr(cassete.settings, "LLM_CASSETE_SIMULAR_LATENCIA", False)
+
+    def _usar(modo):
+        monkeypatch.setattr(cassete.settings, "LLM_CASSETE_MODO", modo)
+        # Novo processo: o cassete é relido do disco
+        monkeypatch.setattr(cassete, "_cassete", None)
+
+    return _usar
+
+
+def _chain(llm):
+    return PROMPT | llm | JsonOutputParser()
+
+
+def test_reproduz_sem_chamar_o_provedor(arquivo_cassete):
+    arquivo_cassete("gravar")
+    gravada = asyncio.run(_chain(cassete.envolver(ChatFalso(latencia_media=0))).ainvoke(
+        {"numero": 2, "redacao": "texto"}
+    ))
+
+    arquivo_cassete("reproduzir")
+    # Qualquer chamada real falharia com 429
+    llm = cassete.envolver(ChatFalso(latencia_media=0, taxa_429=1.0))
+    reproduzida = asyncio.run(_chain(llm).ainvoke({"numero": 2, "redacao": "texto"}))
+
+    assert reproduzida == gravada
+    with pytest.raises(cassete.CasseteAusente):
+        asyncio.run(_chain(llm).ainvoke({"numero": 2, "redacao": "outro texto"}))
+
+
+def test_streaming_e_latencia_original(arquivo_cassete, monkeypatch):
+    arquivo_cassete("gravar")
+    llm = cassete.envolver(ChatFalso(latencia_media=0.05, latencia_distribuicao="fixa", json_mode=False))
+
+    async def _trechos():
+        return [p.content async for p in (PROMPT | llm).astream({"numero": 1, "redacao": "texto"})]
+
+    gravados = asyncio.run(_trechos())
+
+    arquivo_cassete("reproduzir")
+    monkeypatch.setattr(cassete.settings, "LLM_CASSETE_SIMULAR_LATENCIA", True)
+    inicio = time.monotonic()
+    reproduzidos = asyncio.run(_trechos())
+
+    assert "".join(reproduzidos) == "".join(gravados)
+    assert time.monotonic() - inicio >= 0.05
+
+
+def test_interceptar_respeita_a_ordem_das_gravacoes(arquivo_cassete):
+    respostas = iter(["primeira", "segunda"])
+
+    async def _ocr():
+        return next(respostas)
+
+    chave = cassete.impressao_digital("ocr", imagem="abc")
+    arquivo_cassete("gravar")
+    asyncio.run(cassete.interceptar(chave, _ocr))
+    asyncio.run(cassete.interceptar(chave, _ocr))
+
+    arquivo_cassete("reproduzir")
+    reproduzidas = [asyncio.run(cassete.interceptar(chave, _ocr)) for _ in range(3)]
+
+    assert reproduzidas == ["primeira", "segunda", "segunda"]
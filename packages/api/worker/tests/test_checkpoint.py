@@ -0,0 +1,81 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import tasks
+from shared import eventos, models
+
+
+@pytest.fixture
+def sessoes(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    sessoes = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(tasks, "SessionLocal", sessoes)
+    monkeypatch.setattr(eventos, "publicar", lambda redacao_id, evento, canal=None: None)
+    yield sessoes
+    models.Base.metadata.drop_all(bind=engine)
+
+
+def _criar_redacao(sessoes):
+    db = sessoes()
+    redacao = models.Redacao(tema="Tema", texto_redacao="Texto", status="PENDENTE")
+    db.add(redacao)
+    db.commit()
+    redacao_id = redacao.id
+    db.close()
+    return redacao_id
+
+
+def test_checkpoint_gravado_fora_do_loop_e_mantido_na_falha(sessoes, monkeypatch):
+    redacao_id = _criar_redacao(sessoes)
+
+    threads = []
+    commit_original = tasks.Session.commit
+
+    def _commit(self):
+        threads.append(threading.current_thread())
+        return commit_original(self)
+
+    monkeypatch.setattr(tasks.Session, "commit", _commit)
+
+    async def _pipeline_falho(texto, tema, c1, c2, c3, ao_concluir_competencia=None, **kwargs):
+        threads.clear()
+        # Chamadas em sequência: a segunda sai junto com a gravação seguinte
+        for numero in (1, 2, 3):
+            ao_concluir_competencia("Corretor 1", {"competencia": numero, "nota": 120})
+        await asyncio.sleep(0.1)
+        assert threads and threading.current_thread() not in threads
+        raise tasks.resiliencia.TentativasEsgotadas("provedor fora do ar")
+
+    monkeypatch.setattr(tasks, "corrigir_redacao", _pipeline_falho)
+
+    with pytest.raises(Exception):
+        tasks.correct_essay(redacao_id)
+
+    redacao = sessoes().get(models.Redacao, redacao_id)
+    assert redacao.status == "PENDENTE"
+    assert set(redacao.progresso_json["competencias"]["Corretor 1"]) == {"1", "2", "3"}
+
+
+@pytest.mark.parametrize("erro", [
+    tasks.resiliencia.PrazoEsgotado("Prazo de 600s da correção esgotado."),
+    ValueError("Resposta do LLM sem o campo 'nota'."),
+])
+def test_prazo_esgotado_e_falha_permanente_vao_para_erro_sem_reenfileirar(sessoes, monkeypatch, erro):
+    redacao_id = _criar_redacao(sessoes)
+
+    async def _pipeline(*args, **kwargs):
+        raise erro
+
+    monkeypatch.setattr(tasks, "corrigir_redacao", _pipeline)
+
+    # Sem self.retry: a task termina sem exceção
+    tasks.correct_essay(redacao_id)
+
+    redacao = sessoes().get(models.Redacao, redacao_id)
+    assert redacao.status == "ERRO"
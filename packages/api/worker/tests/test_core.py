@@ -0,0 +1,158 @@
+import asyncio
+
+import pytest
+
+from worker.agents import core
+
+
+def test_avaliacao_concorrente_preserva_ordem_e_limite(monkeypatch):
+    em_andamento = 0
+    pico = 0
+
+    async def avaliar_falso(llm, texto, tema, info, persona, ao_receber_429=None):
+        nonlocal em_andamento, pico
+        em_andamento += 1
+        pico = max(pico, em_andamento)
+        # Competências de número maior terminam primeiro
+        await asyncio.sleep(0.01 * (6 - info["numero"]))
+        em_andamento -= 1
+        return {"competencia": info["numero"], "nota": 120, "justificativa": ""}
+
+    monkeypatch.setattr(core, "avaliar_competencia_individual", avaliar_falso)
+    monkeypatch.setattr(core.settings, "LLM_CONCORRENCIA_POR_CORRETOR", 2)
+
+    resultados = asyncio.run(
+        core._avaliar_competencias_concorrente(None, "Corretor 1", "texto", "tema", "persona")
+    )
+
+    assert [r["competencia"] for r in resultados] == [1, 2, 3, 4, 5]
+    assert pico == 2
+
+
+def test_limitador_cai_para_sequencial_apos_429():
+    async def cenario():
+        limitador = core.LimitadorCorretor(5)
+        limitador.reduzir()
+        em_andamento = 0
+        pico = 0
+
+        async def tarefa():
+            nonlocal em_andamento, pico
+            async with limitador:
+                em_andamento += 1
+                pico = max(pico, em_andamento)
+                await asyncio.sleep(0.01)
+                em_andamento -= 1
+
+        await asyncio.gather(*(tarefa() for _ in range(4)))
+        return pico
+
+    assert asyncio.run(cenario()) == 1
+
+
+def _avaliacao(numero, nota=120):
+    return {"competencia": numero, "analise_critica": "", "nota": nota, "justificativa": ""}
+
+
+def test_validar_avaliacao_completa_ordena_por_competencia():
+    resposta = {"competencias": [_avaliacao(n) for n in (3, 1, 5, 2, 4)]}
+    resultado = core.validar_avaliacao_completa(resposta)
+    assert [r["competencia"] for r in resultado] == [1, 2, 3, 4, 5]
+
+    # Alguns modelos devolvem a lista direto
+    assert len(core.validar_avaliacao_completa([_avaliacao(n) for n in range(1, 6)])) == 5
+
+
+def test_validar_avaliacao_completa_rejeita_competencias_faltando():
+    with pytest.raises(ValueError):
+        core.validar_avaliacao_completa({"competencias": [_avaliacao(n) for n in (1, 2, 3, 4)]})
+    with pytest.raises(ValueError):
+        core.validar_avaliacao_completa({"competencias": [_avaliacao(n) for n in (1, 1, 2, 3, 4)]})
+
+
+def test_chamada_unica_invalida_recorre_a_avaliacao_individual(monkeypatch):
+    async def chamada_unica_falha(*args, **kwargs):
+        raise ValueError("JSON malformado")
+
+    async def avaliar_falso(llm, texto, tema, info, persona, ao_receber_429=None):
+        return _avaliacao(info["numero"], nota=160)
+
+    monkeypatch.setattr(core, "avaliar_todas_competencias", chamada_unica_falha)
+    monkeypatch.setattr(core, "avaliar_competencia_individual", avaliar_falso)
+
+    resultados = asyncio.run(
+        core._avaliar_competencias_chamada_unica(None, "Corretor 2", "texto", "tema", "persona")
+    )
+    assert [r["nota"] for r in resultados] == [160] * 5
+
+
+def test_feedback_em_streaming_repassa_trechos(monkeypatch):
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    monkeypatch.setattr(core.cache, "_backend", core.cache.CacheDesativado())
+    monkeypatch.setattr(core.settings, "LLM_COTA_ATIVA", False)
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="Muito bom trabalho, continue assim")]))
+    trechos = []
+
+    async def receber(trecho):
+        trechos.append(trecho)
+
+    comentario = asyncio.run(core._gerar_feedback_geral(llm, [_avaliacao(1)], receber))
+
+    assert comentario == "Muito bom trabalho, continue assim"
+    assert len(trechos) > 1
+    assert "".join(trechos) == comentario
+
+
+
+def test_queda_no_meio_do_stream_nao_repete_os_trechos(monkeypatch):
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    class _CaiNoMeio(GenericFakeChatModel):
+        async def _astream(self, *args, **kwargs):
+            enviados = 0
+            async for pedaco in super()._astream(*args, **kwargs):
+                yield pedaco
+                enviados += 1
+                if enviados == 3:
+                    raise asyncio.TimeoutError()
+
+    monkeypatch.setattr(core.cache, "_backend", core.cache.CacheDesativado())
+    monkeypatch.setattr(core.settings, "LLM_COTA_ATIVA", False)
+    monkeypatch.setattr(core.settings, "LLM_BACKOFF_BASE", 0.01)
+    completo = "Muito bom trabalho, continue assim"
+    llm = _CaiNoMeio(messages=iter([AIMessage(content=completo), AIMessage(content=completo)]))
+    trechos = []
+
+    async def receber(trecho):
+        trechos.append(trecho)
+
+    comentario = asyncio.run(core._gerar_feedback_geral(llm, [_avaliacao(1)], receber))
+
+    # A nova tentativa não passa pelo stream: o cliente fica só com o início, sem repetição
+    assert comentario == completo
+    assert len(trechos) == 3
+    assert completo.startswith("".join(trechos))
+
+def test_avaliacoes_prontas_nao_sao_refeitas(monkeypatch):
+    avaliadas = []
+
+    async def avaliar_falso(llm, texto, tema, info, persona, ao_receber_429=None):
+        avaliadas.append(info["numero"])
+        return _avaliacao(info["numero"], nota=160)
+
+    monkeypatch.setattr(core, "avaliar_competencia_individual", avaliar_falso)
+    monkeypatch.setattr(core, "get_llm_client", lambda **kwargs: None)
+    monkeypatch.setattr(core.settings, "LLM_MODO_CORRECAO", "concorrente")
+
+    resultado = asyncio.run(core.executar_correcao_completa_async(
+        "Corretor 1", "texto", "tema",
+        gerar_feedback=False,
+        avaliacoes_prontas={1: _avaliacao(1, nota=200), 4: _avaliacao(4, nota=80)},
+    ))
+
+    assert sorted(avaliadas) == [2, 3, 5]
+    assert [c["nota"] for c in resultado["competencias"]] == [200, 160, 160, 80, 160]
+    assert resultado["nota_final"] == 760
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+from worker.agents import cota
+from worker.agents.prompts import PROMPT_AGENTE_COMPETENCIA
+
+
+def test_limites_por_modelo_sobrepoem_o_padrao(monkeypatch):
+    monkeypatch.setattr(cota.settings, "LLM_COTA_RPM", 15)
+    monkeypatch.setattr(cota.settings, "LLM_COTA_TPM", 1000)
+    monkeypatch.setattr(cota.settings, "LLM_COTA_LIMITES", {"gemini:gemini-2.0-flash": {"rpm": 2000}})
+
+    assert cota.limites("gemini", "gemini-2.0-flash") == (2000, 1000)
+    assert cota.limites("openai", "sonar") == (15, 1000)
+
+
+def test_estimativa_conta_template_e_saida():
+    so_saida = cota.estimar_tokens(saida=100)
+    com_prompt = cota.estimar_tokens(PROMPT_AGENTE_COMPETENCIA, "x" * 400, saida=100)
+    assert so_saida == 100
+    assert com_prompt > so_saida + 100
+
+
+def test_sem_redis_a_chamada_segue_sem_travar(monkeypatch):
+    # Porta fechada: o governador falha na conexão e a chamada é liberada
+    monkeypatch.setattr(cota, "_governador", cota.GovernadorCota("redis://127.0.0.1:1/0"))
+    monkeypatch.setattr(cota, "_indisponivel_ate", 0.0)
+    monkeypatch.setattr(cota.settings, "LLM_COTA_ATIVA", True)
+
+    inicio = time.monotonic()
+    asyncio.run(cota.adquirir("gemini", "gemini-2.0-flash", 1000))
+    asyncio.run(cota.registrar_limite("gemini", "gemini-2.0-flash", 5, pausar_localmente=False))
+    assert time.monotonic() - inicio < 3
+    assert not cota._disponivel()
+
+
+def test_balde_novo_libera_e_debita_o_custo_estimado():
+    estado, espera = cota.calcular_aquisicao({}, 100.0, rpm=10, tpm=1000, custo=300, recuperacao=0.01)
+
+    assert espera == 0
+    assert (estado["req"], estado["tok"], estado["fator"]) == (9, 700, 1.0)
+
+
+def test_sem_fichas_espera_o_reabastecimento():
+    vazio = {"req": 5, "tok": 100, "ts": 100.0, "fator": 1.0, "pausa_ate": 0}
+
+    # Faltam 200 tokens a 1000/min: 12s
+    estado, espera = cota.calcular_aquisicao(vazio, 100.0, rpm=10, tpm=1000, custo=300, recuperacao=0.01)
+    assert espera == 12.0
+    assert estado["tok"] == 100  # Nada debitado enquanto espera
+
+    # 12s depois o balde reabasteceu o suficiente
+    estado, espera = cota.calcular_aquisicao(estado, 112.0, rpm=10, tpm=1000, custo=300, recuperacao=0.01)
+    assert espera == 0
+    assert abs(estado["tok"]) < 1e-9
+
+
+def test_reabastecimento_nao_passa_da_capacidade():
+    parado = {"req": 0, "tok": 0, "ts": 0.0, "fator": 1.0, "pausa_ate": 0}
+    estado, _ = cota.calcular_aquisicao(parado, 3600.0, rpm=10, tpm=1000, custo=0, recuperacao=0.01)
+    assert (estado["req"], estado["tok"]) == (9, 1000)
+
+
+def test_429_pausa_zera_o_balde_e_reduz_o_fator_pela_metade():
+    estado, fator = cota.calcular_limite({"fator": 1.0}, 100.0, retry_after=30, piso=0.1)
+    assert fator == 0.5
+    assert (estado["req"], estado["tok"], estado["pausa_ate"]) == (0, 0, 130.0)
+
+    # Outro 429 da mesma rajada não reduz de novo
+    estado, fator = cota.calcular_limite(estado, 102.0, retry_after=10, piso=0.1)
+    assert fator == 0.5
+    assert estado["pausa_ate"] == 130.0
+
+    # Durante a pausa, ninguém é liberado
+    _, espera = cota.calcular_aquisicao(estado, 110.0, rpm=10, tpm=1000, custo=1, recuperacao=0.01)
+    assert espera == 20.0
+
+
+def test_fator_respeita_o_piso_e_se_recupera_com_o_tempo():
+    estado = {"fator": 0.15}
+    estado, fator = cota.calcular_limite(estado, 100.0, retry_after=0, piso=0.1)
+    assert fator == 0.1
+
+    # 0.01 por segundo: 20s depois, 30% do ritmo; a capacidade acompanha o fator
+    estado, _ = cota.calcular_aquisicao(estado, 120.0, rpm=10, tpm=1000, custo=0, recuperacao=0.01)
+    assert abs(estado["fator"] - 0.3) < 1e-9
+    assert estado["tok"] <= 1000 * estado["fator"]
+
+    # Nunca passa de 100%
+    estado, _ = cota.calcular_aquisicao(estado, 1000.0, rpm=10, tpm=1000, custo=0, recuperacao=0.01)
+    assert estado["fator"] == 1.0
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted
+from langchain_core.output_parsers import JsonOutputParser
+
+from shared.schemas import AvaliacaoCompetencia
+from worker.agents import cache, core
+from worker.agents.fake import ChatFalso
+from worker.agents.prompts import COMPETENCIAS_INFO, PROMPT_AGENTE_COMPETENCIA
+
+
+def _entrada(numero, redacao="Texto da redação", persona="Persona"):
+    info = next(i for i in COMPETENCIAS_INFO if i["numero"] == numero)
+    return {
+        "instrucoes_persona": persona,
+        "competencia_numero": numero,
+        "criterios_competencia": info["criterios"],
+        "criterios_negativos": info.get("criterios_negativos", ""),
+        "redacao": redacao,
+        "tema": "Tema",
+        "format_instructions": "",
+    }
+
+
+def _avaliar(llm, numero, **kwargs):
+    chain = PROMPT_AGENTE_COMPETENCIA | llm | JsonOutputParser(pydantic_object=AvaliacaoCompetencia)
+    return asyncio.run(chain.ainvoke(_entrada(numero, **kwargs)))
+
+
+@pytest.fixture
+def sem_infraestrutura(monkeypatch):
+    monkeypatch.setattr(cache, "_backend", cache.CacheDesativado())
+    monkeypatch.setattr(core.settings, "LLM_COTA_ATIVA", False)
+    monkeypatch.setattr(core.settings, "LLM_BACKUP_PROVIDER", None)
+    monkeypatch.setattr(core.settings, "LLM_MAX_TENTATIVAS", 1)
+
+
+def test_responde_avaliacao_valida_e_deterministica():
+    llm = ChatFalso(latencia_media=0)
+
+    avaliacao = AvaliacaoCompetencia.model_validate(_avaliar(llm, 3))
+
+    assert avaliacao.competencia == 3
+    assert avaliacao.nota in (0, 40, 80, 120, 160, 200)
+    assert _avaliar(ChatFalso(latencia_media=0), 3) == _avaliar(llm, 3)
+
+
+def test_injeta_429_com_retry_after():
+    llm = ChatFalso(latencia_media=0, taxa_429=1.0, retry_after_429=0.5)
+
+    with pytest.raises(ResourceExhausted) as erro:
+        _avaliar(llm, 1)
+    assert erro.value.retry_after == 0.5
+
+
+def test_saida_malformada_vira_erro_sistemico(sem_infraestrutura):
+    llm = ChatFalso(latencia_media=0, taxa_malformada=1.0)
+    info = next(i for i in COMPETENCIAS_INFO if i["numero"] == 2)
+
+    avaliacao = asyncio.run(
+        core.avaliar_competencia_individual(llm, "Texto", "Tema", info, "Persona")
+    )
+
+    assert avaliacao["erro"] is True
+    assert avaliacao["nota"] == 0
+
+
+def test_benchmark_mede_vazao_e_chamadas(monkeypatch, sem_infraestrutura):
+    import benchmark
+
+    for nome, valor in {
+        "LLM_PROVIDER": "fake",
+        "LLM_MODEL": "falso",
+        "LLM_FAKE_LATENCIA_MEDIA": 0.0,
+        "LLM_MODO_CORRECAO": "concorrente",
+    }.items():
+        monkeypatch.setattr(benchmark.settings, nome, valor)
+    # benchmark importa agents.* pelo caminho do container (outra cópia do módulo)
+    from agents import cache as cache_container
+    monkeypatch.setattr(cache_container, "_backend", cache_container.CacheDesativado())
+
+    resultados = asyncio.run(benchmark.executar_benchmark(4, [1, 4]))
+
+    assert [r["concorrencia"] for r in resultados] == [1, 4]
+    for r in resultados:
+        assert r["erros"] == 0
+        assert r["redacoes_por_segundo"] > 0
+        assert r["p50"] <= r["p95"] <= r["p99"]
+        # Dois corretores com 5 competências e o comentário geral; supervisor quando diverge
+        assert 12 <= r["chamadas_por_redacao"] <= 18
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_openai import ChatOpenAI
+
+from worker.agents import core, hedging, registro
+
+
+class _ServidorFalso(BaseHTTPRequestHandler):
+    """Endpoint /v1/chat/completions compatível com OpenAI, com atraso e status configuráveis."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.chamadas += 1
+        time.sleep(self.server.atraso)
+        if self.server.status != 200:
+            corpo = {"error": {"message": "indisponível", "type": "server_error"}}
+        else:
+            corpo = {
+                "id": "chatcmpl-teste",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "falso",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self.server.resposta},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        dados = json.dumps(corpo).encode()
+        try:
+            self.send_response(self.server.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            self.end_headers()
+            self.wfile.write(dados)
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente desistiu (hedge vencido pelo outro provedor)
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def servidores():
+    criados = []
+
+    def _criar(resposta, atraso=0.0, status=200):
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ServidorFalso)
+        servidor.resposta, servidor.atraso, servidor.status, servidor.chamadas = resposta, atraso, status, 0
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        criados.append(servidor)
+        llm = ChatOpenAI(
+            model=f"falso-{len(criados)}",
+            openai_api_key="chave-de-teste",
+            base_url=f"http://127.0.0.1:{servidor.server_address[1]}/v1",
+            max_retries=0,
+            timeout=10,
+        )
+        return servidor, llm
+
+    yield _criar
+    for servidor in criados:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+async def _chamar(llm):
+    hedging.marcar_envio()
+    return (await llm.ainvoke("oi")).content
+
+
+def test_sem_atraso_responde_o_principal(monkeypatch, servidores):
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_ATRASO_PADRAO", 2.0)
+    _, principal = servidores("principal")
+    servidor_backup, backup = servidores("reserva")
+    hedger = hedging.Hedger()
+
+    assert asyncio.run(hedger.executar(_chamar, principal, backup)) == "principal"
+    assert hedger.contadores["hedges"] == 0
+    assert servidor_backup.chamadas == 0
+
+
+def test_principal_lento_dispara_hedge_e_vence_o_reserva(monkeypatch, servidores):
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_ATRASO_PADRAO", 0.2)
+    _, principal = servidores("principal", atraso=1.5)
+    _, backup = servidores("reserva")
+    hedger = hedging.Hedger()
+
+    inicio = time.monotonic()
+    resposta = asyncio.run(hedger.executar(_chamar, principal, backup))
+
+    assert resposta == "reserva"
+    assert time.monotonic() - inicio < 1.0
+    assert hedger.contadores["hedges"] == 1
+    assert hedger.contadores["vitorias_backup"] == 1
+
+
+def test_limiar_segue_o_percentil_das_latencias(monkeypatch):
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_MIN_AMOSTRAS", 10)
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_PERCENTIL", 0.9)
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_ATRASO_PADRAO", 20.0)
+    estatisticas = hedging.EstatisticasProvedor("teste")
+
+    for i in range(9):
+        estatisticas.registrar(True, float(i + 1))
+    assert estatisticas.limiar_hedge() == 20.0
+
+    estatisticas.registrar(True, 10.0)
+    assert estatisticas.limiar_hedge() == 10.0
+
+
+def test_espera_pela_cota_nao_entra_na_latencia(monkeypatch):
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_MIN_AMOSTRAS", 5)
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_PERCENTIL", 0.95)
+    hedger = hedging.Hedger()
+    principal = object()
+
+    async def _chamar_com_cota(llm):
+        await asyncio.sleep(0.2)  # Fila da cota
+        hedging.marcar_envio()
+        await asyncio.sleep(0.01)  # Provedor
+        return "ok"
+
+    async def _rodar():
+        for _ in range(5):
+            await hedger._medir(_chamar_com_cota, principal, principal=True)
+
+    asyncio.run(_rodar())
+    estatisticas = hedger.estatisticas_de(principal)
+    assert len(estatisticas.latencias) == 5
+    assert estatisticas.limiar_hedge() < 0.1
+
+
+def test_espera_pela_cota_nao_dispara_o_hedge(monkeypatch):
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_ATRASO_PADRAO", 0.1)
+    hedger = hedging.Hedger()
+    principal, reserva = object(), object()
+    chamados = []
+
+    async def _chamar_com_cota(llm):
+        chamados.append(llm)
+        if llm is principal:
+            await asyncio.sleep(0.3)  # Fila da cota, maior que o limiar
+            hedging.marcar_envio()
+        await asyncio.sleep(0.01)  # Provedor
+        return "ok"
+
+    assert asyncio.run(hedger.executar(_chamar_com_cota, principal, reserva)) == "ok"
+    assert chamados == [principal]
+    assert hedger.contadores["hedges"] == 0
+
+
+def test_taxa_de_erro_alta_ativa_failover(monkeypatch, servidores):
+    monkeypatch.setattr(hedging.settings, "LLM_HEDGE_ATRASO_PADRAO", 2.0)
+    monkeypatch.setattr(hedging.settings, "LLM_FAILOVER_JANELA", 2)
+    monkeypatch.setattr(hedging.settings, "LLM_FAILOVER_TAXA_ERRO", 0.5)
+    monkeypatch.setattr(hedging.settings, "LLM_FAILOVER_DURACAO", 60.0)
+    servidor_principal, principal = servidores("principal", status=500)
+    _, backup = servidores("reserva")
+    hedger = hedging.Hedger()
+
+    async def _cenario():
+        return [await hedger.executar(_chamar, principal, backup) for _ in range(3)]
+
+    # As duas primeiras falham no principal e caem no reserva; a terceira já vai direto
+    assert asyncio.run(_cenario()) == ["reserva"] * 3
+    assert servidor_principal.chamadas == 2
+    assert hedger.contadores["failovers"] == 1
+    assert hedger.contadores["desvios_failover"] == 1
+
+
+def test_sem_reserva_erros_do_principal_propagam(servidores):
+    _, principal = servidores("principal", status=500)
+    hedger = hedging.Hedger()
+
+    with pytest.raises(Exception):
+        asyncio.run(hedger.executar(_chamar, principal, None))
+
+
+def test_cliente_reserva_espelha_o_principal(monkeypatch):
+    registro.limpar()
+    monkeypatch.setattr(core.settings, "GOOGLE_API_KEY", "chave-de-teste")
+    llm = core.get_llm_client(temperature=0.3, json_mode=True, max_output_tokens=2048)
+    assert core.get_llm_reserva(llm) is None
+
+    monkeypatch.setattr(core.settings, "LLM_BACKUP_PROVIDER", "openai")
+    monkeypatch.setattr(core.settings, "LLM_BACKUP_MODEL", "gpt-4o-mini")
+    monkeypatch.setattr(core.settings, "LLM_BACKUP_BASE_URL", "http://127.0.0.1:1/v1")
+    monkeypatch.setattr(core.settings, "LLM_BACKUP_API_KEY", "chave-de-teste")
+    reserva = core.get_llm_reserva(llm)
+
+    assert isinstance(reserva, ChatOpenAI)
+    assert reserva.model_name == "gpt-4o-mini"
+    assert reserva.temperature == 0.3
+    assert core.get_llm_reserva(llm) is reserva
+    registro.limpar()
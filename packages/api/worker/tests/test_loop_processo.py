@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from worker import loop_processo
+
+
+@pytest.fixture
+def modo_assincrono(monkeypatch):
+    monkeypatch.setattr(loop_processo.settings, "WORKER_MODO_EXECUCAO", "assincrono")
+    yield
+    loop_processo.encerrar()
+
+
+def _executar_em_threads(fabrica, quantidade):
+    resultados = [None] * quantidade
+
+    def _rodar(i):
+        resultados[i] = loop_processo.executar(fabrica(i))
+
+    threads = [threading.Thread(target=_rodar, args=(i,)) for i in range(quantidade)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    return resultados
+
+
+def test_tasks_de_varias_threads_correm_juntas_no_mesmo_loop(monkeypatch, modo_assincrono):
+    monkeypatch.setattr(loop_processo.settings, "WORKER_CORRECOES_SIMULTANEAS", 8)
+
+    async def _correcao(i):
+        await asyncio.sleep(0.2)
+        return i, asyncio.get_running_loop()
+
+    inicio = time.monotonic()
+    resultados = _executar_em_threads(_correcao, 4)
+
+    assert time.monotonic() - inicio < 0.6
+    assert [i for i, _ in resultados] == [0, 1, 2, 3]
+    assert len({id(loop) for _, loop in resultados}) == 1
+
+
+def test_limite_de_correcoes_simultaneas(monkeypatch, modo_assincrono):
+    monkeypatch.setattr(loop_processo.settings, "WORKER_CORRECOES_SIMULTANEAS", 2)
+    em_andamento = []
+    pico = []
+
+    async def _correcao(i):
+        em_andamento.append(i)
+        pico.append(len(em_andamento))
+        await asyncio.sleep(0.05)
+        em_andamento.remove(i)
+        return i
+
+    assert _executar_em_threads(_correcao, 6) == list(range(6))
+    assert max(pico) == 2
+
+
+def test_prefork_roda_no_proprio_thread(monkeypatch):
+    monkeypatch.setattr(loop_processo.settings, "WORKER_MODO_EXECUCAO", "prefork")
+
+    async def _thread_atual():
+        return threading.current_thread()
+
+    assert loop_processo.executar(_thread_atual()) is threading.current_thread()
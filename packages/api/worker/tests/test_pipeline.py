@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+import pipeline
+
+
+def _correcao(id_corretor, notas):
+    competencias = [{"competencia": i + 1, "nota": n, "justificativa": ""} for i, n in enumerate(notas)]
+    return {"competencias": competencias, "nota_final": sum(notas), "comentarios_gerais": "", "id_corretor": id_corretor}
+
+
+def test_checkpoint_e_retomada_sem_refazer_o_que_ficou_pronto(monkeypatch):
+    chamadas = []
+    falhar = {"Corretor 2": True}
+
+    async def _corrigir(id_corretor, texto, tema, ao_concluir_competencia=None,
+                        avaliacoes_prontas=None, **kwargs):
+        prontas = avaliacoes_prontas or {}
+        chamadas.append((id_corretor, sorted(prontas)))
+        avaliacoes = []
+        for numero in range(1, 6):
+            if numero in prontas:
+                avaliacoes.append(prontas[numero])
+                continue
+            if falhar.get(id_corretor) and numero == 3:
+                raise RuntimeError("provedor fora do ar")
+            avaliacao = {"competencia": numero, "nota": 160, "justificativa": ""}
+            ao_concluir_competencia(avaliacao)
+            avaliacoes.append(avaliacao)
+        return _correcao(id_corretor, [a["nota"] for a in avaliacoes])
+
+    monkeypatch.setattr(pipeline, "executar_correcao_completa_async", _corrigir)
+    monkeypatch.setattr(pipeline.settings, "SUPERVISOR_ESPECULATIVO", False)
+
+    corretores, competencias = {}, {}
+
+    def _salvar_competencia(id_corretor, avaliacao):
+        competencias.setdefault(id_corretor, {})[avaliacao["competencia"]] = avaliacao
+
+    def _salvar_corretor(id_corretor, correcao):
+        corretores[id_corretor] = correcao
+        competencias.pop(id_corretor, None)
+
+    checkpoint = dict(ao_concluir_competencia=_salvar_competencia, ao_concluir_corretor=_salvar_corretor)
+
+    # 1ª tentativa: Corretor 1 termina, Corretor 2 cai na competência 3
+    with pytest.raises(RuntimeError):
+        asyncio.run(pipeline.corrigir_redacao("texto", "tema", **checkpoint))
+    assert set(corretores) == {"Corretor 1"}
+    assert sorted(competencias["Corretor 2"]) == [1, 2]
+
+    # 2ª tentativa: retoma do checkpoint
+    falhar.clear()
+    chamadas.clear()
+    resultado = asyncio.run(pipeline.corrigir_redacao(
+        "texto", "tema", corretores.get("Corretor 1"), corretores.get("Corretor 2"),
+        avaliacoes_prontas=competencias, **checkpoint,
+    ))
+
+    assert chamadas == [("Corretor 2", [1, 2])]
+    assert set(corretores) == {"Corretor 1", "Corretor 2"}
+    assert resultado["nota_final"] == 800
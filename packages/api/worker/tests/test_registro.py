@@ -0,0 +1,95 @@
+import asyncio
+
+from worker.agents import core, registro
+from worker.agents.prompts import PROMPT_AGENTE_COMPETENCIA
+from shared.schemas import AvaliacaoCompetencia
+
+
+class LLMFalso:
+    def __init__(self, temperatura):
+        self.temperatura = temperatura
+
+
+def test_cliente_criado_uma_vez_por_chave():
+    registro.limpar()
+    criados = []
+
+    def fabrica(t):
+        def _criar():
+            criados.append(t)
+            return LLMFalso(t)
+        return _criar
+
+    a = registro.obter_cliente(("gemini", 0.3), fabrica(0.3))
+    b = registro.obter_cliente(("gemini", 0.3), fabrica(0.3))
+    c = registro.obter_cliente(("gemini", 0.35), fabrica(0.35))
+
+    assert a is b
+    assert a is not c
+    assert criados == [0.3, 0.35]
+
+
+def test_chain_reaproveitada_para_o_mesmo_cliente(monkeypatch):
+    registro.limpar()
+    monkeypatch.setattr(core.settings, "GOOGLE_API_KEY", "chave-de-teste")
+    llm = core.get_llm_client(temperature=0.3)
+    assert core.get_llm_client(temperature=0.3) is llm
+
+    chain, instrucoes = registro.obter_chain_json(PROMPT_AGENTE_COMPETENCIA, llm, AvaliacaoCompetencia)
+    chain_de_novo, _ = registro.obter_chain_json(PROMPT_AGENTE_COMPETENCIA, llm, AvaliacaoCompetencia)
+    assert chain is chain_de_novo
+    assert "nota" in instrucoes
+
+
+def test_registro_recomeca_quando_o_loop_muda():
+    registro.limpar()
+
+    async def obter():
+        return registro.obter_cliente("chave", lambda: LLMFalso(0.3))
+
+    primeiro = asyncio.run(obter())
+    segundo = asyncio.run(obter())
+    assert primeiro is not segundo
+
+
+def test_dois_loops_vivos_mantem_cada_um_os_seus_clientes():
+    registro.limpar()
+    criados = []
+
+    def _fabrica():
+        criados.append(1)
+        return LLMFalso(0.3)
+
+    async def obter():
+        return registro.obter_cliente("chave", _fabrica)
+
+    persistente, outro = asyncio.new_event_loop(), asyncio.new_event_loop()
+    try:
+        # Alternar entre os loops não descarta os clientes do outro
+        a1 = persistente.run_until_complete(obter())
+        b1 = outro.run_until_complete(obter())
+        a2 = persistente.run_until_complete(obter())
+        b2 = outro.run_until_complete(obter())
+    finally:
+        persistente.close()
+        outro.close()
+
+    assert a1 is a2 and b1 is b2
+    assert a1 is not b1
+    assert len(criados) == 2
+
+
+def test_clientes_aquecidos_fora_do_loop_vao_para_o_primeiro_loop():
+    registro.limpar()
+    aquecido = registro.obter_cliente("chave", lambda: LLMFalso(0.3))
+
+    async def obter():
+        return registro.obter_cliente("chave", lambda: LLMFalso(0.3))
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(obter()) is aquecido
+    finally:
+        loop.close()
+    # Um segundo loop não divide o cliente do primeiro
+    assert asyncio.run(obter()) is not aquecido
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+
+from worker.agents import resiliencia
+
+
+class LLMFalso:
+    def __init__(self, modelo="modelo-teste"):
+        self.model = modelo
+
+
+@pytest.fixture(autouse=True)
+def configuracao_rapida(monkeypatch):
+    monkeypatch.setattr(resiliencia.settings, "LLM_COTA_ATIVA", False)
+    monkeypatch.setattr(resiliencia.settings, "LLM_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(resiliencia.settings, "LLM_BACKOFF_MAXIMO", 0.05)
+    monkeypatch.setattr(resiliencia.settings, "LLM_MAX_TENTATIVAS", 3)
+    monkeypatch.setattr(resiliencia, "_circuitos", {})
+
+
+def _falhando(erros, resposta="ok"):
+    """Chamada que levanta os `erros` em ordem e depois devolve `resposta`."""
+    tentativas = []
+
+    async def _chamar():
+        tentativas.append(1)
+        if len(tentativas) <= len(erros):
+            raise erros[len(tentativas) - 1]
+        return resposta
+
+    return _chamar, tentativas
+
+
+def test_erros_transitorios_sao_repetidos():
+    chamar, tentativas = _falhando([ServiceUnavailable("fora"), ResourceExhausted("429")])
+    avisos_429 = []
+
+    resposta = asyncio.run(
+        resiliencia.com_retentativas(
+            chamar, LLMFalso(), ao_receber_429=lambda: avisos_429.append(1), padrao_retry_429=0.01
+        )
+    )
+
+    assert resposta == "ok"
+    assert len(tentativas) == 3
+    assert avisos_429 == [1]
+
+
+def test_desiste_apos_o_maximo_de_tentativas():
+    chamar, tentativas = _falhando([ServiceUnavailable("fora")] * 5)
+
+    with pytest.raises(resiliencia.TentativasEsgotadas):
+        asyncio.run(resiliencia.com_retentativas(chamar, LLMFalso()))
+    assert len(tentativas) == 3
+
+
+def test_erros_nao_transitorios_sobem_na_hora():
+    chamar, tentativas = _falhando([ValueError("JSON inválido")])
+
+    with pytest.raises(ValueError):
+        asyncio.run(resiliencia.com_retentativas(chamar, LLMFalso()))
+    assert len(tentativas) == 1
+
+
+def test_circuito_abre_apos_falhas_seguidas_e_fecha_no_teste(monkeypatch):
+    monkeypatch.setattr(resiliencia.settings, "LLM_CIRCUITO_FALHAS", 2)
+    monkeypatch.setattr(resiliencia.settings, "LLM_CIRCUITO_SEGUNDOS_ABERTO", 0.1)
+    llm = LLMFalso()
+
+    async def _chamada(erro=None):
+        async with resiliencia.protegido(llm):
+            if erro:
+                raise erro
+            return "ok"
+
+    async def _cenario():
+        for _ in range(2):
+            with pytest.raises(ServiceUnavailable):
+                await _chamada(ServiceUnavailable("fora"))
+        # Aberto: recusa sem chamar o provedor
+        with pytest.raises(resiliencia.CircuitoAberto):
+            await _chamada()
+        await asyncio.sleep(0.15)
+        # Semiaberto: a chamada de teste passa e fecha o circuito
+        assert await _chamada() == "ok"
+        assert resiliencia.circuito_de(llm).estado == "fechado"
+
+    asyncio.run(_cenario())
+
+
+def test_429_nao_abre_o_circuito(monkeypatch):
+    monkeypatch.setattr(resiliencia.settings, "LLM_CIRCUITO_FALHAS", 1)
+    llm = LLMFalso()
+
+    async def _cenario():
+        with pytest.raises(ResourceExhausted):
+            async with resiliencia.protegido(llm):
+                raise ResourceExhausted("429")
+
+    asyncio.run(_cenario())
+    assert resiliencia.circuito_de(llm).estado == "fechado"
+
+
+def test_prazo_cancela_o_trabalho_pendente():
+    cancelada = []
+
+    async def _lenta():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelada.append(1)
+            raise
+
+    async def _cenario():
+        async with resiliencia.prazo(0.05):
+            await asyncio.gather(_lenta(), _lenta())
+
+    with pytest.raises(resiliencia.PrazoEsgotado):
+        asyncio.run(_cenario())
+    assert cancelada == [1, 1]
+
+
+def test_nao_espera_nova_tentativa_alem_do_prazo(monkeypatch):
+    monkeypatch.setattr(resiliencia.settings, "LLM_BACKOFF_BASE", 10.0)
+    monkeypatch.setattr(resiliencia.settings, "LLM_BACKOFF_MAXIMO", 10.0)
+    # Sorteio no teto: a espera (10s) passa do prazo (5s)
+    monkeypatch.setattr(resiliencia.random, "uniform", lambda a, b: b)
+    chamar, tentativas = _falhando([ServiceUnavailable("fora")] * 5)
+
+    async def _cenario():
+        async with resiliencia.prazo(5):
+            assert 0 < resiliencia.tempo_restante() <= 5
+            await resiliencia.com_retentativas(chamar, LLMFalso())
+
+    with pytest.raises(resiliencia.PrazoEsgotado):
+        asyncio.run(_cenario())
+    assert len(tentativas) == 1
+    assert resiliencia.tempo_restante() is None
+
+
+def test_backoff_sorteia_entre_zero_e_o_teto_exponencial(monkeypatch):
+    monkeypatch.setattr(resiliencia.settings, "LLM_BACKOFF_BASE", 2.0)
+    monkeypatch.setattr(resiliencia.settings, "LLM_BACKOFF_MAXIMO", 60.0)
+    sorteios = []
+    monkeypatch.setattr(resiliencia.random, "uniform", lambda a, b: sorteios.append((a, b)) or b)
+
+    assert [resiliencia.backoff(t) for t in (1, 2, 3, 6, 10)] == [2.0, 4.0, 8.0, 60.0, 60.0]
+    assert {a for a, _ in sorteios} == {0}
@@ -1,4 +1,4 @@
-from worker.banca.rules import verificar_discrepancia, calcular_nota_consolidada, resolver_discrepancia_com_supervisor
+from worker.banca.rules import verificar_discrepancia, calcular_nota_consolidada, resolver_discrepancia_com_supervisor, DetectorDiscrepancia, competencias_discrepantes, mesclar_correcoes_parciais
 
 def criar_correcao_mock(nota_total, competencias=[120, 120, 120, 120, 120]):
     return {
@@ -36,3 +36,52 @@ def test_calcular_nota_consolidada():
     final = calcular_nota_consolidada(c1, c2)
     # Média: 750
     assert final["nota_final"] == 750
+
+
+def test_detector_dispara_na_primeira_competencia_discrepante():
+    detectadas = []
+    detector = DetectorDiscrepancia(ao_detectar=detectadas.append)
+
+    detector.registrar("Corretor 1", {"competencia": 1, "nota": 160})
+    detector.registrar("Corretor 2", {"competencia": 1, "nota": 120})  # Diff 40
+    assert detectadas == []
+
+    detector.registrar("Corretor 2", {"competencia": 3, "nota": 40})
+    detector.registrar("Corretor 1", {"competencia": 3, "nota": 200})  # Diff 160
+    detector.registrar("Corretor 1", {"competencia": 4, "nota": 200})
+    detector.registrar("Corretor 2", {"competencia": 4, "nota": 0})
+    assert detectadas == [3, 4]
+
+    # A mesma competência não dispara duas vezes
+    detector.registrar("Corretor 1", {"competencia": 3, "nota": 200})
+    assert detectadas == [3, 4]
+
+
+def _correcao(notas):
+    return {
+        "nota_final": sum(notas),
+        "competencias": [{"competencia": i + 1, "nota": n, "justificativa": ""} for i, n in enumerate(notas)],
+    }
+
+
+def test_competencias_discrepantes():
+    c1 = _correcao([200, 120, 120, 120, 120])
+    c2 = _correcao([80, 160, 120, 120, 120])
+    assert competencias_discrepantes(c1, c2) == [1]
+
+    # Total diverge (> 100): supervisor reavalia tudo
+    c1 = _correcao([200, 200, 200, 120, 120])
+    c2 = _correcao([120, 120, 120, 120, 120])
+    assert competencias_discrepantes(c1, c2) == [1, 2, 3, 4, 5]
+
+
+def test_supervisor_parcial_mescla_com_media_dos_corretores():
+    c1 = _correcao([200, 120, 160, 120, 120])
+    c2 = _correcao([80, 120, 120, 120, 120])
+    c3 = mesclar_correcoes_parciais([{"competencias": [{"competencia": 1, "nota": 160}]}])
+
+    final = resolver_discrepancia_com_supervisor(c1, c2, c3)
+    notas = [c["nota"] for c in final["competencias"]]
+    # C1: notas (200, 80, 160) -> média das duas mais próximas (180) arredondada; demais: média de C1 e C2
+    assert notas == [160, 120, 120, 120, 120]
+    assert "competências [1]" in final["fonte_resultado"]
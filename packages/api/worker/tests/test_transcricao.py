@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import tasks
+from shared import armazenamento, eventos, models
+
+
+@pytest.fixture
+def ambiente(monkeypatch, tmp_path):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(bind=engine)
+    sessoes = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    local = armazenamento.ArmazenamentoLocal(str(tmp_path))
+    publicados = []
+
+    monkeypatch.setattr(tasks, "SessionLocal", sessoes)
+    monkeypatch.setattr(armazenamento, "_armazenamento", local)
+    monkeypatch.setattr(eventos, "publicar", lambda redacao_id, evento, canal=None: publicados.append((canal, evento)))
+
+    def _transcricao(imagem):
+        db = sessoes()
+        transcricao = models.Transcricao(status="PENDENTE", imagem_chave=local.salvar(imagem), imagem_tipo="image/png")
+        db.add(transcricao)
+        db.commit()
+        transcricao_id = transcricao.id
+        db.close()
+        return transcricao_id
+
+    yield sessoes, local, publicados, _transcricao
+    models.Base.metadata.drop_all(bind=engine)
+
+
+def test_transcricao_concluida_publica_o_fim_e_apaga_a_foto(ambiente, monkeypatch):
+    sessoes, local, publicados, criar = ambiente
+    recebido = {}
+
+    async def _ocr_falso(imagem, mime_type="image/jpeg"):
+        recebido.update(imagem=imagem, mime_type=mime_type)
+        return "Texto da redação"
+
+    monkeypatch.setattr(tasks, "extrair_texto_da_imagem_async", _ocr_falso)
+    transcricao_id = criar(b"foto")
+
+    tasks.transcribe_essay(transcricao_id)
+
+    transcricao = sessoes().get(models.Transcricao, transcricao_id)
+    assert (transcricao.status, transcricao.texto) == ("CONCLUIDO", "Texto da redação")
+    assert recebido == {"imagem": b"foto", "mime_type": "image/png"}
+    assert not local.existe(local.chave(b"foto"))
+    assert [evento["tipo"] for _, evento in publicados] == [eventos.EVENTO_STATUS, eventos.EVENTO_FIM]
+    assert {canal for canal, _ in publicados} == {eventos.canal_transcricao(transcricao_id)}
+
+
+def test_imagem_invalida_termina_em_erro(ambiente, monkeypatch):
+    sessoes, _, publicados, criar = ambiente
+
+    async def _ocr_falso(imagem, mime_type="image/jpeg"):
+        raise ValueError("A imagem enviada não parece ser uma redação válida.")
+
+    monkeypatch.setattr(tasks, "extrair_texto_da_imagem_async", _ocr_falso)
+    transcricao_id = criar(b"paisagem")
+
+    tasks.transcribe_essay(transcricao_id)
+
+    transcricao = sessoes().get(models.Transcricao, transcricao_id)
+    assert transcricao.status == "ERRO"
+    assert "redação válida" in transcricao.erro
+    assert publicados[-1][1] == {"tipo": eventos.EVENTO_FIM, "status": "ERRO"}
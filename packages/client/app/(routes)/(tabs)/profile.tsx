@@ -56,7 +56,7 @@ export default function ProfileScreen() {
         setUserId(data.id);
         // Tenta carregar a foto do servidor (adiciona timestamp para evitar cache)
         setProfilePhoto(
-          `${Config.API.BASE_URL}/profile/photo/${data.id}?t=${Date.now()}`,
+          `${Config.API.BASE_URL}/profile/photo/${data.id}?tamanho=256&t=${Date.now()}`,
         );
       }
     } catch (error) {
@@ -148,7 +148,7 @@ export default function ProfileScreen() {
       await api.uploadProfilePhoto(uri);
       // Atualiza a foto localmente
       setProfilePhoto(
-        `${Config.API.BASE_URL}/profile/photo/${userId}?t=${Date.now()}`,
+        `${Config.API.BASE_URL}/profile/photo/${userId}?tamanho=256&t=${Date.now()}`,
       );
       Alert.alert("Sucesso", "Foto de perfil atualizada!");
     } catch (error) {
@@ -20,7 +20,7 @@ export default function Header() {
     const data = await storage.getUserData();
     if (data.id) {
       // Usamos timestamp para evitar cache de imagem antiga
-      setProfilePhoto(`${Config.API.BASE_URL}/profile/photo/${data.id}?t=${Date.now()}`);
+      setProfilePhoto(`${Config.API.BASE_URL}/profile/photo/${data.id}?tamanho=64&t=${Date.now()}`);
     } else {
       setProfilePhoto(null);
     }